@@ -14,7 +14,7 @@ import pytz
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 try:
-    from lib.utils.supabase_client import SupabaseClient
+    from lib.utils.supabase_client import get_supabase_client
     USE_SUPABASE = True
 except Exception as e:
     print(f"⚠️ Supabase unavailable, falling back to cache files: {e}")
@@ -45,7 +45,7 @@ class handler(BaseHTTPRequestHandler):
         try:
             if USE_SUPABASE:
                 # Fetch from Supabase
-                supabase = SupabaseClient()
+                supabase = get_supabase_client()
                 santiago_tz = pytz.timezone('America/Santiago')
                 end_date = datetime.now(santiago_tz).date()
                 start_date = end_date - timedelta(days=30)  # Last 30 days
@@ -62,7 +62,8 @@ class handler(BaseHTTPRequestHandler):
                     records = supabase.get_cmg_online(
                         start_date=str(start_date),
                         end_date=str(end_date),
-                        limit=10000
+                        limit=10000,
+                        select='date,hour,node,cmg_usd'
                     )
                     data = supabase.format_cmg_online_as_cache(records)
 
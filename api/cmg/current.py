@@ -16,7 +16,7 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 try:
     # Try to import Supabase client
-    from lib.utils.supabase_client import SupabaseClient
+    from lib.utils.supabase_client import get_supabase_client
     USE_SUPABASE = True
 except Exception as e:
     print(f"⚠️ Supabase unavailable, falling back to cache: {e}")
@@ -45,7 +45,7 @@ class handler(BaseHTTPRequestHandler):
         try:
             if USE_SUPABASE:
                 # Initialize Supabase client (read-only with anon key)
-                supabase = SupabaseClient()
+                supabase = get_supabase_client()
 
                 # Get current time in Santiago
                 santiago_tz = pytz.timezone('America/Santiago')
@@ -59,7 +59,8 @@ class handler(BaseHTTPRequestHandler):
                 cmg_online_records = supabase.get_cmg_online(
                     start_date=str(historical_start_date),
                     end_date=str(current_date),
-                    limit=1000
+                    limit=1000,
+                    select='date,hour,node,cmg_usd'
                 )
 
                 # CMG Programado: From current hour onwards (future data only)
@@ -71,7 +72,8 @@ class handler(BaseHTTPRequestHandler):
                     end_date=str(programmed_end_date),
                     node=None,  # Get all nodes
                     limit=300,  # 72 hours x 3 nodes = 216 max
-                    latest_forecast_only=True  # CRITICAL: Prevents duplicates
+                    latest_forecast_only=True,  # CRITICAL: Prevents duplicates
+                    select='target_date,target_hour,node,cmg_usd'
                 )
 
                 # Convert to flat array format for frontend compatibility
@@ -12,7 +12,7 @@ import pytz
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
 try:
-    from lib.utils.supabase_client import SupabaseClient
+    from lib.utils.supabase_client import get_supabase_client
     USE_SUPABASE = True
 except Exception as e:
     USE_SUPABASE = False
@@ -37,7 +37,7 @@ class handler(BaseHTTPRequestHandler):
             return
 
         try:
-            supabase = SupabaseClient()
+            supabase = get_supabase_client()
             santiago_tz = pytz.timezone('America/Santiago')
             now = datetime.now(santiago_tz)
 
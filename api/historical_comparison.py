@@ -14,52 +14,20 @@ import json
 import sys
 import os
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 import pytz
-import requests
 
 # Add parent directories to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 try:
-    from lib.utils.supabase_client import SupabaseClient
+    from lib.utils.supabase_client import get_supabase_client
     USE_SUPABASE = True
 except Exception as e:
     print(f"⚠️ Supabase unavailable: {e}")
     USE_SUPABASE = False
 
-def fetch_all_with_pagination(url, params, headers, max_records=50000):
-    """
-    Fetch all records from Supabase with pagination to bypass 1000-row limit.
-    PostgREST has a default max of 1000 rows per request.
-    """
-    all_records = []
-    offset = 0
-    batch_size = 1000
-
-    while len(all_records) < max_records:
-        # Add pagination params
-        paginated_params = params + [("offset", offset), ("limit", batch_size)]
-
-        response = requests.get(url, params=paginated_params, headers=headers)
-
-        if response.status_code != 200:
-            break
-
-        batch = response.json()
-        if not batch:  # No more records
-            break
-
-        all_records.extend(batch)
-        offset += batch_size
-
-        # Stop if we got less than batch_size (last page)
-        if len(batch) < batch_size:
-            break
-
-    return all_records
-
-
 class handler(BaseHTTPRequestHandler):
     def do_GET(self):
         """
@@ -90,7 +58,7 @@ class handler(BaseHTTPRequestHandler):
                 requested_hour = query_params.get('hour', [None])[0]
 
                 # Initialize Supabase client
-                supabase = SupabaseClient()
+                supabase = get_supabase_client()
                 santiago_tz = pytz.timezone('America/Santiago')
 
                 # SUMMARY MODE: Return available dates/hours only
@@ -98,33 +66,17 @@ class handler(BaseHTTPRequestHandler):
                     end_date = datetime.now(santiago_tz).date()
                     start_date = end_date - timedelta(days=30)
 
-                    # Get unique (forecast_date, forecast_hour) combinations
-                    # Use pagination to get ALL records (not limited to 1000)
-                    # Even though we only select 2 columns, there can be 46K+ rows
-                    ml_summary_url = f"{supabase.base_url}/ml_predictions_santiago"
-                    ml_summary_params = [
-                        ("forecast_date", f"gte.{start_date}"),
-                        ("forecast_date", f"lte.{end_date}"),
-                        ("select", "forecast_date,forecast_hour")
-                    ]
-                    ml_summary = fetch_all_with_pagination(ml_summary_url, ml_summary_params, supabase.headers, max_records=10000)
-
-                    prog_summary_url = f"{supabase.base_url}/cmg_programado_santiago"
-                    prog_summary_params = [
-                        ("forecast_date", f"gte.{start_date}"),
-                        ("forecast_date", f"lte.{end_date}"),
-                        ("select", "forecast_date,forecast_hour")
-                    ]
-                    prog_summary = fetch_all_with_pagination(prog_summary_url, prog_summary_params, supabase.headers, max_records=50000)
-
-                    # Group by (date, hour) to get unique combinations
-                    ml_hours = set()
-                    for record in ml_summary:
-                        ml_hours.add((str(record['forecast_date']), record['forecast_hour']))
-
-                    prog_hours = set()
-                    for record in prog_summary:
-                        prog_hours.add((str(record['forecast_date']), record['forecast_hour']))
+                    # Get unique (forecast_date, forecast_hour) combinations.
+                    # The forecast_runs index (migration 009) holds one row per run;
+                    # fall back to scanning the forecast views if it is not deployed
+                    runs = supabase.get_forecast_runs(str(start_date), str(end_date))
+                    if runs:
+                        ml_hours = {(str(r['forecast_date']), r['forecast_hour'])
+                                    for r in runs if r['source'] == 'ml'}
+                        prog_hours = {(str(r['forecast_date']), r['forecast_hour'])
+                                      for r in runs if r['source'] == 'prog'}
+                    else:
+                        ml_hours, prog_hours = self._scan_forecast_hours(supabase, start_date, end_date)
 
                     # Convert to list of dicts
                     available_hours = []
@@ -146,7 +98,8 @@ class handler(BaseHTTPRequestHandler):
                         'metadata': {
                             'start_date': str(start_date),
                             'end_date': str(end_date),
-                            'total_hours': len(available_hours)
+                            'total_hours': len(available_hours),
+                            'source': 'forecast_runs' if runs else 'scan'
                         }
                     }
 
@@ -162,38 +115,35 @@ class handler(BaseHTTPRequestHandler):
                 # IMPORTANT: Use Santiago timezone VIEWS for all queries
                 # These views have pre-converted Santiago timezone columns (forecast_date, forecast_hour, etc.)
 
-                # Fetch ML predictions for SPECIFIC date/hour from SANTIAGO VIEW
-                url = f"{supabase.base_url}/ml_predictions_santiago"
-                ml_params = [
-                    ("forecast_date", f"eq.{requested_date}"),
-                    ("forecast_hour", f"eq.{requested_hour}"),
-                    ("order", "target_datetime.asc")
-                ]
-                ml_response = requests.get(url, params=ml_params, headers=supabase.headers)
-                ml_predictions = ml_response.json() if ml_response.status_code == 200 else []
-
-                # Fetch CMG Programado for SPECIFIC date/hour from SANTIAGO VIEW
-                prog_url = f"{supabase.base_url}/cmg_programado_santiago"
-                prog_params = [
-                    ("forecast_date", f"eq.{requested_date}"),
-                    ("forecast_hour", f"eq.{requested_hour}"),
-                    ("order", "target_datetime.asc")
-                ]
-                prog_response = requests.get(prog_url, params=prog_params, headers=supabase.headers)
-                cmg_programado = prog_response.json() if prog_response.status_code == 200 else []
-
-                # Fetch CMG Online (actual values) for the target period being forecasted
-                # Get the datetime range being forecasted (typically next 24 hours)
-                # We'll fetch a bit wider range to ensure coverage
-                online_url = f"{supabase.base_url}/cmg_online_santiago"
-                online_params = [
-                    ("date", f"gte.{requested_date}"),
-                    ("date", f"lte.{(datetime.strptime(requested_date, '%Y-%m-%d') + timedelta(days=2)).strftime('%Y-%m-%d')}"),
-                    ("order", "datetime.asc"),
-                    ("limit", "200")  # Max 2 days * 24 hours * 3 nodes = 144 records
-                ]
-                online_response = requests.get(online_url, params=online_params, headers=supabase.headers)
-                cmg_online = online_response.json() if online_response.status_code == 200 else []
+                # Fetch ML predictions and CMG Programado for SPECIFIC date/hour from
+                # the SANTIAGO VIEWS, plus CMG Online (actual values) for the target
+                # period being forecasted (typically next 24 hours; we fetch a bit
+                # wider range to ensure coverage). The three queries run concurrently.
+                online_end = (datetime.strptime(requested_date, '%Y-%m-%d') + timedelta(days=2)).strftime('%Y-%m-%d')
+                results = supabase.fetch_tables({
+                    'ml': ("ml_predictions_santiago", [
+                        ("select", "forecast_datetime,forecast_date,forecast_hour,target_datetime,"
+                                   "horizon,cmg_predicted,prob_zero,threshold,model_version"),
+                        ("forecast_date", f"eq.{requested_date}"),
+                        ("forecast_hour", f"eq.{requested_hour}"),
+                        ("order", "target_datetime.asc")
+                    ]),
+                    'prog': ("cmg_programado_santiago", [
+                        ("select", "forecast_datetime,forecast_date,forecast_hour,target_datetime,cmg_usd,node"),
+                        ("forecast_date", f"eq.{requested_date}"),
+                        ("forecast_hour", f"eq.{requested_hour}"),
+                        ("order", "target_datetime.asc")
+                    ]),
+                    'online': ("cmg_online_santiago", [
+                        ("select", "date,hour,cmg_usd,node"),
+                        ("date", f"gte.{requested_date}"),
+                        ("date", f"lte.{online_end}"),
+                        ("order", "datetime.asc")
+                    ]),
+                })
+                ml_predictions = results['ml']
+                cmg_programado = results['prog']
+                cmg_online = results['online']
 
                 # Format data for frontend
                 # Using Santiago timezone views - forecast_date/forecast_hour are already in Santiago timezone!
@@ -312,6 +262,35 @@ class handler(BaseHTTPRequestHandler):
             }
             self.wfile.write(json.dumps(error_response).encode())
 
+    @staticmethod
+    def _scan_forecast_hours(supabase, start_date, end_date, max_records=50000):
+        """
+        Distinct (forecast_date, forecast_hour) pairs of ML and Programado
+        forecasts, read from the views themselves.
+
+        There can be 46K+ rows: stream keyset pages on id (3 narrow columns
+        per row) and keep only the distinct pairs. Both scans run concurrently.
+        """
+        summary_params = [
+            ("forecast_date", f"gte.{start_date}"),
+            ("forecast_date", f"lte.{end_date}"),
+            ("select", "forecast_date,forecast_hour")
+        ]
+
+        def collect_hours(view):
+            hours, scanned = set(), 0
+            for page in supabase.iter_pages(view, summary_params, ('id',)):
+                hours.update((str(r['forecast_date']), r['forecast_hour']) for r in page)
+                scanned += len(page)
+                if scanned >= max_records:
+                    break
+            return hours
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            ml_future = executor.submit(collect_hours, "ml_predictions_santiago")
+            prog_future = executor.submit(collect_hours, "cmg_programado_santiago")
+            return ml_future.result(), prog_future.result()
+
     def do_OPTIONS(self):
         """Handle CORS preflight"""
         self.send_response(200)
@@ -9,6 +9,7 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent))
 from lib.utils.cache_manager_readonly import CacheManagerReadOnly as CacheManager
 from lib.utils.cors import add_cors_headers, send_cors_preflight
+from lib.utils.sip_snapshot import get_snapshot
 
 class handler(BaseHTTPRequestHandler):
     def do_GET(self):
@@ -16,6 +17,7 @@ class handler(BaseHTTPRequestHandler):
         request_origin = self.headers.get('Origin', '')
         self.send_response(200)
         self.send_header('Content-Type', 'application/json')
+        self.send_header('Cache-Control', 's-maxage=300, stale-while-revalidate=3600')
         add_cors_headers(self, request_origin, 'GET, OPTIONS')
         self.end_headers()
         
@@ -36,6 +38,7 @@ class handler(BaseHTTPRequestHandler):
             now = datetime.now()
         
         # Try to get cached data first
+        cache_manager = None
         try:
             cache_manager = CacheManager()
             display_data = cache_manager.get_combined_display_data()
@@ -48,94 +51,43 @@ class handler(BaseHTTPRequestHandler):
         except Exception:
             pass
         
-        # Try to fetch real data from SIP API
+        # Serve yesterday's SIP data from the snapshot the hourly job builds.
+        # Stale-while-revalidate: a stale snapshot is served while it refreshes
+        # in the background; the SIP API is only called inline when none exists
         try:
-            import requests
             import numpy as np
             
             SIP_API_KEY = os.environ.get('SIP_API_KEY')
-            if not SIP_API_KEY:
+            cache_dir = cache_manager.cache_dir if cache_manager else None
+            snapshot, snapshot_state = get_snapshot(now, SIP_API_KEY, cache_dir)
+            if snapshot is None and not SIP_API_KEY:
                 raise ValueError("SIP_API_KEY environment variable not set")
-            SIP_BASE_URL = 'https://sipub.api.coordinador.cl:443'
-            CHILOE_NODE = 'CHILOE________220'
             
-            # Fetch yesterday's data (more complete)
-            url = f"{SIP_BASE_URL}/costo-marginal-online/v4/findByDate"
-            yesterday = (now - timedelta(days=1)).strftime('%Y-%m-%d')
-            
-            all_chiloe_data = []
-            pages_fetched = 0
-            max_pages = 10  # Limit for performance
-            
-            # Start from page 4 where Chiloé data usually is
-            start_page = 4
-            for page in range(start_page, max_pages + start_page):
-                params = {
-                    'startDate': yesterday,
-                    'endDate': yesterday,
-                    'page': page,
-                    'limit': 1000,
-                    'user_key': SIP_API_KEY
-                }
-                
-                try:
-                    response = requests.get(url, params=params, timeout=8)
-                    pages_fetched += 1
-                    
-                    if response.status_code == 200:
-                        data = response.json()
-                        records = data.get('data', [])
-                        
-                        # Filter Chiloé records
-                        chiloe_records = [r for r in records if r.get('barra_transf') == CHILOE_NODE]
-                        all_chiloe_data.extend(chiloe_records)
-                        
-                        # If we have enough data or reached last page
-                        if len(all_chiloe_data) >= 24 or len(records) < 1000:
-                            break
-                    else:
-                        break
-                except Exception:
-                    break
-            
-            fetch_info = {
-                'pages_fetched': pages_fetched,
-                'records_found': len(all_chiloe_data),
-                'date_fetched': yesterday
-            }
-            
-            if all_chiloe_data:
-                # Sort by time
-                all_chiloe_data.sort(key=lambda x: x.get('fecha_hora', ''))
+            if snapshot:
+                fetch_info = dict(snapshot.get('fetch_info', {}),
+                                  snapshot=snapshot_state,
+                                  snapshot_generated_at=snapshot['generated_at'])
+                series = snapshot['series']
                 
-                # Extract values for ML (field is cmg_usd_mwh_ not cmg)
-                values = [float(r.get('cmg_usd_mwh_', r.get('cmg', 60))) for r in all_chiloe_data]
-                hours = [int(r.get('fecha_hora', '00:00')[11:13]) for r in all_chiloe_data]
+                # Extract values for ML
+                values = [point['cmg'] for point in series]
                 
                 avg_value = np.mean(values)
                 last_value = values[-1] if values else 60
                 std_value = np.std(values) if len(values) > 1 else 5
                 
-                # Learn hourly patterns
-                hourly_patterns = {}
-                for h, v in zip(hours, values):
-                    if h not in hourly_patterns:
-                        hourly_patterns[h] = []
-                    hourly_patterns[h].append(v)
-                
-                # Calculate median for each hour
-                for h in hourly_patterns:
-                    hourly_patterns[h] = np.median(hourly_patterns[h])
+                # Hourly patterns (median per hour) learned by the producer
+                hourly_patterns = {int(h): v for h, v in snapshot['hourly_patterns'].items()}
                 
-                data_source = f"SIP API ({len(all_chiloe_data)} records)"
+                data_source = f"SIP API ({len(series)} records)"
                 success = True
                 
                 # Add historical data (last 24 available)
-                for record in all_chiloe_data[-24:]:
+                for point in series[-24:]:
                     predictions.append({
-                        'datetime': record.get('fecha_hora'),
-                        'hour': int(record.get('fecha_hora', '00:00')[11:13]),
-                        'cmg_actual': round(float(record.get('cmg_usd_mwh_', record.get('cmg', 60))), 2),
+                        'datetime': point['datetime'],
+                        'hour': point['hour'],
+                        'cmg_actual': round(point['cmg'], 2),
                         'is_historical': True
                     })
                 
@@ -14,7 +14,7 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 try:
-    from lib.utils.supabase_client import SupabaseClient
+    from lib.utils.supabase_client import get_supabase_client
     USE_SUPABASE = True
 except Exception as e:
     print(f"⚠️ Supabase unavailable: {e}")
@@ -34,8 +34,11 @@ class handler(BaseHTTPRequestHandler):
         try:
             if USE_SUPABASE:
                 # Fetch latest predictions from Supabase
-                supabase = SupabaseClient()
-                predictions = supabase.get_latest_ml_predictions(limit=24)
+                supabase = get_supabase_client()
+                predictions = supabase.get_latest_ml_predictions(
+                    limit=24,
+                    select='forecast_datetime,target_datetime,horizon,cmg_predicted,prob_zero,threshold,model_version'
+                )
 
                 if predictions:
                     # Format predictions for API response
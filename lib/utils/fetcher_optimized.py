@@ -5,12 +5,16 @@ Based on successful tests achieving 100% coverage in < 4 minutes
 
 import os
 import requests
+from pathlib import Path
 import time
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 from collections import defaultdict
 import pytz
 
+from lib.utils.sip_fetcher import SIPPageFetcher
+from lib.utils.sip_page_index import INDEX_FILE, SIPPageIndex
+
 class OptimizedCMGFetcher:
     """
     Ultra-optimized fetcher using 4000 records/page.
@@ -34,19 +38,22 @@ class OptimizedCMGFetcher:
         'BA S/E CHONCHI 110KV BP1', 'BA S/E DALCAHUE 23KV BP1'
     ]
     
-    # Optimized page sequence based on successful tests
+    # Fallback page sequence (based on successful tests) for pages the
+    # page index has not seen our nodes on
     PRIORITY_PAGES = [
         2, 6, 10, 11, 16, 18, 21, 23, 27, 29, 32, 35, 37,  # High value
         3, 4, 7, 14, 19, 20, 24, 26, 28, 31, 33, 36,       # Medium value
         1, 5, 8, 9, 12, 13, 15, 17, 22, 25, 30, 34         # Low value
     ]
     
-    def __init__(self):
-        """Initialize fetcher with Santiago timezone"""
+    def __init__(self, page_index: Optional[SIPPageIndex] = None):
+        """Initialize fetcher with Santiago timezone and the learned page index"""
         if not self.SIP_API_KEY:
             raise ValueError("SIP_API_KEY environment variable not set")
         self.santiago_tz = pytz.timezone('America/Santiago')
         self.session = requests.Session()
+        self.page_fetcher = SIPPageFetcher(self.SIP_API_KEY, session=self.session, timeout=30)
+        self.page_index = page_index or SIPPageIndex(Path('data/cache') / INDEX_FILE)
     
     def fetch_page(self, url: str, params: dict, page_num: int, 
                   max_retries: int = 10) -> Tuple[Optional[List], str]:
@@ -101,76 +108,54 @@ class OptimizedCMGFetcher:
         
         # Storage
         location_data = defaultdict(lambda: {'hours': set(), 'records': []})
-        pages_fetched = []
-        total_records = 0
         start_time = time.time()
         
-        # Determine pages to fetch
+        # Determine pages to fetch: pages known to hold our nodes first
         if incremental:
             # For incremental, focus on recent data pages
-            pages_to_fetch = self.PRIORITY_PAGES[:10]  # First 10 priority pages
+            pages_to_fetch = self.page_index.plan(self.CMG_NODES, self.PRIORITY_PAGES)[:10]
         else:
-            pages_to_fetch = self.PRIORITY_PAGES[:40]  # All priority pages
+            pages_to_fetch = self.page_index.plan(self.CMG_NODES, self.PRIORITY_PAGES[:40])
         
-        # Fetch pages
-        for page in pages_to_fetch:
-            # Check current coverage
-            current_coverage = self._calculate_coverage(location_data)
-            if current_coverage >= target_coverage:
-                break
-            
-            params = {
-                'startDate': date,
-                'endDate': date,
-                'page': page,
-                'limit': 4000,  # Optimized page size
-                'user_key': self.SIP_API_KEY
-            }
-            
-            records, status = self.fetch_page(url, params, page)
-            
-            if status == 'success' and records:
-                pages_fetched.append(page)
-                total_records += len(records)
-                
-                # Process records
-                for record in records:
-                    node = record.get('barra_transf')
-                    if node in self.CMG_NODES:
-                        # Extract data
-                        datetime_str = record.get('fecha_hora')
-                        if datetime_str:
-                            hour = int(datetime_str[11:13])
+        def on_page(page, records):
+            for record in records:
+                node = record.get('barra_transf')
+                if node in self.CMG_NODES:
+                    # Extract data
+                    datetime_str = record.get('fecha_hora')
+                    if datetime_str:
+                        hour = int(datetime_str[11:13])
+                        self.page_index.record(node, hour, page)
+                        
+                        # For incremental, filter by recent hours
+                        if incremental:
+                            record_time = datetime.fromisoformat(datetime_str)
+                            now = datetime.now(self.santiago_tz)
+                            if record_time.tzinfo is None:
+                                record_time = self.santiago_tz.localize(record_time)
                             
-                            # For incremental, filter by recent hours
-                            if incremental:
-                                record_time = datetime.fromisoformat(datetime_str)
-                                now = datetime.now(self.santiago_tz)
-                                if record_time.tzinfo is None:
-                                    record_time = self.santiago_tz.localize(record_time)
-                                
-                                hours_ago = (now - record_time).total_seconds() / 3600
-                                if hours_ago > last_hours:
-                                    continue
-                            
-                            location_data[node]['hours'].add(hour)
-                            location_data[node]['records'].append({
-                                'datetime': datetime_str,
-                                'hour': hour,
-                                'cmg_actual': float(record.get('cmg_usd_mwh_', 
-                                                              record.get('cmg', 0))),
-                                'node': node
-                            })
-            
-            elif status == 'empty':
-                # Check for consecutive empty pages
-                if len(pages_fetched) == 0:
-                    continue  # Keep trying if no data yet
-                else:
-                    break  # Stop if we've had data and now empty
-            
-            # Small delay between pages
-            time.sleep(0.2)
+                            hours_ago = (now - record_time).total_seconds() / 3600
+                            if hours_ago > last_hours:
+                                continue
+                        
+                        location_data[node]['hours'].add(hour)
+                        location_data[node]['records'].append({
+                            'datetime': datetime_str,
+                            'hour': hour,
+                            'cmg_actual': float(record.get('cmg_usd_mwh_', 
+                                                          record.get('cmg', 0))),
+                            'node': node
+                        })
+        
+        # Fetch pages concurrently until the target coverage is reached
+        stats = self.page_fetcher.fetch_pages(
+            url, {'startDate': date, 'endDate': date}, on_page, pages=pages_to_fetch,
+            done=lambda: self._calculate_coverage(location_data) >= target_coverage,
+            nodes=self.CMG_NODES
+        )
+        pages_fetched = stats['pages_fetched']
+        total_records = stats['total_records']
+        self.page_index.save()
         
         # Compile results
         elapsed = time.time() - start_time
@@ -0,0 +1,343 @@
+"""
+Forecast performance metrics for /api/performance_range and /api/performance_heatmap
+
+Range: forecast distances are aggregated into rows of
+(dimension, source, bucket_date, horizon, distance_sum, error_count), the
+shape returned by the range_performance_metrics RPC (migration 006).
+aggregate_range_errors() builds the same rows from raw view records when the
+function is not deployed, and build_range_metrics() formats either into the
+endpoint response.
+
+Heatmap: compute_day_heatmaps() builds a day's 24×24 error matrices with
+NumPy, packed row-major into flat 576-value lists (the daily_heatmaps
+storage format, migration 008); heatmap_payload() formats one for the
+endpoint.
+"""
+
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+HORIZONS = range(1, 25)
+HEATMAP_SIZE = 24
+
+
+def aggregate_range_errors(ml_forecasts: List[Dict[str, Any]],
+                           prog_forecasts: List[Dict[str, Any]],
+                           cmg_online: List[Dict[str, Any]],
+                           start_date: date, end_date: date) -> List[Dict[str, Any]]:
+    """
+    Python equivalent of range_performance_metrics over Santiago view rows.
+
+    Args:
+        ml_forecasts: ml_predictions_santiago rows (forecast_date, target_date,
+                      target_hour, horizon, cmg_predicted) made from start_date - 1
+        prog_forecasts: cmg_programado_santiago rows (forecast_datetime,
+                        target_datetime, forecast_date, target_date, target_hour, cmg_usd)
+        cmg_online: cmg_online_santiago rows (date, hour, cmg_usd) in the range
+        start_date, end_date: The range (inclusive)
+
+    Returns:
+        Aggregate rows, as returned by the RPC
+    """
+    # Actuals: (date, hour) → CMG averaged across nodes
+    actuals_raw = defaultdict(list)
+    for record in cmg_online:
+        actuals_raw[(str(record['date']), record['hour'])].append(record['cmg_usd'])
+    actuals = {key: sum(values) / len(values) for key, values in actuals_raw.items()}
+
+    # Only future Programado targets, first 24 hours (matching ML predictions)
+    prog_filtered = []
+    for p in prog_forecasts:
+        forecast_dt = datetime.fromisoformat(p['forecast_datetime'].replace('Z', '+00:00'))
+        target_dt = datetime.fromisoformat(p['target_datetime'].replace('Z', '+00:00'))
+        if target_dt <= forecast_dt:
+            continue
+        horizon = int((target_dt - forecast_dt).total_seconds() // 3600)
+        if horizon <= 24:
+            prog_filtered.append((p, horizon))
+
+    sums = defaultdict(float)
+    counts = defaultdict(int)
+    forecasts = ([('ml', f, f['horizon'], f['cmg_predicted']) for f in ml_forecasts] +
+                 [('prog', p, horizon, p['cmg_usd']) for p, horizon in prog_filtered])
+
+    for source, forecast, horizon, predicted in forecasts:
+        target_key = (str(forecast['target_date']), forecast['target_hour'])
+        if target_key not in actuals:
+            continue
+        distance = abs(predicted - actuals[target_key])
+
+        # Temporal dimension: by TARGET date
+        sums[('day', source, target_key[0], None)] += distance
+        counts[('day', source, target_key[0], None)] += 1
+
+        # Structural dimension: only forecasts MADE during the range
+        made_on = date.fromisoformat(str(forecast['forecast_date']))
+        if start_date <= made_on <= end_date and horizon in HORIZONS:
+            sums[('horizon', source, None, horizon)] += distance
+            counts[('horizon', source, None, horizon)] += 1
+
+    rows = [{
+        'dimension': dimension,
+        'source': source,
+        'bucket_date': bucket_date,
+        'horizon': horizon,
+        'distance_sum': sums[(dimension, source, bucket_date, horizon)],
+        'error_count': count
+    } for (dimension, source, bucket_date, horizon), count in counts.items()]
+
+    coverage = {'ml': len(ml_forecasts), 'prog': len(prog_filtered),
+                'prog_raw': len(prog_forecasts), 'actuals': len(actuals)}
+    rows.extend({'dimension': 'coverage', 'source': source, 'bucket_date': None, 'horizon': None,
+                 'distance_sum': None, 'error_count': count} for source, count in coverage.items())
+    return rows
+
+
+def _average(sums: Dict, counts: Dict, key) -> Optional[float]:
+    return sums[key] / counts[key] if counts.get(key) else None
+
+
+def build_range_metrics(rows: List[Dict[str, Any]], start_date: date, end_date: date) -> Dict[str, Any]:
+    """
+    Format aggregate rows into the /api/performance_range payload.
+
+    Returns:
+        Dict with metrics_by_day, metrics_by_horizon, summary and data_coverage
+    """
+    sums, counts, coverage = {}, {}, {}
+    for row in rows:
+        if row['dimension'] == 'coverage':
+            coverage[row['source']] = row['error_count']
+            continue
+        bucket = str(row['bucket_date']) if row['dimension'] == 'day' else row['horizon']
+        key = (row['dimension'], row['source'], bucket)
+        sums[key] = float(row['distance_sum'])
+        counts[key] = int(row['error_count'])
+
+    # =========================================
+    # TEMPORAL DIMENSION: Metrics by Day
+    # =========================================
+    metrics_by_day = []
+    current_date = start_date
+    while current_date <= end_date:
+        date_str = current_date.strftime('%Y-%m-%d')
+        ml_avg = _average(sums, counts, ('day', 'ml', date_str))
+        prog_avg = _average(sums, counts, ('day', 'prog', date_str))
+
+        metrics_by_day.append({
+            'date': date_str,
+            'ml_avg_distance': round(ml_avg, 2) if ml_avg is not None else None,
+            'ml_count': counts.get(('day', 'ml', date_str), 0),
+            'prog_avg_distance': round(prog_avg, 2) if prog_avg is not None else None,
+            'prog_count': counts.get(('day', 'prog', date_str), 0)
+        })
+        current_date += timedelta(days=1)
+
+    # =========================================
+    # STRUCTURAL DIMENSION: Metrics by Horizon
+    # =========================================
+    # NOTE: Horizon metrics filter by FORECAST date (not target date):
+    # "How did predictions MADE during these days perform?"
+    by_horizon = {'ml': [], 'prog': []}
+    for source, entries in by_horizon.items():
+        for horizon in HORIZONS:
+            avg = _average(sums, counts, ('horizon', source, horizon))
+            if avg is not None:
+                entries.append({
+                    'horizon': horizon,
+                    'avg_distance': round(avg, 2),
+                    'count': counts[('horizon', source, horizon)]
+                })
+
+    # =========================================
+    # SUMMARY STATISTICS
+    # =========================================
+    temporal, structural = {}, {}
+    for source in ('ml', 'prog'):
+        # Temporal summary: Best/worst days and overall average across days
+        field = f'{source}_avg_distance'
+        days_with_data = [d for d in metrics_by_day if d[field] is not None]
+        daily = [d[field] for d in days_with_data]
+        overall_avg = sum(daily) / len(daily) if daily else None
+
+        temporal[source] = {
+            'best_day': min(days_with_data, key=lambda x: x[field]) if days_with_data else None,
+            'worst_day': max(days_with_data, key=lambda x: x[field]) if days_with_data else None,
+            'overall_avg': round(overall_avg, 2) if overall_avg is not None else None,
+            'days_with_data': len(days_with_data)
+        }
+
+        # Structural summary: Degradation rate (slope from t+1 to t+24)
+        # Simple linear degradation: (avg_t24 - avg_t1) / 23
+        horizons = by_horizon[source]
+        degradation_rate = None
+        if len(horizons) >= 2:
+            t1 = next((h['avg_distance'] for h in horizons if h['horizon'] == 1), None)
+            t24 = next((h['avg_distance'] for h in horizons if h['horizon'] == 24), None)
+            if t1 is not None and t24 is not None:
+                degradation_rate = round((t24 - t1) / 23, 2)
+
+        structural[source] = {
+            'degradation_rate': degradation_rate,
+            'horizons_available': len(horizons)
+        }
+
+    return {
+        'metrics_by_day': metrics_by_day,
+        'metrics_by_horizon': by_horizon,
+        'summary': {
+            'temporal': temporal,
+            'structural': structural
+        },
+        'data_coverage': {
+            'ml_forecasts': coverage.get('ml', 0),
+            'prog_forecasts': coverage.get('prog', 0),
+            'prog_raw': coverage.get('prog_raw', 0),
+            'actuals_hours': coverage.get('actuals', 0)
+        }
+    }
+
+
+def _utc_hours_between(forecast_datetime: str, target_datetime: str) -> int:
+    forecast_dt = datetime.fromisoformat(forecast_datetime.replace('Z', '+00:00'))
+    target_dt = datetime.fromisoformat(target_datetime.replace('Z', '+00:00'))
+    # Backwards forecasts get horizon 0 and are dropped with the other out-of-range ones
+    return max(int((target_dt - forecast_dt).total_seconds() // 3600), 0)
+
+
+def _heatmap(forecast_hours: np.ndarray, horizons: np.ndarray,
+             predicted: np.ndarray, actual: np.ndarray) -> Dict[str, Any]:
+    """Error matrix (cell mean of forecast - actual) and totals for one source"""
+    keep = (horizons >= 1) & (horizons <= HEATMAP_SIZE)
+    error = predicted[keep] - actual[keep]
+    has_actual = ~np.isnan(error)
+    cells = forecast_hours[keep][has_actual] * HEATMAP_SIZE + horizons[keep][has_actual] - 1
+
+    size = HEATMAP_SIZE * HEATMAP_SIZE
+    counts = np.bincount(cells, minlength=size)
+    sums = np.bincount(cells, weights=error[has_actual], minlength=size)
+    matrix = np.divide(sums, counts, out=np.full(size, np.nan), where=counts > 0)
+
+    return {
+        'matrix': [None if np.isnan(v) else float(v) for v in matrix],
+        'total_distance': float(np.abs(error[has_actual]).sum()),
+        'error_count': int(has_actual.sum()),
+        'forecast_count': int(keep.sum())
+    }
+
+
+def compute_day_heatmaps(ml_forecasts: List[Dict[str, Any]],
+                         prog_forecasts: List[Dict[str, Any]],
+                         cmg_online: List[Dict[str, Any]], day: str) -> Dict[str, Any]:
+    """
+    ML and CMG Programado 24×24 error matrices for forecasts made on `day`.
+
+    Cell [forecast_hour][horizon - 1] holds forecast - actual for the exact
+    target (date, hour), averaged over Programado nodes. Actuals are CMG
+    Online averaged across nodes.
+
+    Args:
+        ml_forecasts: ml_predictions_santiago rows (forecast_hour, horizon,
+                      target_date, target_hour, cmg_predicted)
+        prog_forecasts: cmg_programado_santiago rows (forecast_datetime,
+                        target_datetime, forecast_hour, target_date, target_hour, cmg_usd)
+        cmg_online: cmg_online_santiago rows (date, hour, cmg_usd) for `day`
+                    and the next day (t+24 forecasts target it)
+        day: The forecast date (YYYY-MM-DD)
+
+    Returns:
+        Dict with 'ml' and 'prog' stats (packed 'matrix', total_distance,
+        error_count, forecast_count), the hours of `day` with actuals and
+        the number of next-day hours with actuals
+    """
+    actuals_raw = defaultdict(list)
+    for record in cmg_online:
+        actuals_raw[(str(record['date']), record['hour'])].append(record['cmg_usd'])
+    actuals = {key: sum(values) / len(values) for key, values in actuals_raw.items()}
+
+    def actual_for(rows):
+        return np.array([actuals.get((str(r['target_date']), r['target_hour']), np.nan) for r in rows], dtype=float)
+
+    next_day = (date.fromisoformat(day) + timedelta(days=1)).isoformat()
+    return {
+        'ml': _heatmap(
+            np.array([r['forecast_hour'] for r in ml_forecasts], dtype=int),
+            np.array([r['horizon'] for r in ml_forecasts], dtype=int),
+            np.array([r['cmg_predicted'] for r in ml_forecasts], dtype=float),
+            actual_for(ml_forecasts)),
+        'prog': _heatmap(
+            np.array([r['forecast_hour'] for r in prog_forecasts], dtype=int),
+            np.array([_utc_hours_between(r['forecast_datetime'], r['target_datetime'])
+                      for r in prog_forecasts], dtype=int),
+            np.array([r['cmg_usd'] for r in prog_forecasts], dtype=float),
+            actual_for(prog_forecasts)),
+        'actual_hours': sorted(hour for (d, hour) in actuals if d == day),
+        'next_day_actual_hours': sum(1 for (d, _) in actuals if d == next_day)
+    }
+
+
+def heatmap_payload(stats: Dict[str, Any], actual_hours: List[int]) -> Dict[str, Any]:
+    """Format one source's packed heatmap stats for /api/performance_heatmap"""
+    matrix = stats['matrix']
+    error_count = stats['error_count']
+    average = stats['total_distance'] / error_count if error_count else 0
+    return {
+        'matrix': [matrix[row * HEATMAP_SIZE:(row + 1) * HEATMAP_SIZE] for row in range(HEATMAP_SIZE)],
+        'total_distance': round(stats['total_distance'], 2),
+        'average_distance': round(average, 2),
+        'forecast_count': stats['forecast_count'],
+        'error_count': error_count,
+        'actuals_available': len(actual_hours)
+    }
+
+
+def load_day_heatmaps(supabase, day: str) -> Dict[str, Any]:
+    """Fetch the forecasts made on `day` plus actuals and compute its heatmaps"""
+    next_day = (date.fromisoformat(day) + timedelta(days=1)).isoformat()
+
+    # ML (24 hours × 24 horizons), CMG Programado (24 hours × ~72 horizons)
+    # and actuals for the day and the next one, concurrently
+    results = supabase.fetch_tables({
+        'ml': ("ml_predictions_santiago", [
+            ("select", "forecast_hour,horizon,target_date,target_hour,cmg_predicted"),
+            ("forecast_date", f"eq.{day}"),
+        ], ('id',)),
+        'prog': ("cmg_programado_santiago", [
+            ("select", "forecast_datetime,target_datetime,forecast_hour,target_date,target_hour,cmg_usd"),
+            ("forecast_date", f"eq.{day}"),
+        ], ('id',)),
+        'online': ("cmg_online_santiago", [
+            ("select", "date,hour,cmg_usd"),
+            ("date", f"gte.{day}"),
+            ("date", f"lte.{next_day}"),
+        ], ('id',)),
+    })
+    return compute_day_heatmaps(results['ml'], results['prog'], results['online'], day)
+
+
+def pack_day_heatmaps(day: str, heatmaps: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """daily_heatmaps records for a compute_day_heatmaps() result"""
+    return [{
+        'date': day,
+        'source': source,
+        'actual_hours': heatmaps['actual_hours'],
+        **heatmaps[source]
+    } for source in ('ml', 'prog')]
+
+
+def unpack_day_heatmaps(rows: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """compute_day_heatmaps()-shaped dict from stored rows; None unless both sources are stored"""
+    by_source = {row['source']: row for row in rows}
+    if set(by_source) != {'ml', 'prog'}:
+        return None
+    heatmaps = {source: {
+        'matrix': row['matrix'],
+        'total_distance': row['total_distance'],
+        'error_count': row['error_count'],
+        'forecast_count': row['forecast_count']
+    } for source, row in by_source.items()}
+    heatmaps['actual_hours'] = sorted(by_source['ml']['actual_hours'])
+    return heatmaps
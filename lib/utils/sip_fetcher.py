@@ -0,0 +1,291 @@
+"""
+Concurrent SIP page fetcher with adaptive rate limiting
+
+SIP endpoints (costo-marginal-online/v4/findByDate) return a day as dozens
+of 4000-record pages. SIPPageFetcher keeps a bounded number of page requests
+in flight and stops submitting once the caller has what it needs (e.g.
+24/24 hours for every node) or the last page has been seen.
+
+All requests share a TokenBucket: its rate grows slowly while requests
+succeed and halves on every 429 (honouring Retry-After), so throughput
+settles just under the SIP rate limit instead of tripping it.
+
+Given the nodes a caller wants, pages are not decoded whole: filter_records()
+finds the node names in the raw body (in every way JSON may escape them)
+and decodes only the records that hold them (a handful out of 4000),
+counting the rest by their field key.
+
+Usage:
+    fetcher = SIPPageFetcher(api_key)
+    fetcher.fetch_pages(url, {'startDate': d, 'endDate': d}, on_page,
+                        done=lambda: all_nodes_complete(location_hours, nodes))
+"""
+
+import json
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Collection, Dict, Iterable, List, Optional, Tuple
+
+import requests
+
+PAGE_SIZE = 4000
+MAX_IN_FLIGHT = 4
+HOURS_PER_DAY = 24
+NODE_FIELD = 'barra_transf'
+# A single empty or failed page can be transient; this many in a row end the data
+EMPTY_PAGES_TO_STOP = 3
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket with AIMD rate adaptation.
+
+    acquire() blocks until a request may be sent. backoff() halves the rate
+    and pauses every caller (Retry-After, or one token interval); recover()
+    adds rate_step back per successful request, up to max_rate.
+    """
+
+    def __init__(self, rate: float = 2.0, capacity: float = 4.0, min_rate: float = 0.2,
+                 max_rate: float = 8.0, rate_step: float = 0.1,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.rate_step = rate_step
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = capacity
+        self._updated = clock()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Block until a token is available, then take it"""
+        while True:
+            with self._lock:
+                now = self._clock()
+                if now < self._paused_until:
+                    wait_time = self._paused_until - now
+                else:
+                    self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                    self._updated = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait_time = (1 - self._tokens) / self.rate
+            self._sleep(wait_time)
+
+    def backoff(self, retry_after: Optional[float] = None) -> None:
+        """Rate limited (429): halve the rate and pause all requests"""
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = 0
+            pause = retry_after if retry_after is not None else 1 / self.rate
+            self._paused_until = max(self._paused_until, self._clock() + pause)
+            self._updated = self._paused_until
+
+    def recover(self) -> None:
+        """Request succeeded: raise the rate additively"""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.rate_step)
+
+
+def _encodings(value: str) -> List[bytes]:
+    """
+    The ways a JSON encoder may write `value` as a string literal: raw UTF-8
+    or \\uXXXX escapes (either hex case), each with '/' plain or as '\\/'
+    (e.g. 'BA S/E CHONCHI 110KV BP1' may arrive as "BA S\\/E CHONCHI 110KV BP1").
+    """
+    escaped = json.dumps(value)
+    forms = {json.dumps(value, ensure_ascii=False), escaped,
+             re.sub(r'\\u[0-9a-f]{4}', lambda m: '\\u' + m.group()[2:].upper(), escaped)}
+    forms |= {form.replace('/', '\\/') for form in forms}
+    return [form.encode() for form in sorted(forms)]
+
+
+def filter_records(body: bytes, values: Collection[str],
+                   field: str = NODE_FIELD) -> Tuple[List[Dict], int]:
+    """
+    Records of a SIP page body whose `field` is one of `values`, decoding
+    only those records.
+
+    Each occurrence of a value in the body (any of its _encodings) is
+    widened to its enclosing flat record object, which is decoded and
+    checked. Falls back to decoding the whole body if a record can't be
+    isolated that way.
+
+    Returns:
+        (matching records in page order, total records on the page)
+    """
+    key = json.dumps(field).encode()
+    total = body.count(key)
+    matches = {}
+    try:
+        for value in values:
+            for needle in _encodings(value):
+                pos = body.find(needle)
+                while pos != -1:
+                    start = body.rfind(b'{', 0, pos)
+                    end = body.find(b'}', pos) + 1
+                    if start not in matches:
+                        record = json.loads(body[start:end])
+                        if record.get(field) == value:
+                            matches[start] = record
+                    pos = body.find(needle, end)
+    except ValueError:
+        records = json.loads(body).get('data', [])
+        return [r for r in records if r.get(field) in values], len(records)
+    return [matches[start] for start in sorted(matches)], total
+
+
+def all_nodes_complete(location_hours: Dict[str, set], nodes: Iterable[str],
+                       hours: Optional[Iterable[int]] = None) -> bool:
+    """True once every node has all 24 hours (or all of `hours`)"""
+    if hours is None:
+        return all(len(location_hours.get(node, ())) >= HOURS_PER_DAY for node in nodes)
+    hours = set(hours)
+    return all(hours <= location_hours.get(node, set()) for node in nodes)
+
+
+class SIPPageFetcher:
+    """Fetches SIP pages concurrently under a shared TokenBucket"""
+
+    def __init__(self, api_key: str, session: Optional[requests.Session] = None,
+                 bucket: Optional[TokenBucket] = None, max_in_flight: int = MAX_IN_FLIGHT,
+                 page_size: int = PAGE_SIZE, max_retries: int = 10, timeout: int = 60,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.api_key = api_key
+        self.session = session or requests.Session()
+        self.bucket = bucket or TokenBucket()
+        self.max_in_flight = max_in_flight
+        self.page_size = page_size
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self._sleep = sleep
+
+    def fetch_page(self, url: str, params: Dict[str, Any],
+                   nodes: Optional[Collection[str]] = None) -> Tuple[List[Dict], int, str]:
+        """
+        Fetch one page, retrying rate limits, server errors and timeouts.
+
+        Args:
+            nodes: Keep only these nodes' records (filtered before decoding)
+
+        Returns:
+            (records, count, status): count is the page's record count,
+            status is 'success', 'empty' or 'error'
+        """
+        params = {**params, 'limit': self.page_size, 'user_key': self.api_key}
+        wait_time = 2
+
+        for attempt in range(self.max_retries):
+            self.bucket.acquire()
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+            except Exception:
+                self._sleep(wait_time)
+                wait_time = min(wait_time * 1.5, 60)
+                continue
+
+            if response.status_code == 200:
+                self.bucket.recover()
+                if nodes is None:
+                    records = response.json().get('data', [])
+                    count = len(records)
+                else:
+                    records, count = filter_records(response.content, nodes)
+                return records, count, ('success' if count else 'empty')
+
+            if response.status_code == 429:
+                retry_after = response.headers.get('Retry-After')
+                self.bucket.backoff(float(retry_after) if retry_after and retry_after.isdigit() else None)
+            elif response.status_code >= 500:
+                self._sleep(wait_time)
+                wait_time = min(wait_time * 1.5, 60)
+            else:
+                # 403 (invalid key) and other client errors won't succeed on retry
+                return [], 0, 'error'
+
+        return [], 0, 'error'
+
+    def fetch_pages(self, url: str, params: Dict[str, Any],
+                    on_page: Callable[[int, List[Dict]], None],
+                    pages: Optional[Iterable[int]] = None, max_pages: int = 50,
+                    done: Optional[Callable[[], bool]] = None,
+                    nodes: Optional[Collection[str]] = None) -> Dict[str, Any]:
+        """
+        Fetch pages with up to max_in_flight requests in flight.
+
+        on_page(page, records) runs in the calling thread as pages complete
+        (not necessarily in page order). No new page is submitted once done()
+        returns True, and none past the last page is: a short page, or the
+        page before EMPTY_PAGES_TO_STOP consecutive empty or failed pages.
+
+        Args:
+            url: SIP endpoint
+            params: Query parameters other than page/limit/user_key
+            on_page: Callback for each page with records
+            pages: Page numbers in the order to request them (default 1..max_pages)
+            max_pages: Page limit when pages is not given
+            done: Early stop predicate, checked after every page
+            nodes: Pass only these nodes' records to on_page (see filter_records)
+
+        Returns:
+            Statistics: pages_fetched, total_records, failed_pages, last_page, stopped_early
+        """
+        pending = iter(pages if pages is not None else range(1, max_pages + 1))
+        stats = {'pages_fetched': [], 'total_records': 0, 'failed_pages': [],
+                 'last_page': None, 'stopped_early': False}
+
+        empty_pages = set()
+
+        def next_page() -> Optional[int]:
+            for page in pending:
+                if stats['last_page'] is None or page <= stats['last_page']:
+                    return page
+            return None
+
+        def mark_last(last: int) -> None:
+            if stats['last_page'] is None or last < stats['last_page']:
+                stats['last_page'] = last
+
+        def mark_empty(page: int) -> None:
+            empty_pages.add(page)
+            for first in range(page - EMPTY_PAGES_TO_STOP + 1, page + 1):
+                if all(first + i in empty_pages for i in range(EMPTY_PAGES_TO_STOP)):
+                    mark_last(first - 1)
+
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+            in_flight = {}
+            while True:
+                while len(in_flight) < self.max_in_flight and not stats['stopped_early']:
+                    page = next_page()
+                    if page is None:
+                        break
+                    in_flight[executor.submit(self.fetch_page, url, {**params, 'page': page}, nodes)] = page
+                if not in_flight:
+                    break
+
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    page = in_flight.pop(future)
+                    records, count, status = future.result()
+                    if status == 'success':
+                        stats['pages_fetched'].append(page)
+                        stats['total_records'] += count
+                        on_page(page, records)
+                        if count < self.page_size:
+                            mark_last(page)
+                    else:
+                        if status == 'error':
+                            stats['failed_pages'].append(page)
+                        mark_empty(page)
+
+                if done and done():
+                    stats['stopped_early'] = True
+
+        return stats
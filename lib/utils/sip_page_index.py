@@ -0,0 +1,103 @@
+"""
+Self-learning index of which SIP pages hold each node's records
+
+SIP findByDate pages hold thousands of nodes' records, in an order the API
+does not document, so fetchers used to scan from page 1 or guess fixed
+pages (OptimizedCMGFetcher.PRIORITY_PAGES, Chiloé "from page 4").
+
+SIPPageIndex records the page each (node, hour) was found on and persists
+it in data/cache/sip_page_index.json, one section per page size (page
+numbers only mean something for a given size). plan() orders a
+fetch by that history: the pages most (node, hour) pairs were last seen on
+first, then the caller's fallback order. Combined with SIPPageFetcher's
+done() predicate, a fetch only falls through to a full scan on misses.
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+INDEX_FILE = 'sip_page_index.json'
+MAX_HITS = 20  # Cap per page so a moved node re-ranks within a few fetches
+
+
+def _read_sections(path: Optional[Path]) -> Dict[str, Dict]:
+    if not path or not path.exists():
+        return {}
+    try:
+        with open(path, 'r') as f:
+            return json.load(f).get('pages', {})
+    except Exception as e:
+        print(f"⚠️ Ignoring unreadable SIP page index {path}: {e}")
+        return {}
+
+
+class SIPPageIndex:
+    """node -> hour -> {page: hits} for one page size (safe to share across fetch threads)"""
+
+    def __init__(self, path: Optional[Path] = None, page_size: int = 4000):
+        self.path = Path(path) if path else None
+        self.page_size = page_size
+        self._nodes: Dict[str, Dict[str, Dict[str, int]]] = _read_sections(self.path).get(str(page_size), {})
+        self.dirty = False
+        self._lock = threading.Lock()
+
+    def record(self, node: str, hour: int, page: int) -> None:
+        """Record that a (node, hour) record was found on page"""
+        page_key = str(page)
+        with self._lock:
+            pages = self._nodes.setdefault(node, {}).setdefault(str(hour), {})
+            # Decay the other pages so the latest location wins
+            for other in list(pages):
+                if other != page_key:
+                    pages[other] -= 1
+                    if pages[other] <= 0:
+                        del pages[other]
+            pages[page_key] = min(MAX_HITS, pages.get(page_key, 0) + 1)
+            self.dirty = True
+
+    def likely_pages(self, nodes: Iterable[str], hours: Iterable[int] = range(24)) -> List[int]:
+        """
+        Pages known to hold the requested (node, hour) pairs, best first.
+
+        Pages that are the top location of more pairs come first; ties go
+        to the lower page number.
+        """
+        hours = [str(h) for h in hours]
+        best_for, seen = {}, set()
+        with self._lock:
+            for node in nodes:
+                node_pages = self._nodes.get(node, {})
+                for hour in hours:
+                    pages = node_pages.get(hour)
+                    if not pages:
+                        continue
+                    best = max(pages.items(), key=lambda item: (item[1], -int(item[0])))[0]
+                    best_for[int(best)] = best_for.get(int(best), 0) + 1
+                    seen.update(int(p) for p in pages)
+
+        ranked = sorted(best_for, key=lambda p: (-best_for[p], p))
+        return ranked + sorted(seen - set(ranked))
+
+    def plan(self, nodes: Iterable[str], fallback: Iterable[int],
+             hours: Iterable[int] = range(24)) -> List[int]:
+        """Likely pages first, then the rest of fallback in its own order"""
+        likely = self.likely_pages(nodes, hours)
+        planned = set(likely)
+        return likely + [p for p in fallback if p not in planned]
+
+    def save(self) -> None:
+        """Persist this page size's section atomically if it changed"""
+        if not self.path or not self.dirty:
+            return
+        with self._lock:
+            sections = _read_sections(self.path)
+            sections[str(self.page_size)] = self._nodes
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix('.tmp')
+            with open(tmp_path, 'w') as f:
+                json.dump({'pages': sections}, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+            self.dirty = False
@@ -0,0 +1,233 @@
+"""
+SIP snapshot for the dashboard endpoint (api/index.py)
+
+The dashboard needs yesterday's Chiloé CMG Online series and the hourly
+pattern learned from it. Fetching that from the SIP API takes up to 10
+sequential page requests, so the hourly ingest job (smart_cmg_online_update.py)
+builds it once with build_snapshot() and writes it to data/cache/sip_snapshot.json.
+
+get_snapshot() serves it with stale-while-revalidate semantics: a fresh
+snapshot is returned as is, a stale one is returned immediately while a
+background thread rebuilds it (kept in memory and /tmp for warm instances),
+and the SIP API is only called synchronously when no snapshot exists at all.
+"""
+
+import json
+import os
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+import pytz
+
+from lib.utils.sip_fetcher import filter_records
+from lib.utils.sip_page_index import INDEX_FILE, SIPPageIndex
+
+SIP_BASE_URL = 'https://sipub.api.coordinador.cl:443'
+CHILOE_NODE = 'CHILOE________220'
+SNAPSHOT_FILE = 'sip_snapshot.json'
+PAGE_SIZE = 1000
+TMP_SNAPSHOT = Path(tempfile.gettempdir()) / SNAPSHOT_FILE
+FRESH_SECONDS = 2 * 3600  # Hourly producer, plus deploy lag
+
+SANTIAGO_TZ = pytz.timezone('America/Santiago')
+
+_lock = threading.Lock()
+_memory: Optional[Dict[str, Any]] = None
+_refreshing = False
+
+
+def fetch_node_records(date_str: str, api_key: str, node: str = CHILOE_NODE,
+                       start_page: int = 4, max_pages: int = 10, timeout: int = 8,
+                       page_index: Optional[SIPPageIndex] = None) -> Tuple[list, Dict[str, Any]]:
+    """
+    Fetch one node's CMG Online records for a date from the SIP API.
+
+    Requests the pages page_index has seen the node on first, then pages
+    start_page.. (Chiloé data usually starts at page 4), and stops once 24
+    records are found. Pages the node was found on are recorded in page_index.
+
+    Returns:
+        (records, fetch_info)
+    """
+    import requests
+
+    url = f"{SIP_BASE_URL}/costo-marginal-online/v4/findByDate"
+    fallback = range(start_page, max_pages + start_page)
+    pages = page_index.plan([node], fallback) if page_index else list(fallback)
+    records, pages_fetched, last_page = [], 0, None
+
+    for page in pages[:max_pages]:
+        if last_page is not None and page > last_page:
+            continue
+        params = {
+            'startDate': date_str,
+            'endDate': date_str,
+            'page': page,
+            'limit': PAGE_SIZE,
+            'user_key': api_key
+        }
+        try:
+            response = requests.get(url, params=params, timeout=timeout)
+            pages_fetched += 1
+            if response.status_code != 200:
+                break
+            # Decode only the node's records, not the whole page
+            matched, count = filter_records(response.content, [node])
+        except Exception:
+            break
+
+        records.extend(matched)
+        if page_index:
+            for r in matched:
+                page_index.record(node, int(r.get('fecha_hora', '00:00')[11:13]), page)
+        if len(records) >= 24:
+            break
+        if count < PAGE_SIZE:
+            last_page = page
+
+    fetch_info = {
+        'pages_fetched': pages_fetched,
+        'records_found': len(records),
+        'date_fetched': date_str
+    }
+    return records, fetch_info
+
+
+def build_snapshot(now: datetime, api_key: str,
+                   fetch: Callable[..., Tuple[list, Dict[str, Any]]] = fetch_node_records,
+                   page_index: Optional[SIPPageIndex] = None) -> Optional[Dict[str, Any]]:
+    """
+    Build the dashboard snapshot from yesterday's (more complete) SIP data.
+
+    Returns:
+        Snapshot with the sorted series (datetime, hour, cmg) and the median
+        CMG per hour, or None if the SIP API returned no records
+    """
+    yesterday = (now - timedelta(days=1)).strftime('%Y-%m-%d')
+    records, fetch_info = fetch(yesterday, api_key, page_index=page_index)
+    if not records:
+        return None
+
+    records.sort(key=lambda r: r.get('fecha_hora', ''))
+    series = [{
+        'datetime': r.get('fecha_hora'),
+        'hour': int(r.get('fecha_hora', '00:00')[11:13]),
+        # Field is cmg_usd_mwh_ not cmg
+        'cmg': float(r.get('cmg_usd_mwh_', r.get('cmg', 60)))
+    } for r in records]
+
+    by_hour = {}
+    for point in series:
+        by_hour.setdefault(point['hour'], []).append(point['cmg'])
+
+    return {
+        'generated_at': now.isoformat(),
+        'date': yesterday,
+        'node': CHILOE_NODE,
+        'series': series,
+        'hourly_patterns': {str(h): float(np.median(v)) for h, v in sorted(by_hour.items())},
+        'fetch_info': fetch_info
+    }
+
+
+def write_snapshot(snapshot: Dict[str, Any], path: Path) -> None:
+    """Write a snapshot atomically (readers never see a partial file)"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(snapshot, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _read(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+
+def load_snapshot(cache_dir: Optional[Path] = None) -> Optional[Dict[str, Any]]:
+    """Newest snapshot among memory, /tmp (revalidated) and the deployed cache"""
+    candidates = [_memory, _read(TMP_SNAPSHOT)]
+    if cache_dir is not None:
+        candidates.append(_read(Path(cache_dir) / SNAPSHOT_FILE))
+    candidates = [c for c in candidates if c and c.get('generated_at')]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda c: datetime.fromisoformat(c['generated_at']))
+
+
+def is_fresh(snapshot: Dict[str, Any], now: datetime) -> bool:
+    """True if the snapshot is recent and still covers yesterday"""
+    generated_at = datetime.fromisoformat(snapshot['generated_at'])
+    if generated_at.tzinfo is None:
+        generated_at = SANTIAGO_TZ.localize(generated_at)
+    yesterday = (now - timedelta(days=1)).strftime('%Y-%m-%d')
+    return (now - generated_at).total_seconds() < FRESH_SECONDS and snapshot.get('date') == yesterday
+
+
+def refresh_snapshot(now: datetime, api_key: str, build=build_snapshot) -> Optional[Dict[str, Any]]:
+    """Rebuild the snapshot and keep it in memory and /tmp"""
+    global _memory
+    snapshot = build(now, api_key)
+    if snapshot:
+        with _lock:
+            _memory = snapshot
+        try:
+            write_snapshot(snapshot, TMP_SNAPSHOT)
+        except Exception:
+            pass  # Memory copy still serves this instance
+    return snapshot
+
+
+def _revalidate(now: datetime, api_key: str, build) -> None:
+    global _refreshing
+    try:
+        refresh_snapshot(now, api_key, build)
+    except Exception as e:
+        print(f"⚠️ SIP snapshot refresh failed: {e}")
+    finally:
+        with _lock:
+            _refreshing = False
+
+
+def revalidate_in_background(now: datetime, api_key: str, build=build_snapshot) -> Optional[threading.Thread]:
+    """Start a background refresh unless one is already running"""
+    global _refreshing
+    with _lock:
+        if _refreshing:
+            return None
+        _refreshing = True
+    thread = threading.Thread(target=_revalidate, args=(now, api_key, build), daemon=True)
+    thread.start()
+    return thread
+
+
+def get_snapshot(now: datetime, api_key: Optional[str], cache_dir: Optional[Path] = None,
+                 build=None) -> Tuple[Optional[Dict[str, Any]], str]:
+    """
+    Stale-while-revalidate read of the dashboard snapshot.
+
+    Refreshes plan their pages from the deployed page index (read-only).
+
+    Returns:
+        (snapshot, state) where state is 'fresh', 'stale' (served while a
+        background refresh runs) or 'miss' (built synchronously, may be None)
+    """
+    if build is None:
+        page_index = SIPPageIndex(Path(cache_dir) / INDEX_FILE, PAGE_SIZE) if cache_dir is not None else None
+        build = partial(build_snapshot, page_index=page_index)
+    snapshot = load_snapshot(cache_dir)
+    if snapshot is None:
+        return (refresh_snapshot(now, api_key, build) if api_key else None), 'miss'
+    if is_fresh(snapshot, now):
+        return snapshot, 'fresh'
+    if api_key:
+        revalidate_in_background(now, api_key, build)
+    return snapshot, 'stale'
@@ -13,14 +13,86 @@ Replaces GitHub Gist storage to avoid rate limiting.
 import os
 import requests
 import json
-from datetime import datetime, date
-from typing import List, Dict, Any, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, date, timedelta
+from typing import List, Dict, Any, Iterator, Optional, Sequence, Tuple
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import pytz
 
+# PostgREST returns at most max-rows (1000 on Supabase) rows per request
+PAGE_SIZE = 1000
+
+# Bulk exports: days per slice and slices fetched concurrently
+EXPORT_SLICE_DAYS = 7
+EXPORT_WORKERS = 8
+
+# API reads: pages fetched concurrently per table (x3 tables stays within POOL_SIZE)
+FETCH_WORKERS = 3
+
+# Shared HTTP session: pooled keep-alive connections, retries with backoff
+POOL_SIZE = int(os.environ.get('SUPABASE_POOL_SIZE', max(10, EXPORT_WORKERS)))
+MAX_RETRIES = int(os.environ.get('SUPABASE_MAX_RETRIES', 3))
+RETRY_STATUS = (429, 500, 502, 503, 504)
+DEFAULT_TIMEOUT = (5, 60)  # (connect, read) seconds, per call
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """
+    Process-wide pooled session (keep-alive, gzip, retries on 429/5xx).
+
+    Created once per process, so every SupabaseClient and every warm
+    serverless invocation reuses the same TCP/TLS connections.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = Retry(
+                total=MAX_RETRIES,
+                backoff_factor=0.5,
+                status_forcelist=RETRY_STATUS,
+                # Writes are upserts (merge-duplicates) or PATCHes, so resending is safe
+                allowed_methods=frozenset(['GET', 'POST', 'PATCH']),
+                respect_retry_after_header=True,
+                raise_on_status=False  # Hand the last response back to the caller
+            )
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=retry)
+            session = requests.Session()
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            session.headers['Accept-Encoding'] = 'gzip'
+            _session = session
+        return _session
+
+
+def _quote(value: Any) -> str:
+    """PostgREST logic-tree value (strings quoted: timestamps and node codes contain . and :)"""
+    if isinstance(value, str):
+        return '"' + value.replace('"', '\\"') + '"'
+    return str(value)
+
+
+def keyset_filter(keys: Sequence[str], values: Sequence[Any]) -> str:
+    """
+    PostgREST or=() filter for rows strictly after `values` in `keys` order.
+
+    (a, b) > (x, y)  ->  (a.gt.x,and(a.eq.x,b.gt.y))
+    """
+    terms = []
+    for i, key in enumerate(keys):
+        conditions = [f"{k}.eq.{_quote(v)}" for k, v in zip(keys[:i], values[:i])]
+        conditions.append(f"{key}.gt.{_quote(values[i])}")
+        terms.append(conditions[0] if len(conditions) == 1 else f"and({','.join(conditions)})")
+    return f"({','.join(terms)})"
+
 class SupabaseClient:
     """Client for interacting with Supabase PostgreSQL database"""
     
-    def __init__(self):
+    def __init__(self, timeout=DEFAULT_TIMEOUT):
         """Initialize Supabase client with credentials from environment"""
         self.supabase_url = os.environ.get('SUPABASE_URL')
         self.supabase_key = os.environ.get('SUPABASE_SERVICE_KEY')  # Use service_role key for writes
@@ -37,6 +109,10 @@ class SupabaseClient:
             "Content-Type": "application/json",
             "Prefer": "return=minimal"  # Don't return inserted data by default
         }
+
+        # Pooled session shared by all clients; timeout applies to every call
+        self.session = get_session()
+        self.timeout = timeout
     
     # ========================================
     # CMG ONLINE (HISTORICAL DATA)
@@ -64,7 +140,7 @@ class SupabaseClient:
             headers = self.headers.copy()
             headers["Prefer"] = "resolution=merge-duplicates,return=minimal"
 
-            response = requests.post(url, json=records, headers=headers)
+            response = self.session.post(url, json=records, headers=headers, timeout=self.timeout)
 
             if response.status_code in [200, 201, 204]:
                 print(f"✅ Inserted {len(records)} CMG Online records")
@@ -86,7 +162,8 @@ class SupabaseClient:
         start_date: Optional[str] = None,
         end_date: Optional[str] = None,
         node: Optional[str] = None,
-        limit: int = 1000
+        limit: int = 1000,
+        select: str = "*"
     ) -> List[Dict[str, Any]]:
         """
         Get CMG Online records with optional filters.
@@ -96,6 +173,7 @@ class SupabaseClient:
             end_date: Filter by date <= this (YYYY-MM-DD)
             node: Filter by specific node
             limit: Max records to return
+            select: Columns to return (PostgREST select list)
         
         Returns:
             List of CMG Online records
@@ -105,7 +183,7 @@ class SupabaseClient:
 
             # Build params as list of tuples to allow multiple values for same key
             # This is required for PostgREST to AND multiple filters on the same column
-            params = [("order", "datetime.desc"), ("limit", limit)]
+            params = [("select", select), ("order", "datetime.desc"), ("limit", limit)]
 
             # Handle date range filters properly (PostgREST syntax)
             if start_date:
@@ -116,7 +194,7 @@ class SupabaseClient:
             if node:
                 params.append(("node", f"eq.{node}"))
 
-            response = requests.get(url, params=params, headers=self.headers)
+            response = self.session.get(url, params=params, headers=self.headers, timeout=self.timeout)
             
             if response.status_code == 200:
                 return response.json()
@@ -158,7 +236,7 @@ class SupabaseClient:
             headers = self.headers.copy()
             headers["Prefer"] = "resolution=merge-duplicates,return=minimal"
 
-            response = requests.post(url, json=records, headers=headers)
+            response = self.session.post(url, json=records, headers=headers, timeout=self.timeout)
 
             if response.status_code in [200, 201, 204]:
                 return True
@@ -193,7 +271,8 @@ class SupabaseClient:
         end_date: Optional[str] = None,
         node: Optional[str] = None,
         limit: int = 10000,
-        latest_forecast_only: bool = True
+        latest_forecast_only: bool = True,
+        select: str = "*"
     ) -> List[Dict[str, Any]]:
         """
         Get CMG Programado forecast records.
@@ -204,6 +283,7 @@ class SupabaseClient:
             node: Filter by specific node
             limit: Max records to return
             latest_forecast_only: If True, only return records from the latest forecast (prevents duplicates)
+            select: Columns to return (PostgREST select list)
 
         Returns:
             List of forecast records with forecast_datetime and target_datetime
@@ -221,7 +301,7 @@ class SupabaseClient:
                 if node:
                     params_latest.append(("node", f"eq.{node}"))
 
-                response_latest = requests.get(url, params=params_latest, headers=self.headers)
+                response_latest = self.session.get(url, params=params_latest, headers=self.headers, timeout=self.timeout)
 
                 if response_latest.status_code != 200 or not response_latest.json():
                     print("⚠️ No forecasts found")
@@ -231,13 +311,14 @@ class SupabaseClient:
 
                 # STEP 2: Get all records from this specific forecast
                 params = [
+                    ("select", select),
                     ("forecast_datetime", f"eq.{latest_forecast_dt}"),
                     ("order", "target_datetime.asc"),
                     ("limit", limit)
                 ]
             else:
                 # Original behavior: get multiple forecasts (may contain duplicates)
-                params = [("order", "forecast_datetime.desc,target_datetime.asc"), ("limit", limit)]
+                params = [("select", select), ("order", "forecast_datetime.desc,target_datetime.asc"), ("limit", limit)]
 
             # Handle date range filters properly (PostgREST syntax)
             if start_date:
@@ -247,7 +328,7 @@ class SupabaseClient:
             if node:
                 params.append(("node", f"eq.{node}"))
 
-            response = requests.get(url, params=params, headers=self.headers)
+            response = self.session.get(url, params=params, headers=self.headers, timeout=self.timeout)
 
             if response.status_code == 200:
                 return response.json()
@@ -282,7 +363,7 @@ class SupabaseClient:
             headers = self.headers.copy()
             headers["Prefer"] = "resolution=merge-duplicates,return=minimal"
 
-            response = requests.post(url, json=records, headers=headers)
+            response = self.session.post(url, json=records, headers=headers, timeout=self.timeout)
 
             if response.status_code in [200, 201, 204]:
                 print(f"✅ Inserted {len(records)} ML prediction records")
@@ -299,18 +380,21 @@ class SupabaseClient:
             print(f"❌ Error inserting ML predictions: {e}")
             return False
     
-    def get_nodes(self) -> List[Dict[str, Any]]:
+    def get_nodes(self, select: str = "*") -> List[Dict[str, Any]]:
         """
         Get all nodes from the nodes table.
 
+        Args:
+            select: Columns to return (PostgREST select list)
+
         Returns:
             List of node records with id, code, name, etc.
         """
         try:
             url = f"{self.base_url}/nodes"
-            params = {"order": "code.asc"}
+            params = {"select": select, "order": "code.asc"}
 
-            response = requests.get(url, params=params, headers=self.headers)
+            response = self.session.get(url, params=params, headers=self.headers, timeout=self.timeout)
 
             if response.status_code == 200:
                 return response.json()
@@ -328,13 +412,17 @@ class SupabaseClient:
         Returns:
             Dict mapping node codes to their IDs
         """
-        nodes = self.get_nodes()
+        nodes = self.get_nodes(select="id,code")
         return {node['code']: node['id'] for node in nodes}
 
-    def get_latest_ml_predictions(self, limit: int = 24) -> List[Dict[str, Any]]:
+    def get_latest_ml_predictions(self, limit: int = 24, select: str = "*") -> List[Dict[str, Any]]:
         """
         Get the most recent ML forecast (latest 24 predictions).
 
+        Args:
+            limit: Max records to return
+            select: Columns to return (PostgREST select list)
+
         Returns:
             List of ML prediction records from most recent forecast
         """
@@ -347,7 +435,7 @@ class SupabaseClient:
                 "limit": 1
             }
 
-            response = requests.get(url, params=params, headers=self.headers)
+            response = self.session.get(url, params=params, headers=self.headers, timeout=self.timeout)
 
             if response.status_code != 200 or not response.json():
                 print("❌ No ML predictions found")
@@ -357,12 +445,13 @@ class SupabaseClient:
 
             # Now get all predictions from that forecast
             params = {
+                "select": select,
                 "forecast_datetime": f"eq.{latest_forecast}",
                 "order": "target_datetime.asc",
                 "limit": limit
             }
 
-            response = requests.get(url, params=params, headers=self.headers)
+            response = self.session.get(url, params=params, headers=self.headers, timeout=self.timeout)
 
             if response.status_code == 200:
                 return response.json()
@@ -377,7 +466,8 @@ class SupabaseClient:
         self,
         start_date: Optional[str] = None,
         end_date: Optional[str] = None,
-        limit: int = 10000
+        limit: int = 10000,
+        select: str = "*"
     ) -> List[Dict[str, Any]]:
         """
         Get ML predictions with date range filtering.
@@ -386,6 +476,7 @@ class SupabaseClient:
             start_date: Filter by target_datetime >= this (YYYY-MM-DD)
             end_date: Filter by target_datetime <= this (YYYY-MM-DD)
             limit: Max records to return
+            select: Columns to return (PostgREST select list)
 
         Returns:
             List of ML prediction records
@@ -395,6 +486,7 @@ class SupabaseClient:
 
             # Build params as list of tuples to allow multiple values for same key
             params = [
+                ("select", select),
                 ("order", "forecast_datetime.desc,target_datetime.asc"),
                 ("limit", limit)
             ]
@@ -405,7 +497,7 @@ class SupabaseClient:
             if end_date:
                 params.append(("target_datetime", f"lte.{end_date}"))
 
-            response = requests.get(url, params=params, headers=self.headers)
+            response = self.session.get(url, params=params, headers=self.headers, timeout=self.timeout)
 
             if response.status_code == 200:
                 return response.json()
@@ -416,6 +508,431 @@ class SupabaseClient:
             print(f"❌ Error getting ML predictions: {e}")
             return []
 
+    # ========================================
+    # FORECAST ERRORS (ROLLUP, MIGRATION 007)
+    # ========================================
+
+    def upsert_forecast_errors(self, records: List[Dict[str, Any]]) -> bool:
+        """
+        Upsert forecast error rows, keyed by (forecast_datetime, horizon, source, node).
+
+        Args:
+            records: List of dicts with keys:
+                     source, node, forecast_datetime, target_datetime, horizon,
+                     forecast_date, forecast_hour, target_date, target_hour,
+                     predicted, actual, error
+
+        Returns:
+            True if successful
+        """
+        try:
+            url = f"{self.base_url}/forecast_errors?on_conflict=forecast_datetime,horizon,source,node"
+            headers = self.headers.copy()
+            headers["Prefer"] = "resolution=merge-duplicates,return=minimal"
+
+            response = self.session.post(url, json=records, headers=headers, timeout=self.timeout)
+
+            if response.status_code in [200, 201, 204]:
+                return True
+            else:
+                print(f"❌ Failed to upsert forecast errors: {response.status_code}")
+                print(f"   Response: {response.text}")
+                return False
+        except Exception as e:
+            print(f"❌ Error upserting forecast errors: {e}")
+            return False
+
+    def delete_forecast_errors_before(self, updated_before: str) -> bool:
+        """Delete forecast error rows last written before `updated_before` (ISO timestamp)"""
+        try:
+            url = f"{self.base_url}/forecast_errors"
+            params = {"updated_at": f"lt.{updated_before}"}
+
+            response = self.session.delete(url, params=params, headers=self.headers, timeout=self.timeout)
+
+            if response.status_code in [200, 204]:
+                return True
+            else:
+                print(f"❌ Failed to delete stale forecast errors: {response.status_code}")
+                return False
+        except Exception as e:
+            print(f"❌ Error deleting stale forecast errors: {e}")
+            return False
+
+    # ========================================
+    # DAILY HEATMAPS (MIGRATION 008)
+    # ========================================
+
+    def upsert_daily_heatmaps(self, records: List[Dict[str, Any]]) -> bool:
+        """
+        Upsert precomputed heatmaps, keyed by (date, source).
+
+        Args:
+            records: List of dicts with keys:
+                     date, source, matrix (576 values, packed row-major),
+                     total_distance, error_count, forecast_count, actual_hours
+
+        Returns:
+            True if successful
+        """
+        try:
+            url = f"{self.base_url}/daily_heatmaps?on_conflict=date,source"
+            headers = self.headers.copy()
+            headers["Prefer"] = "resolution=merge-duplicates,return=minimal"
+
+            response = self.session.post(url, json=records, headers=headers, timeout=self.timeout)
+
+            if response.status_code in [200, 201, 204]:
+                return True
+            else:
+                print(f"❌ Failed to upsert daily heatmaps: {response.status_code}")
+                print(f"   Response: {response.text}")
+                return False
+        except Exception as e:
+            print(f"❌ Error upserting daily heatmaps: {e}")
+            return False
+
+    def get_daily_heatmaps(self, start_date: str, end_date: Optional[str] = None,
+                           select: str = "*") -> List[Dict[str, Any]]:
+        """
+        Stored heatmaps for forecast dates in [start_date, end_date].
+
+        Returns:
+            daily_heatmaps rows (empty if none, or if the table does not exist)
+        """
+        try:
+            url = f"{self.base_url}/daily_heatmaps"
+            params = [
+                ("select", select),
+                ("date", f"gte.{start_date}"),
+                ("date", f"lte.{end_date or start_date}"),
+                ("order", "date.asc,source.asc")
+            ]
+
+            response = self.session.get(url, params=params, headers=self.headers, timeout=self.timeout)
+
+            if response.status_code == 200:
+                return response.json()
+            else:
+                print(f"⚠️ Failed to get daily heatmaps: {response.status_code}")
+                return []
+        except Exception as e:
+            print(f"❌ Error getting daily heatmaps: {e}")
+            return []
+
+    # ========================================
+    # FORECAST RUNS INDEX (MIGRATION 009)
+    # ========================================
+
+    def refresh_forecast_runs(self, source: str, forecast_datetimes: List[str]) -> Optional[int]:
+        """
+        Recount the horizons of forecast runs just written and upsert them
+        into forecast_runs.
+
+        Args:
+            source: 'ml' or 'prog'
+            forecast_datetimes: ISO timestamps of the runs written
+
+        Returns:
+            Number of runs refreshed, or None if the index is not deployed
+        """
+        return self.rpc('refresh_forecast_runs', {
+            'p_source': source,
+            'p_forecast_datetimes': sorted(set(forecast_datetimes))
+        })
+
+    def get_forecast_runs(self, start_date: str, end_date: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Forecast runs (source, forecast_date, forecast_hour, horizon_count)
+        made between start_date and end_date (Santiago dates, inclusive).
+
+        Returns:
+            Runs, or None if the forecast_runs table is not deployed
+        """
+        url = f"{self.base_url}/forecast_runs"
+        params = [
+            ("select", "source,forecast_date,forecast_hour,horizon_count"),
+            ("forecast_date", f"gte.{start_date}"),
+            ("forecast_date", f"lte.{end_date}"),
+        ]
+        response = self.session.get(url, params=params, headers=self.headers, timeout=self.timeout)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.json()
+
+    # ========================================
+    # PAGED READS (API HANDLERS, EXPORTS)
+    # ========================================
+
+    def iter_pages(
+        self,
+        table: str,
+        params: List[Tuple[str, Any]],
+        keys: Sequence[str],
+        page_size: int = PAGE_SIZE
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Yield a query's rows page by page using keyset (cursor) pagination.
+
+        Rows are ordered by `keys`, and each page continues strictly after
+        the last row of the previous one (keyset_filter) instead of using
+        OFFSET. Every request costs the same however deep the scan goes,
+        and rows inserted mid-scan cannot shift pages into skipped or
+        duplicated rows.
+
+        Args:
+            table: Table or view name
+            params: PostgREST filters/select (no order/limit/offset)
+            keys: Columns that are unique together, e.g.
+                  ('forecast_datetime', 'target_datetime') or ('datetime', 'node')
+            page_size: Rows requested per page. A server max-rows cap below it
+                       only makes pages shorter: the scan ends on an empty page,
+                       never on a short one
+
+        Raises:
+            requests.HTTPError if a page fails
+        """
+        url = f"{self.base_url}/{table}"
+        keys = list(keys)
+        params = list(params)
+        for i, (name, value) in enumerate(params):
+            if name == 'select' and value != '*':
+                columns = value.split(',')
+                params[i] = ('select', ','.join(columns + [k for k in keys if k not in columns]))
+        params.append(("order", ','.join(f"{k}.asc" for k in keys)))
+        params.append(("limit", page_size))
+
+        after = None
+        while True:
+            page_params = params if after is None else params + [("or", keyset_filter(keys, after))]
+            response = self.session.get(url, params=page_params, headers=self.headers, timeout=self.timeout)
+            response.raise_for_status()
+            page = response.json()
+            if not page:
+                return
+            yield page
+            after = [page[-1][k] for k in keys]
+
+    def fetch_all(
+        self,
+        table: str,
+        params: List[Tuple[str, Any]],
+        page_size: int = PAGE_SIZE,
+        max_rows: Optional[int] = None,
+        max_workers: int = FETCH_WORKERS,
+        keys: Optional[Sequence[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Every row of a query.
+
+        With `keys` the rows are paged sequentially with iter_pages(), which is
+        consistent under concurrent inserts. Without `keys` the first page is
+        requested with Prefer: count=exact, and the total in its Content-Range
+        header ("0-999/48213") gives the remaining offsets, which are fetched
+        concurrently. In that case `params` must include an order so that
+        pages are stable.
+
+        Args:
+            table: Table or view name
+            params: PostgREST filters/select/order (no limit/offset)
+            page_size: Rows per request (PostgREST max-rows)
+            max_rows: Stop after this many rows
+            max_workers: Pages fetched concurrently (offset paging only)
+            keys: Unique key columns for keyset paging (see iter_pages)
+
+        Returns:
+            Rows in query order
+
+        Raises:
+            requests.HTTPError if any page fails (a partial result is never returned)
+        """
+        if keys:
+            rows = []
+            for page in self.iter_pages(table, params, keys, page_size):
+                rows.extend(page)
+                if max_rows is not None and len(rows) >= max_rows:
+                    break
+            return rows[:max_rows] if max_rows is not None else rows
+
+        url = f"{self.base_url}/{table}"
+
+        def fetch_page(offset: int, headers: Dict[str, str] = self.headers):
+            page_params = list(params) + [("limit", page_size), ("offset", offset)]
+            response = self.session.get(url, params=page_params, headers=headers, timeout=self.timeout)
+            response.raise_for_status()
+            return response
+
+        first = fetch_page(0, {**self.headers, "Prefer": "count=exact"})
+        rows = first.json()
+
+        total = first.headers.get('Content-Range', '*/*').rsplit('/', 1)[-1]
+        total = int(total) if total.isdigit() else None
+        if max_rows is not None:
+            total = min(total, max_rows) if total is not None else max_rows
+
+        if total is None:
+            # Count unavailable: page sequentially until an empty page
+            while rows:
+                batch = fetch_page(len(rows)).json()
+                if not batch:
+                    break
+                rows.extend(batch)
+        else:
+            # Step by the first page's length: a server max-rows below page_size caps every page
+            offsets = range(len(rows), total, len(rows)) if rows else []
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                for response in executor.map(fetch_page, offsets):
+                    rows.extend(response.json())
+
+        return rows[:max_rows] if max_rows is not None else rows
+
+    def fetch_tables(self, queries: Dict[str, Tuple], **kwargs) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Run several fetch_all() queries at the same time.
+
+        Args:
+            queries: name -> (table, params) or (table, params, keys)
+            **kwargs: Passed to fetch_all() (page_size, max_rows, max_workers)
+
+        Returns:
+            name -> rows, so latency is bounded by the slowest query, not the sum
+
+        Raises:
+            requests.HTTPError if any query fails
+        """
+        with ThreadPoolExecutor(max_workers=len(queries)) as executor:
+            futures = {
+                name: executor.submit(self.fetch_all, query[0], query[1],
+                                      keys=query[2] if len(query) > 2 else None, **kwargs)
+                for name, query in queries.items()
+            }
+            return {name: future.result() for name, future in futures.items()}
+
+    # ========================================
+    # BULK EXPORT (TRAINING / ANALYTICS)
+    # ========================================
+
+    def export_range(
+        self,
+        table: str,
+        date_column: str,
+        start_date: str,
+        end_date: str,
+        filters: Optional[List[Tuple[str, str]]] = None,
+        select: str = '*',
+        slice_days: int = EXPORT_SLICE_DAYS,
+        max_workers: int = EXPORT_WORKERS
+    ):
+        """
+        Every row with start_date <= date_column <= end_date, as a pandas DataFrame.
+
+        The range is split into slice_days slices that are fetched concurrently,
+        each one keyset-paginated, so the result is complete regardless of the
+        PostgREST row cap. Unlike the get_* methods this raises on failure
+        instead of returning a partial range.
+
+        Args:
+            table: Table name (must have an `id` primary key)
+            date_column: DATE column used for slicing (e.g. date, target_date)
+            start_date: First date (YYYY-MM-DD)
+            end_date: Last date, inclusive (YYYY-MM-DD)
+            filters: Extra PostgREST filters, e.g. [("node", "eq.NVA_P.MONTT___220")]
+            select: Column list
+            slice_days: Days per slice
+            max_workers: Slices fetched concurrently
+
+        Returns:
+            DataFrame with one row per record (ordered by slice, then id)
+        """
+        import pandas as pd  # Only needed by training/analytics, not the API
+
+        first = date.fromisoformat(str(start_date)[:10])
+        last = date.fromisoformat(str(end_date)[:10])
+        slices = []
+        while first <= last:
+            slice_end = min(first + timedelta(days=slice_days - 1), last)
+            slices.append((first, slice_end))
+            first = slice_end + timedelta(days=1)
+
+        def fetch_slice(bounds):
+            lo, hi = bounds
+            slice_filters = [(date_column, f"gte.{lo}"), (date_column, f"lte.{hi}")] + list(filters or [])
+            return pd.DataFrame.from_records(
+                [row for page in self.iter_pages(table, slice_filters + [("select", select)], ('id',)) for row in page]
+            )
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            frames = [f for f in executor.map(fetch_slice, slices) if not f.empty]
+
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True)
+
+    def export_updated_since(self, table: str, updated_at: str,
+                             filters: Optional[List[Tuple[str, str]]] = None, select: str = '*'):
+        """
+        Every row with updated_at >= `updated_at` (an ISO timestamp), as a pandas DataFrame.
+
+        Inclusive, so rows sharing the watermark are fetched again; callers
+        dedupe on id. Keyset-paginated like export_range().
+        """
+        import pandas as pd
+
+        params = [("updated_at", f"gte.{updated_at}"), ("select", select)] + list(filters or [])
+        return pd.DataFrame.from_records([row for page in self.iter_pages(table, params, ('id',)) for row in page])
+
+    def export_cmg_online(self, start_date: str, end_date: str, node: Optional[str] = None,
+                          select: str = '*'):
+        """All CMG Online rows with start_date <= date <= end_date (see export_range)"""
+        filters = [("node", f"eq.{node}")] if node else []
+        return self.export_range('cmg_online', 'date', start_date, end_date, filters, select)
+
+    def export_cmg_programado(self, start_date: str, end_date: str, node: Optional[str] = None,
+                              select: str = '*'):
+        """All CMG Programado rows (every forecast) with start_date <= target_date <= end_date"""
+        filters = [("node", f"eq.{node}")] if node else []
+        return self.export_range('cmg_programado', 'target_date', start_date, end_date, filters, select)
+
+    def export_ml_predictions(self, start_date: str, end_date: str, select: str = '*'):
+        """All ML prediction rows with start_date <= target_date <= end_date"""
+        return self.export_range('ml_predictions', 'target_date', start_date, end_date, select=select)
+
+    # ========================================
+    # RPC (SERVER-SIDE AGGREGATES)
+    # ========================================
+
+    def rpc(self, function: str, params: Dict[str, Any]) -> Optional[Any]:
+        """
+        Call a Postgres function through PostgREST (POST /rpc/<function>).
+
+        Returns:
+            The decoded JSON result, or None if the function is not deployed
+            (its migration has not run yet), so callers can fall back
+        """
+        url = f"{self.base_url}/rpc/{function}"
+        response = self.session.post(url, json=params, headers=self.headers, timeout=self.timeout)
+        if response.status_code == 404:
+            print(f"⚠️ RPC {function} not found, run its migration to enable it")
+            return None
+        response.raise_for_status()
+        return response.json()
+
+    def get_range_performance(self, start_date: str, end_date: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Forecast distance sums and counts by day and horizon (migration 006).
+
+        Returns:
+            Rows of (dimension, source, bucket_date, horizon, distance_sum,
+            error_count), or None if range_performance_metrics is not deployed
+            or the call fails (callers aggregate the raw rows instead)
+        """
+        try:
+            return self.rpc('range_performance_metrics', {'p_start_date': start_date, 'p_end_date': end_date})
+        except Exception as e:
+            print(f"⚠️ RPC range_performance_metrics failed, falling back: {e}")
+            return None
+
     # ========================================
     # METADATA
     # ========================================
@@ -430,7 +947,7 @@ class SupabaseClient:
                 "updated_at": datetime.now(pytz.UTC).isoformat()
             }
             
-            response = requests.patch(url, params=params, json=data, headers=self.headers)
+            response = self.session.patch(url, params=params, json=data, headers=self.headers, timeout=self.timeout)
             
             if response.status_code in [200, 201, 204]:
                 print(f"✅ Updated metadata: {key}")
@@ -517,6 +1034,14 @@ class SupabaseClient:
         }
 
 
+_client: Optional[SupabaseClient] = None
+_client_lock = threading.Lock()
+
+
 def get_supabase_client() -> SupabaseClient:
-    """Get initialized Supabase client"""
-    return SupabaseClient()
+    """Get the process-wide Supabase client (reused across warm invocations)"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = SupabaseClient()
+        return _client
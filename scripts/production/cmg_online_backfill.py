@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+CMG Online Backfill
+===================
+
+Fetches CMG Online history from the SIP API for a date range and node set
+and upserts it into Supabase (cmg_online), several dates at a time.
+
+Each (date, node) unit is appended to a local journal once its records are
+upserted, so an interrupted run resumes where it stopped: rerunning the same
+command skips journaled units. All dates share smart_cmg_online_update's SIP
+fetcher, whose token bucket rate-limits the whole run.
+
+Usage:
+    python scripts/production/cmg_online_backfill.py --start 2025-09-01 --end 2025-10-31
+    python scripts/production/cmg_online_backfill.py --start 2025-09-01 --end 2025-09-30 \\
+        --nodes PIDPID________110 --workers 4
+    python scripts/production/cmg_online_backfill.py --start 2025-09-01 --end 2025-10-31 \\
+        --redo-incomplete    # also retry units journaled with < 24 hours
+
+    from cmg_online_backfill import BackfillJournal, run_backfill
+    run_backfill(days, nodes, fetch_day, write_records, BackfillJournal(path))
+"""
+
+import os
+import sys
+import json
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import pytz
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+JOURNAL_FILE = Path('data/backfill/cmg_online_backfill.jsonl')
+MAX_WORKERS = 3
+BATCH_SIZE = 100
+HOURS_PER_DAY = 24
+
+
+class BackfillJournal:
+    """Append-only JSON-lines journal of completed (date, node) units"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.units: Dict[tuple, int] = {}
+        self._lock = threading.Lock()
+        if self.path.exists():
+            content = self.path.read_bytes()
+            if content and not content.endswith(b'\n'):
+                # Drop a torn last line from an interrupted run so the next
+                # entry starts on a line of its own
+                content = content[:content.rfind(b'\n') + 1]
+                with open(self.path, 'r+b') as f:
+                    f.truncate(len(content))
+            for line in content.decode().splitlines():
+                entry = json.loads(line)
+                self.units[(entry['date'], entry['node'])] = entry['hours']
+
+    def is_done(self, day: str, node: str, redo_incomplete: bool = False) -> bool:
+        hours = self.units.get((day, node))
+        return hours is not None and not (redo_incomplete and hours < HOURS_PER_DAY)
+
+    def mark(self, day: str, node: str, hours: int) -> None:
+        """Record a completed unit (flushed to disk before returning)"""
+        entry = {'date': day, 'node': node, 'hours': hours,
+                 'completed_at': datetime.now(pytz.UTC).isoformat()}
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(entry) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            self.units[(day, node)] = hours
+
+
+def date_range(start: str, end: str) -> List[str]:
+    """Dates from start to end (inclusive) as YYYY-MM-DD"""
+    first, last = date.fromisoformat(start), date.fromisoformat(end)
+    return [(first + timedelta(days=i)).isoformat() for i in range((last - first).days + 1)]
+
+
+def run_backfill(days: List[str], nodes: List[str],
+                 fetch_day: Callable[[str, List[str]], List[Dict[str, Any]]],
+                 write_records: Callable[[str, List[Dict[str, Any]]], None],
+                 journal: BackfillJournal, workers: int = MAX_WORKERS,
+                 redo_incomplete: bool = False) -> Dict[str, Any]:
+    """
+    Backfill every (date, node) unit not in the journal.
+
+    Args:
+        days, nodes: The units to backfill
+        fetch_day: fetch_day(day, nodes) -> records with 'node' and 'hour',
+                   run for up to `workers` dates at a time
+        write_records: write_records(day, records), called in this thread as
+                       each date's fetch completes; raises on failure
+        journal: Completed units; updated after each successful write
+        redo_incomplete: Also redo units journaled with fewer than 24 hours
+
+    Returns:
+        Summary: units_skipped, units_done, incomplete_units, records, failed_dates
+    """
+    pending = {}
+    for day in days:
+        day_nodes = [n for n in nodes if not journal.is_done(day, n, redo_incomplete)]
+        if day_nodes:
+            pending[day] = day_nodes
+
+    summary = {
+        'units_skipped': len(days) * len(nodes) - sum(len(n) for n in pending.values()),
+        'units_done': 0,
+        'incomplete_units': [],
+        'records': 0,
+        'failed_dates': []
+    }
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(fetch_day, day, day_nodes): (day, day_nodes)
+                   for day, day_nodes in pending.items()}
+        for future in as_completed(futures):
+            day, day_nodes = futures[future]
+            try:
+                records = future.result()
+                write_records(day, records)
+            except Exception as e:
+                print(f"❌ {day}: {e}")
+                summary['failed_dates'].append(day)
+                continue
+
+            summary['records'] += len(records)
+            for node in day_nodes:
+                hours = len({r['hour'] for r in records if r['node'] == node})
+                journal.mark(day, node, hours)
+                summary['units_done'] += 1
+                if hours < HOURS_PER_DAY:
+                    summary['incomplete_units'].append(f"{day} {node} ({hours}/24h)")
+
+    summary['failed_dates'].sort()
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Resumable CMG Online backfill into Supabase')
+    parser.add_argument('--start', type=str, required=True, help='First date (YYYY-MM-DD)')
+    parser.add_argument('--end', type=str, required=True, help='Last date (YYYY-MM-DD)')
+    parser.add_argument('--nodes', nargs='+', help='Node codes (default: the hourly update nodes)')
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS, help='Dates fetched concurrently')
+    parser.add_argument('--journal', type=Path, default=JOURNAL_FILE, help='Checkpoint journal path')
+    parser.add_argument('--redo-incomplete', action='store_true',
+                        help='Also redo units journaled with fewer than 24 hours')
+    args = parser.parse_args()
+
+    from lib.utils.supabase_client import get_supabase_client
+    from forecast_error_rollup import rollup_new_actuals
+    from smart_cmg_online_update import CMG_NODES, PAGE_INDEX, fetch_cmg_online_for_date, to_supabase_records
+
+    nodes = args.nodes or CMG_NODES
+    days = date_range(args.start, args.end)
+    journal = BackfillJournal(args.journal)
+    supabase = get_supabase_client()
+    node_id_map = supabase.get_node_id_map()
+
+    print(f"{'='*60}")
+    print(f"CMG ONLINE BACKFILL - {args.start} to {args.end}")
+    print(f"{'='*60}")
+    print(f"📅 {len(days)} dates × {len(nodes)} nodes, {args.workers} dates at a time")
+    print(f"📒 Journal: {args.journal} ({len(journal.units)} units already done)")
+
+    def write_records(day, records):
+        rows, skipped = to_supabase_records(records, node_id_map)
+        if skipped:
+            print(f"⚠️  {day}: skipped {skipped} records due to missing nodes")
+        for i in range(0, len(rows), BATCH_SIZE):
+            if not supabase.insert_cmg_online_batch(rows[i:i + BATCH_SIZE]):
+                raise RuntimeError(f"Supabase upsert failed for batch {i // BATCH_SIZE + 1}")
+        # Recompute forecast errors against the new actuals
+        try:
+            rollup_new_actuals(supabase, [day])
+        except Exception as e:
+            print(f"⚠️ {day}: failed to roll up forecast errors: {e}")
+        print(f"✅ {day}: {len(rows)} rows upserted")
+
+    try:
+        summary = run_backfill(days, nodes, fetch_cmg_online_for_date, write_records, journal,
+                               workers=args.workers, redo_incomplete=args.redo_incomplete)
+    finally:
+        PAGE_INDEX.save()
+
+    print(f"\n📊 Backfill summary:")
+    print(f"   ✅ Units done: {summary['units_done']} ({summary['records']} records)")
+    print(f"   ⏭️  Units already journaled: {summary['units_skipped']}")
+    if summary['incomplete_units']:
+        print(f"   ⚠️  Incomplete units: {', '.join(summary['incomplete_units'])}")
+        print(f"      (rerun with --redo-incomplete to retry them)")
+    if summary['failed_dates']:
+        print(f"   ❌ Failed dates: {', '.join(summary['failed_dates'])} (rerun to resume)")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Forecast Error Rollup
+=====================
+
+Maintains the forecast_errors table (migration 007): one row per ML or
+CMG Programado forecast value whose target hour has an actual, with the
+forecast, the actual (CMG Online averaged across nodes) and the signed
+error (forecast - actual).
+
+Rows are computed for a window of TARGET hours: every forecast aimed at
+those hours is compared against their actuals and upserted on
+(forecast_datetime, horizon, source, node). Re-running a window is
+idempotent, so smart_cmg_online_update.py simply rolls up the days of
+every batch of actuals it writes. Only horizons 1-24 are kept.
+
+A failed read raises before anything is upserted, so a window is either
+rolled up from complete data or left as it was. A rebuild upserts all
+history first and only then deletes rows it did not rewrite, so an
+aborted rebuild never leaves the table emptier than it found it.
+
+Usage:
+    python scripts/production/forecast_error_rollup.py                  # last 72 hours
+    python scripts/production/forecast_error_rollup.py --start 2025-11-01 --end 2025-11-30
+    python scripts/production/forecast_error_rollup.py --rebuild        # all history
+
+    from forecast_error_rollup import rollup_forecast_errors
+    rollup_forecast_errors(supabase, start, end)
+"""
+
+import sys
+import argparse
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, List
+
+import pytz
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+SANTIAGO_TZ = pytz.timezone('America/Santiago')
+
+# node value for ML rows: the model forecasts the system-wide (node average) CMG
+ML_NODE = 'ALL'
+MAX_HORIZON = 24
+UPSERT_BATCH_SIZE = 500
+REBUILD_CHUNK_DAYS = 7
+# Rows a rebuild did not rewrite are older than its start minus this margin
+# (covers clock skew between this host and the database)
+REBUILD_PRUNE_MARGIN = timedelta(minutes=10)
+
+
+def _utc(timestamp: str) -> datetime:
+    return datetime.fromisoformat(str(timestamp).replace('Z', '+00:00')).astimezone(pytz.utc)
+
+
+def _read_all(supabase, table: str, params: List) -> List[Dict[str, Any]]:
+    """Every row of a query, keyset-paginated on id; raises if any page fails"""
+    return [row for page in supabase.iter_pages(table, params, ('id',)) for row in page]
+
+
+def compute_forecast_errors(ml_rows: Iterable[Dict[str, Any]],
+                            prog_rows: Iterable[Dict[str, Any]],
+                            online_rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Forecast error rows for every forecast whose target hour has an actual.
+
+    Args:
+        ml_rows: ml_predictions rows (forecast_datetime, target_datetime, horizon, cmg_predicted)
+        prog_rows: cmg_programado_santiago rows (forecast_datetime, target_datetime, node, cmg_usd)
+        online_rows: cmg_online rows (datetime, cmg_usd)
+
+    Returns:
+        forecast_errors records, unique on (forecast_datetime, horizon, source, node)
+    """
+    actuals_raw = defaultdict(list)
+    for record in online_rows:
+        actuals_raw[_utc(record['datetime'])].append(float(record['cmg_usd']))
+    actuals = {key: sum(values) / len(values) for key, values in actuals_raw.items()}
+
+    forecasts = ([('ml', row, row['cmg_predicted']) for row in ml_rows] +
+                 [('prog', row, row['cmg_usd']) for row in prog_rows])
+
+    records = {}
+    for source, row, predicted in forecasts:
+        forecast_dt, target_dt = _utc(row['forecast_datetime']), _utc(row['target_datetime'])
+        if source == 'ml':
+            horizon, node = int(row['horizon']), ML_NODE
+        else:
+            # Programado horizon: whole hours between forecast and target
+            horizon, node = int((target_dt - forecast_dt).total_seconds() // 3600), row['node']
+
+        if not 1 <= horizon <= MAX_HORIZON or target_dt not in actuals or predicted is None:
+            continue
+
+        actual = actuals[target_dt]
+        forecast_local, target_local = forecast_dt.astimezone(SANTIAGO_TZ), target_dt.astimezone(SANTIAGO_TZ)
+        records[(forecast_dt, horizon, source, node)] = {
+            'source': source,
+            'node': node,
+            'forecast_datetime': forecast_dt.isoformat(),
+            'target_datetime': target_dt.isoformat(),
+            'horizon': horizon,
+            'forecast_date': forecast_local.strftime('%Y-%m-%d'),
+            'forecast_hour': forecast_local.hour,
+            'target_date': target_local.strftime('%Y-%m-%d'),
+            'target_hour': target_local.hour,
+            'predicted': float(predicted),
+            'actual': actual,
+            'error': float(predicted) - actual
+        }
+
+    return list(records.values())
+
+
+def rollup_forecast_errors(supabase, start: datetime, end: datetime) -> int:
+    """
+    Recompute and upsert forecast errors for target hours in [start, end].
+
+    Args:
+        supabase: SupabaseClient instance
+        start, end: Target window (timezone-aware, inclusive)
+
+    Returns:
+        Number of rows upserted
+
+    Raises:
+        requests.HTTPError if a read fails (nothing is upserted),
+        RuntimeError if an upsert fails
+    """
+    start, end = start.astimezone(pytz.utc), end.astimezone(pytz.utc)
+    target_window = [("target_datetime", f"gte.{start.isoformat()}"),
+                     ("target_datetime", f"lte.{end.isoformat()}")]
+
+    queries = {
+        'ml': ("ml_predictions",
+               [("select", "forecast_datetime,target_datetime,horizon,cmg_predicted")] + target_window),
+        'prog': ("cmg_programado_santiago",
+                 [("select", "forecast_datetime,target_datetime,node,cmg_usd")] + target_window),
+        'online': ("cmg_online", [
+            ("select", "datetime,cmg_usd"),
+            ("datetime", f"gte.{start.isoformat()}"),
+            ("datetime", f"lte.{end.isoformat()}"),
+        ]),
+    }
+    # The three reads run concurrently; a failed page propagates from result()
+    with ThreadPoolExecutor(max_workers=len(queries)) as executor:
+        futures = {name: executor.submit(_read_all, supabase, table, params)
+                   for name, (table, params) in queries.items()}
+        results = {name: future.result() for name, future in futures.items()}
+
+    records = compute_forecast_errors(results['ml'], results['prog'], results['online'])
+
+    for i in range(0, len(records), UPSERT_BATCH_SIZE):
+        if not supabase.upsert_forecast_errors(records[i:i + UPSERT_BATCH_SIZE]):
+            raise RuntimeError(f"Failed to upsert forecast errors batch {i // UPSERT_BATCH_SIZE + 1}")
+
+    return len(records)
+
+
+def rollup_new_actuals(supabase, actual_dates: Iterable[str]) -> int:
+    """Roll up the whole Santiago days (YYYY-MM-DD) touched by a batch of new actuals"""
+    dates = sorted(set(actual_dates))
+    if not dates:
+        return 0
+    start = SANTIAGO_TZ.localize(datetime.strptime(dates[0], '%Y-%m-%d'))
+    end = SANTIAGO_TZ.localize(datetime.strptime(dates[-1], '%Y-%m-%d') + timedelta(days=1, seconds=-1))
+    return rollup_forecast_errors(supabase, start, end)
+
+
+def rollup_range(supabase, start: datetime, end: datetime) -> int:
+    """Roll up target hours in [start, end] in REBUILD_CHUNK_DAYS windows, stopping at the first failure"""
+    total = 0
+    chunk_start = start
+    while chunk_start <= end:
+        chunk_end = min(chunk_start + timedelta(days=REBUILD_CHUNK_DAYS) - timedelta(seconds=1), end)
+        try:
+            count = rollup_forecast_errors(supabase, chunk_start, chunk_end)
+        except Exception as e:
+            print(f"❌ {chunk_start.date()} → {chunk_end.date()}: {e}")
+            raise
+        print(f"   {chunk_start.date()} → {chunk_end.date()}: {count} rows")
+        total += count
+        chunk_start = chunk_end + timedelta(seconds=1)
+    return total
+
+
+def rebuild_forecast_errors(supabase, end: datetime) -> int:
+    """
+    Roll up all history up to `end`, then delete rows the rebuild did not rewrite.
+
+    Rows are upserted over the existing ones, so readers never see an empty
+    table. If any chunk fails the rebuild stops before deleting anything.
+    """
+    started = datetime.now(pytz.utc)
+    oldest = next(supabase.iter_pages('cmg_online', [("select", "datetime")], ('datetime',), page_size=1), [])
+    if not oldest:
+        print("⚠️ No CMG Online data, nothing to roll up")
+        return 0
+
+    total = rollup_range(supabase, _utc(oldest[0]['datetime']), end)
+
+    # Every rewritten row has updated_at >= started (trigger on update, default on insert)
+    if not supabase.delete_forecast_errors_before((started - REBUILD_PRUNE_MARGIN).isoformat()):
+        raise RuntimeError("Failed to delete stale forecast errors")
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Maintain the forecast_errors rollup table')
+    parser.add_argument('--hours', type=int, default=72,
+                        help='Roll up target hours in the last N hours (default)')
+    parser.add_argument('--start', type=str, help='First target date (YYYY-MM-DD, Santiago)')
+    parser.add_argument('--end', type=str, help='Last target date (YYYY-MM-DD, Santiago)')
+    parser.add_argument('--rebuild', action='store_true',
+                        help='Roll up all history and drop rows it no longer produces')
+    args = parser.parse_args()
+
+    from lib.utils.supabase_client import get_supabase_client
+    supabase = get_supabase_client()
+
+    now = datetime.now(pytz.utc)
+    if args.start:
+        start = SANTIAGO_TZ.localize(datetime.strptime(args.start, '%Y-%m-%d'))
+    else:
+        start = now - timedelta(hours=args.hours)
+    end = (SANTIAGO_TZ.localize(datetime.strptime(args.end, '%Y-%m-%d')) + timedelta(days=1, seconds=-1)
+           if args.end else now)
+
+    print(f"{'='*60}")
+    if args.rebuild:
+        print(f"FORECAST ERROR ROLLUP - full rebuild up to {end.isoformat()}")
+        print(f"{'='*60}")
+        total = rebuild_forecast_errors(supabase, end)
+    else:
+        print(f"FORECAST ERROR ROLLUP - targets {start.isoformat()} → {end.isoformat()}")
+        print(f"{'='*60}")
+        total = rollup_range(supabase, start, end)
+
+    print(f"✅ Upserted {total} forecast error rows")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Heatmap Materializer
+====================
+
+Stores each day's ML and CMG Programado 24×24 error matrices in the
+daily_heatmaps table (migration 008) once the day is final, so
+/api/performance_heatmap serves them without touching raw rows. Newer
+days are computed live by the endpoint.
+
+The hourly updater refetches and may revise the actuals of the last
+REFETCH_DAYS days (today included). A day's matrices also use the next
+day's actuals (t+24 forecasts target it), so a day is final only once
+the next day has left that window, i.e. when it is SETTLE_DAYS old.
+Having all 24 hours is not enough: a refetch can still revise them.
+
+Usage:
+    python scripts/production/heatmap_materializer.py               # pending days, last 14
+    python scripts/production/heatmap_materializer.py --days 90     # backfill
+    python scripts/production/heatmap_materializer.py --date 2025-11-20 --force
+
+    from heatmap_materializer import materialize_pending
+    materialize_pending(supabase)
+"""
+
+import sys
+import argparse
+from collections import Counter
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import List, Optional
+
+import pytz
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from lib.utils.performance_metrics import load_day_heatmaps, pack_day_heatmaps
+
+SANTIAGO_TZ = pytz.timezone('America/Santiago')
+LOOKBACK_DAYS = 14
+# smart_cmg_online_update.py refetches today and the 2 days before
+REFETCH_DAYS = 3
+SETTLE_DAYS = REFETCH_DAYS + 1
+
+
+def is_complete(day: str, today: date) -> bool:
+    """True once neither the day's actuals nor the next day's can be refetched"""
+    return date.fromisoformat(day) <= today - timedelta(days=SETTLE_DAYS)
+
+
+def materialize_day(supabase, day: str, today: date, force: bool = False) -> bool:
+    """
+    Compute and store one day's heatmaps.
+
+    Returns:
+        True if stored, False if the day is not final yet (unless force)
+    """
+    if not force and not is_complete(day, today):
+        return False
+    heatmaps = load_day_heatmaps(supabase, day)
+    if not supabase.upsert_daily_heatmaps(pack_day_heatmaps(day, heatmaps)):
+        raise RuntimeError(f"Failed to store heatmaps for {day}")
+    return True
+
+
+def materialize_pending(supabase, days: int = LOOKBACK_DAYS, today: Optional[date] = None) -> List[str]:
+    """
+    Store every final day of the last `days` that is not stored yet.
+
+    Returns:
+        The dates stored
+    """
+    today = today or datetime.now(SANTIAGO_TZ).date()
+    start, end = today - timedelta(days=days), today - timedelta(days=1)
+
+    rows = supabase.get_daily_heatmaps(start.isoformat(), end.isoformat(), select='date,source')
+    stored = {d for d, sources in Counter(str(row['date']) for row in rows).items() if sources == 2}
+
+    materialized = []
+    for offset in range(days):
+        day = (start + timedelta(days=offset)).isoformat()
+        if day not in stored and materialize_day(supabase, day, today):
+            materialized.append(day)
+    return materialized
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Store final days\' performance heatmaps')
+    parser.add_argument('--days', type=int, default=LOOKBACK_DAYS,
+                        help='Look back this many days for days not stored yet')
+    parser.add_argument('--date', type=str, help='Materialize only this date (YYYY-MM-DD)')
+    parser.add_argument('--force', action='store_true',
+                        help='With --date: store even if the day is not final')
+    args = parser.parse_args()
+
+    from lib.utils.supabase_client import get_supabase_client
+    supabase = get_supabase_client()
+    today = datetime.now(SANTIAGO_TZ).date()
+
+    print(f"{'='*60}")
+    print(f"HEATMAP MATERIALIZER - {today}")
+    print(f"{'='*60}")
+
+    if args.date:
+        if materialize_day(supabase, args.date, today, force=args.force):
+            print(f"✅ Stored heatmaps for {args.date}")
+        else:
+            print(f"⚠️ {args.date} is not final yet (use --force to store anyway)")
+        return 0
+
+    materialized = materialize_pending(supabase, args.days, today)
+    print(f"✅ Stored heatmaps for {len(materialized)} days: {', '.join(materialized) or '-'}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Migrate the per-hour JSON prediction archive into the columnar archive
+
+Reads data/ml_predictions/archive/*.json, flattens every snapshot into
+PredictionArchive rows and writes each monthly partition once. Snapshots
+already in the store (appended by the hourly job) are skipped, so the
+migration can run at any time and be re-run safely.
+
+Usage:
+    python scripts/production/migrate_ml_prediction_archive.py
+    python scripts/production/migrate_ml_prediction_archive.py --dry-run
+    python scripts/production/migrate_ml_prediction_archive.py --delete-json
+"""
+
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from ml_prediction_archive import PredictionArchive, forecast_rows, to_naive_datetime, COLUMNS, STORE_DIR
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+JSON_ARCHIVE_DIR = PROJECT_ROOT / "data" / "ml_predictions" / "archive"
+
+
+def load_json_archive(archive_dir: Path):
+    """Flatten every JSON snapshot; returns (rows, migrated files, skipped files)"""
+    rows, migrated, skipped = [], [], []
+    for path in sorted(archive_dir.glob('*.json')):
+        try:
+            with open(path, 'r') as f:
+                rows.extend(forecast_rows(json.load(f)))
+            migrated.append(path)
+        except (ValueError, KeyError) as e:
+            print(f"  ⚠️  Skipping {path.name}: {e}")
+            skipped.append(path)
+
+    return pd.DataFrame(rows, columns=COLUMNS), migrated, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Migrate JSON ML prediction archive to Parquet partitions')
+    parser.add_argument('--archive-dir', type=str, default=str(JSON_ARCHIVE_DIR),
+                        help='Directory with YYYY-MM-DD-HH.json snapshots')
+    parser.add_argument('--store-dir', type=str, default=str(STORE_DIR),
+                        help='Columnar archive directory')
+    parser.add_argument('--dry-run', action='store_true', help='Parse and report, write nothing')
+    parser.add_argument('--delete-json', action='store_true',
+                        help='Delete migrated JSON files after a successful write')
+    args = parser.parse_args()
+
+    print("="*80)
+    print("ML PREDICTION ARCHIVE MIGRATION")
+    print("="*80)
+
+    started = time.perf_counter()
+    archive = PredictionArchive(Path(args.store_dir))
+
+    print(f"\nReading {args.archive_dir}...")
+    rows, migrated, skipped = load_json_archive(Path(args.archive_dir))
+    print(f"  ✓ {len(migrated):,} snapshots → {len(rows):,} rows ({len(skipped)} skipped)")
+
+    # Snapshots the hourly job already appended to the store
+    if archive.load_index() and not rows.empty:
+        keys = ['forecast_datetime', 'generated_at', 'horizon']
+        existing = archive.query(columns=['generated_at']).set_index(keys).index
+        typed = pd.DataFrame({
+            'forecast_datetime': pd.to_datetime(rows['forecast_datetime']),
+            'generated_at': to_naive_datetime(rows['generated_at']),
+            'horizon': rows['horizon'].astype('int8')
+        })
+        already = typed.set_index(keys).index.isin(existing)
+        if already.any():
+            print(f"  ✓ {int(already.sum()):,} rows already in the store")
+        rows = rows[~already]
+
+    if rows.empty:
+        print("  Nothing to migrate")
+        return 0
+
+    if args.dry_run:
+        months = pd.to_datetime(rows['forecast_datetime']).dt.strftime('%Y-%m').value_counts().sort_index()
+        for month, n in months.items():
+            print(f"    {month}: {n:,} rows")
+        print("\n(dry run, nothing written)")
+        return 0
+
+    # Typed once for all snapshots, then one part per month, compacted once
+    rows_before = sum(e['rows'] for e in archive.load_index().values())
+    archive.append(rows)
+    archive.compact()
+    index = archive.load_index()
+    size_mb = sum((archive.root / e['file']).stat().st_size for e in index.values()) / 1e6
+    print(f"  ✓ Wrote {len(index)} files ({size_mb:.1f} MB) to {archive.root}")
+
+    # Verify before deleting anything
+    written = sum(e['rows'] for e in index.values())
+    if written < rows_before + len(rows):
+        print(f"❌ Partition rows ({written:,}) < expected ({rows_before + len(rows):,}); keeping JSON files")
+        return 1
+
+    if args.delete_json:
+        for path in migrated:
+            path.unlink()
+        print(f"  ✓ Deleted {len(migrated):,} JSON files")
+
+    print(f"\n✅ Migration complete in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
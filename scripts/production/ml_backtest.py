@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+ML Historical Backtest
+======================
+
+Re-scores the production models over the whole CMG history in one pass.
+
+Instead of re-running ml_hourly_forecast.py hour by hour, this script:
+1. Loads the full CMG Online history from cache
+2. Loads models_24h/ once (ModelBundle)
+3. Builds the CleanCMGFeatureEngineering feature matrix ONCE, computing
+   only the columns the models read
+4. Scores every base hour × 24 horizons with batched booster calls
+5. Writes a compact forecast cube (.npz) plus error metrics (.json)
+
+Optionally compares against the forecasts that were actually published
+(data/ml_predictions/store/, see ml_prediction_archive.py) for the same
+base hours.
+
+Note: features are computed on the full hourly grid, while the hourly job
+only sees the last 168 hours. Long lags (168h) are therefore available here
+and may be NaN in production, so scores can differ slightly from the
+archived forecasts.
+
+Usage:
+    python scripts/production/ml_backtest.py
+    python scripts/production/ml_backtest.py --start 2026-01-01 --end 2026-03-31
+    python scripts/production/ml_backtest.py --archive-only --compare-archive
+
+Output:
+- data/backtest/forecast_cube.npz
+- data/backtest/metrics.json
+"""
+
+import sys
+import json
+import time
+import argparse
+import pandas as pd
+import numpy as np
+from datetime import datetime
+from pathlib import Path
+
+# Add scripts directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from ml_feature_engineering import CleanCMGFeatureEngineering
+from ml_model_bundle import ModelBundle
+from ml_batch_inference import build_stage2_features, predict_batch
+from ml_hourly_forecast import load_cmg_online_data, MODELS_DIR, DATA_DIR
+from ml_prediction_archive import PredictionArchive
+
+CMG_COLUMN = 'CMG [$/MWh]'
+BACKTEST_DIR = DATA_DIR / "backtest"
+
+# Minimum history before a base hour is scored (longest lag / rolling window)
+WARMUP_HOURS = 168
+
+
+def build_feature_matrix(cmg_df, base_feature_names):
+    """
+    Build the base feature matrix and target matrix over the full history
+
+    Args:
+        cmg_df: CMG Online history
+        base_feature_names: Columns the models read (ModelBundle.base_feature_names);
+                            only these and the value targets are computed
+
+    Returns:
+        (X_base, actuals): base features per hour, and (N, 24) actual CMG at t+h
+    """
+    print("\n[3/5] Building feature matrix over full history...")
+
+    # Work on a regular hourly grid so shift-based lags stay aligned across gaps
+    cmg_df = cmg_df.asfreq('h')
+
+    feature_engineer = CleanCMGFeatureEngineering(
+        target_horizons=list(range(1, 25)),
+        rolling_windows=[6, 12, 24, 48, 168],
+        lag_hours=[1, 2, 3, 6, 12, 24, 48, 168]
+    )
+    target_cols = [f'cmg_value_t+{h}' for h in feature_engineer.target_horizons]
+    df_with_features = feature_engineer.create_features(
+        cmg_df, columns=list(base_feature_names) + target_cols
+    )
+
+    # Only score hours with an observed value and a full warm-up window
+    scorable = df_with_features[CMG_COLUMN].notna().to_numpy().copy()
+    scorable[:WARMUP_HOURS] = False
+    df_with_features = df_with_features[scorable]
+
+    X_base = df_with_features[feature_engineer.get_feature_names()]
+    # Actual CMG at t+h (NaN where that hour is missing)
+    actuals = df_with_features[target_cols]
+
+    print(f"  ✓ {len(X_base):,} base hours × {X_base.shape[1]} base features")
+
+    return X_base, actuals
+
+
+def load_archived_forecasts(archive=None):
+    """
+    Load published forecasts from the prediction archive
+
+    Returns:
+        DataFrame indexed by base_datetime with one 'predicted' column per horizon
+    """
+    archive = archive or PredictionArchive()
+    # Several snapshots can share a base hour (stale data); keep the latest one
+    archived = archive.query(columns=['predicted'], latest_only=True)
+    if archived.empty:
+        return pd.DataFrame()
+
+    archived = archived.rename(columns={'forecast_datetime': 'base_datetime'})
+    archived['predicted'] = archived['predicted'].astype(float)
+    return archived.pivot(index='base_datetime', columns='horizon', values='predicted')
+
+
+def compute_metrics(batch, actuals):
+    """
+    Error metrics per horizon and overall
+
+    Args:
+        batch: Output of predict_batch
+        actuals: (N, H) array of actual CMG values (NaN where unknown)
+    """
+    predicted = batch['predicted']
+    valid = ~np.isnan(actuals)
+    abs_err = np.where(valid, np.abs(predicted - np.nan_to_num(actuals)), np.nan)
+
+    actual_zero = actuals == 0
+    predicted_zero = predicted == 0
+    zero_correct = np.where(valid, actual_zero == predicted_zero, False)
+
+    inside_band = (actuals >= batch['value_q10']) & (actuals <= batch['value_q90'])
+
+    by_horizon = {}
+    for i, h in enumerate(batch['horizons']):
+        n = int(valid[:, i].sum())
+        if n == 0:
+            continue
+        by_horizon[f't+{int(h)}'] = {
+            'n': n,
+            'mae': round(float(np.nanmean(abs_err[:, i])), 3),
+            'rmse': round(float(np.sqrt(np.nanmean(abs_err[:, i] ** 2))), 3),
+            'zero_accuracy': round(float(zero_correct[valid[:, i], i].mean()), 4),
+            'q10_q90_coverage': round(float(inside_band[valid[:, i], i].mean()), 4)
+        }
+
+    n_total = int(valid.sum())
+    return {
+        'n_base_hours': int(predicted.shape[0]),
+        'n_scored': n_total,
+        'mae': round(float(np.nanmean(abs_err)), 3) if n_total else None,
+        'rmse': round(float(np.sqrt(np.nanmean(abs_err ** 2))), 3) if n_total else None,
+        'zero_accuracy': round(float(zero_correct[valid].mean()), 4) if n_total else None,
+        'by_horizon': by_horizon
+    }
+
+
+def compare_with_archive(batch, actuals, archived):
+    """MAE of the published (archived) forecasts on the same base hours"""
+    common = archived.index.intersection(batch['base_datetimes'])
+    if len(common) == 0:
+        return None
+
+    rows = batch['base_datetimes'].get_indexer(common)
+    horizons = [int(h) for h in batch['horizons']]
+    published = archived.loc[common].reindex(columns=horizons).to_numpy(dtype=float)
+    actual = actuals[rows]
+    valid = ~np.isnan(published) & ~np.isnan(actual)
+
+    if not valid.any():
+        return None
+
+    return {
+        'n_base_hours': int(len(common)),
+        'n_scored': int(valid.sum()),
+        'backtest_mae': round(float(np.abs(batch['predicted'][rows] - actual)[valid].mean()), 3),
+        'published_mae': round(float(np.abs(published - actual)[valid].mean()), 3)
+    }
+
+
+def save_results(batch, actuals, metrics, output_dir):
+    """Write the forecast cube (float32, compressed) and metrics"""
+    print("\n[5/5] Saving backtest results...")
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    cube_file = output_dir / "forecast_cube.npz"
+    np.savez_compressed(
+        cube_file,
+        base_datetimes=batch['base_datetimes'].strftime('%Y-%m-%d %H:00:00').to_numpy(dtype='U19'),
+        horizons=batch['horizons'].astype(np.int8),
+        predicted=batch['predicted'].astype(np.float32),
+        zero_prob=batch['zero_prob'].astype(np.float32),
+        threshold=batch['threshold'].astype(np.float32),
+        value_median=batch['value_median'].astype(np.float32),
+        value_q10=batch['value_q10'].astype(np.float32),
+        value_q90=batch['value_q90'].astype(np.float32),
+        actual=actuals.astype(np.float32)
+    )
+    print(f"  ✓ Saved forecast cube to {cube_file}")
+
+    metrics_file = output_dir / "metrics.json"
+    with open(metrics_file, 'w') as f:
+        json.dump(metrics, f, indent=2)
+    print(f"  ✓ Saved metrics to {metrics_file}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Backtest production ML models over CMG history')
+    parser.add_argument('--start', type=str, default=None, help='First base hour (YYYY-MM-DD)')
+    parser.add_argument('--end', type=str, default=None, help='Last base hour (YYYY-MM-DD)')
+    parser.add_argument('--archive-only', action='store_true',
+                        help='Only score base hours that have a published forecast in the archive')
+    parser.add_argument('--compare-archive', action='store_true',
+                        help='Compare against published forecasts in data/ml_predictions/store/')
+    parser.add_argument('--models-dir', type=str, default=str(MODELS_DIR), help='Models directory')
+    parser.add_argument('--output-dir', type=str, default=str(BACKTEST_DIR), help='Output directory')
+    args = parser.parse_args()
+
+    print("="*80)
+    print("ML HISTORICAL BACKTEST")
+    print("="*80)
+    print(f"Started: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print()
+
+    started = time.perf_counter()
+
+    try:
+        # 1. Load full history
+        cmg_df = load_cmg_online_data(hours=None)
+
+        # 2. Models (once)
+        print("\n[2/5] Loading trained models...")
+        bundle = ModelBundle.load(Path(args.models_dir))
+        print(bundle.load_time_report())
+
+        # 3. Features over the whole history (once), only the columns the models read
+        X_base, actuals = build_feature_matrix(cmg_df, bundle.base_feature_names)
+
+        archived = None
+        if args.archive_only or args.compare_archive:
+            archived = load_archived_forecasts()
+            print(f"  ✓ Loaded {len(archived):,} published forecasts from archive")
+
+        if args.start:
+            keep = X_base.index >= pd.Timestamp(args.start)
+            X_base, actuals = X_base[keep], actuals[keep]
+        if args.end:
+            keep = X_base.index < pd.Timestamp(args.end) + pd.Timedelta(days=1)
+            X_base, actuals = X_base[keep], actuals[keep]
+        if args.archive_only and archived is not None and len(archived):
+            keep = X_base.index.isin(archived.index)
+            X_base, actuals = X_base[keep], actuals[keep]
+
+        if len(X_base) == 0:
+            raise ValueError("No base hours to score in the selected range")
+
+        # 4. Batched scoring: N base hours × 24 horizons
+        print(f"\n[4/5] Scoring {len(X_base):,} base hours × {len(bundle.available_horizons)} horizons...")
+        score_start = time.perf_counter()
+        X_stage2, X_stage1 = build_stage2_features(bundle, X_base)
+        batch = predict_batch(bundle, X_stage2, X_stage1, X_base.index)
+        print(f"  ✓ Scored in {time.perf_counter() - score_start:.1f}s")
+
+        actual_matrix = actuals[[f'cmg_value_t+{int(h)}' for h in batch['horizons']]].to_numpy(dtype=float)
+        metrics = compute_metrics(batch, actual_matrix)
+        metrics['generated_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        metrics['models_dir'] = str(args.models_dir)
+        metrics['range'] = {
+            'start': X_base.index.min().strftime('%Y-%m-%d %H:00:00'),
+            'end': X_base.index.max().strftime('%Y-%m-%d %H:00:00')
+        }
+
+        if args.compare_archive and archived is not None and len(archived):
+            metrics['vs_published'] = compare_with_archive(batch, actual_matrix, archived)
+
+        print(f"  ✓ MAE: {metrics['mae']} | RMSE: {metrics['rmse']} | Zero accuracy: {metrics['zero_accuracy']}")
+        if metrics.get('vs_published'):
+            vs = metrics['vs_published']
+            print(f"  ✓ Published MAE on same hours: {vs['published_mae']} (backtest: {vs['backtest_mae']})")
+
+        # 5. Save
+        save_results(batch, actual_matrix, metrics, Path(args.output_dir))
+
+        print("\n" + "="*80)
+        print(f"✅ BACKTEST COMPLETE in {time.perf_counter() - started:.1f}s")
+        print("="*80)
+
+        return 0
+
+    except Exception as e:
+        print("\n" + "="*80)
+        print(f"❌ ERROR: {str(e)}")
+        print("="*80)
+        import traceback
+        traceback.print_exc()
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
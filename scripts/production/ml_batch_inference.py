@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Batched Multi-Horizon Inference
+===============================
+
+Vectorized version of the two-stage forecast in ml_hourly_forecast.py.
+
+Instead of looping over 24 horizons and rebuilding a one-row DMatrix and a
+one-row calibrator DataFrame for each of them, this module:
+
+1. Builds each feature matrix / xgb.DMatrix ONCE for all N base timestamps
+2. Calls every booster once per horizon on all N rows
+3. Stacks the N×24 calibrator inputs into one matrix and makes a single
+   meta_calibrator.predict_proba() call
+
+The hourly job uses it with N=1; backfills and replays pass N base hours
+at once and get N×24 forecast matrices back.
+
+Usage:
+    from ml_model_bundle import ModelBundle
+    from ml_batch_inference import build_stage2_features, predict_batch
+
+    bundle = ModelBundle.load()
+    X_stage2, X_stage1 = build_stage2_features(bundle, X_base)
+    batch = predict_batch(bundle, X_stage2, X_stage1, X_base.index)
+    batch['predicted']  # shape (N, 24)
+"""
+
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from scipy.special import logit
+
+# Column order expected by the meta-calibrator
+CALIBRATOR_COLUMNS = [
+    'logit_p', 'hour_sin', 'hour_cos', 'month_sin', 'month_cos',
+    'zeros_24h', 'zeros_168h', 'horizon'
+]
+
+
+def predict_zero_risk(bundle, X: pd.DataFrame, horizons: List[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Stage 1 zero-risk predictions for every row and horizon
+
+    Args:
+        bundle: ModelBundle
+        X: Base features (any column order, reordered to Stage 1 training order)
+        horizons: Horizons to score (default: all with Stage 1 models)
+
+    Returns:
+        (lgb_pred, xgb_pred) arrays of shape (N, len(horizons))
+    """
+    if horizons is None:
+        horizons = [h for h in bundle.horizons if h in bundle.zero_detection]
+
+    X_ordered = X[bundle.stage1_feature_names]
+    dmatrix = xgb.DMatrix(X_ordered)
+
+    lgb_pred = np.empty((len(X_ordered), len(horizons)))
+    xgb_pred = np.empty((len(X_ordered), len(horizons)))
+    for i, h in enumerate(horizons):
+        lgb_pred[:, i] = bundle.zero_detection[h]['lgb'].predict(X_ordered)
+        xgb_pred[:, i] = bundle.zero_detection[h]['xgb'].predict(dmatrix)
+
+    return lgb_pred, xgb_pred
+
+
+def build_stage2_features(bundle, X_base: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Add the 72 Stage 1 meta-features to N rows of base features
+
+    Args:
+        bundle: ModelBundle
+        X_base: Base features (N rows, 78 columns)
+
+    Returns:
+        (X_stage2, X_stage1): cleaned matrices in Stage 2 / Stage 1 training order
+    """
+    horizons = [h for h in bundle.horizons if h in bundle.zero_detection]
+    for h in bundle.horizons:
+        if h not in bundle.zero_detection:
+            print(f"    ⚠️  Missing Stage 1 models for t+{h}")
+
+    lgb_pred, xgb_pred = predict_zero_risk(bundle, X_base, horizons)
+    avg_pred = (lgb_pred + xgb_pred) / 2
+
+    meta = {}
+    for i, h in enumerate(horizons):
+        meta[f'zero_risk_lgb_t+{h}'] = lgb_pred[:, i]
+        meta[f'zero_risk_xgb_t+{h}'] = xgb_pred[:, i]
+        meta[f'zero_risk_avg_t+{h}'] = avg_pred[:, i]
+    meta_features = pd.DataFrame(meta, index=X_base.index)
+
+    print(f"  ✓ Generated {len(meta_features.columns)} meta-features")
+
+    # Combine base + meta features and clean
+    X_full = pd.concat([X_base, meta_features], axis=1)
+    X_full = X_full.replace([np.inf, -np.inf], np.nan).fillna(0).clip(-1e6, 1e6)
+
+    return X_full[bundle.stage2_feature_names], X_full[bundle.stage1_feature_names]
+
+
+def _calibrate(bundle, zero_prob_raw: np.ndarray, X_stage1: pd.DataFrame,
+               target_times: pd.DatetimeIndex, horizons: List[int]) -> np.ndarray:
+    """Apply the meta-calibrator to all N×H raw probabilities in one call"""
+    n_rows, n_horizons = zero_prob_raw.shape
+
+    def per_row(column):
+        if column in X_stage1.columns:
+            return np.repeat(X_stage1[column].to_numpy(), n_horizons)
+        return np.zeros(n_rows * n_horizons)
+
+    hours = target_times.hour.to_numpy()
+    months = target_times.month.to_numpy()
+
+    calibrator_input = pd.DataFrame({
+        'logit_p': logit(np.clip(zero_prob_raw.ravel(), 1e-6, 1 - 1e-6)),
+        'hour_sin': np.sin(2 * np.pi * hours / 24),
+        'hour_cos': np.cos(2 * np.pi * hours / 24),
+        'month_sin': np.sin(2 * np.pi * months / 12),
+        'month_cos': np.cos(2 * np.pi * months / 12),
+        'zeros_24h': per_row('zeros_count_24h'),
+        'zeros_168h': per_row('zeros_count_168h'),
+        'horizon': np.tile(horizons, n_rows)
+    }, columns=CALIBRATOR_COLUMNS)
+
+    return bundle.meta_calibrator.predict_proba(calibrator_input)[:, 1].reshape(n_rows, n_horizons)
+
+
+def predict_batch(bundle, X_stage2: pd.DataFrame, X_stage1: pd.DataFrame,
+                  base_datetimes) -> Dict[str, np.ndarray]:
+    """
+    Two-stage forecast for N base timestamps and all available horizons
+
+    Args:
+        bundle: ModelBundle
+        X_stage2: Stage 2 features (N rows, 150 columns)
+        X_stage1: Stage 1 features (N rows, 78 columns, cleaned)
+        base_datetimes: N base timestamps, aligned with the feature rows
+
+    Returns:
+        Dict of (N, H) arrays: zero_prob_raw, zero_prob, threshold,
+        value_median, value_q10, value_q90, predicted; plus 'horizons'
+        (H,) and 'target_datetimes' (N, H)
+    """
+    horizons = bundle.available_horizons
+    base_datetimes = pd.DatetimeIndex(base_datetimes)
+    n_rows, n_horizons = len(base_datetimes), len(horizons)
+
+    # Target datetimes, flattened row-major: (base 0, h1..h24), (base 1, ...), ...
+    offsets = pd.to_timedelta(np.tile(horizons, n_rows), unit='h')
+    target_times = pd.DatetimeIndex(np.repeat(base_datetimes.to_numpy(), n_horizons)) + offsets
+
+    # Stage 1: Zero detection (one DMatrix for all rows)
+    lgb_zero, xgb_zero = predict_zero_risk(bundle, X_stage1, horizons)
+    zero_prob_raw = (lgb_zero + xgb_zero) / 2
+
+    if bundle.meta_calibrator is not None:
+        zero_prob = _calibrate(bundle, zero_prob_raw, X_stage1, target_times, horizons)
+    else:
+        zero_prob = zero_prob_raw
+
+    # Stage 2: Value prediction (one DMatrix for all rows)
+    stage2_dmatrix = xgb.DMatrix(X_stage2)
+    value_median = np.empty((n_rows, n_horizons))
+    value_q10 = np.empty((n_rows, n_horizons))
+    value_q90 = np.empty((n_rows, n_horizons))
+    for i, h in enumerate(horizons):
+        models = bundle.value_prediction[h]
+        lgb_value = models['lgb_median'].predict(X_stage2)
+        xgb_value = models['xgb'].predict(stage2_dmatrix)
+        value_median[:, i] = (lgb_value + xgb_value) / 2
+        value_q10[:, i] = models['lgb_q10'].predict(X_stage2)
+        value_q90[:, i] = models['lgb_q90'].predict(X_stage2)
+
+    # Decision thresholds per (row, horizon)
+    target_hours = target_times.hour.to_numpy()
+    threshold = np.array([
+        bundle.threshold_for(h, hour)
+        for h, hour in zip(np.tile(horizons, n_rows), target_hours)
+    ], dtype=float).reshape(n_rows, n_horizons)
+
+    predicted = np.where(zero_prob > threshold, 0.0, np.maximum(0, value_median))
+
+    return {
+        'horizons': np.array(horizons),
+        'base_datetimes': base_datetimes,
+        'target_datetimes': target_times.to_numpy().reshape(n_rows, n_horizons),
+        'zero_prob_raw': zero_prob_raw,
+        'zero_prob': zero_prob,
+        'threshold': threshold,
+        'value_median': value_median,
+        'value_q10': value_q10,
+        'value_q90': value_q90,
+        'predicted': predicted
+    }
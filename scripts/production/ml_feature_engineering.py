@@ -16,13 +16,76 @@ Author: Enhanced for institutional-grade forecasting
 Date: 2025-01-10
 """
 
+import math
+import pickle
+from collections import deque
+
 import pandas as pd
 import numpy as np
-from typing import List, Dict, Tuple
+from typing import Callable, List, Dict, Tuple
 import warnings
 warnings.filterwarnings('ignore')
 
 
+class FeatureGraph:
+    """
+    Dependency graph of named feature producers
+
+    Each node (an output column, or an intermediate such as the shifted CMG
+    series) is produced by a function of other nodes. compute() runs only
+    the producers the requested names depend on, each at most once.
+    """
+
+    def __init__(self):
+        # name -> (input node names, producer, is output column)
+        self.producers: Dict[str, Tuple[List[str], Callable, bool]] = {}
+
+    def add(self, name: str, inputs: List[str], producer: Callable, output: bool = True) -> None:
+        """Register producer(*input_values) as the source of node `name`"""
+        self.producers[name] = (list(inputs), producer, output)
+
+    @property
+    def outputs(self) -> List[str]:
+        """Output column names, in registration order"""
+        return [name for name, (_, _, output) in self.producers.items() if output]
+
+    def dependencies(self, names: List[str]) -> List[str]:
+        """Every producer needed for `names`, in execution order"""
+        order, seen = [], set()
+
+        def visit(name, path):
+            if name in seen or name not in self.producers:
+                return
+            if name in path:
+                raise ValueError(f"Feature dependency cycle: {' -> '.join(path + (name,))}")
+            for dep in self.producers[name][0]:
+                visit(dep, path + (name,))
+            seen.add(name)
+            order.append(name)
+
+        for name in names:
+            visit(name, ())
+        return order
+
+    def compute(self, names: List[str], values: Dict[str, object]) -> Dict[str, object]:
+        """
+        Compute `names` and their inputs
+
+        Args:
+            names: Nodes to compute
+            values: Known nodes (sources and earlier results); updated in place
+        """
+        for name in self.dependencies(names):
+            if name in values:
+                continue
+            inputs, producer, _ = self.producers[name]
+            missing = [dep for dep in inputs if dep not in values]
+            if missing:
+                raise ValueError(f"Feature '{name}' needs unknown inputs: {missing}")
+            values[name] = producer(*[values[dep] for dep in inputs])
+        return values
+
+
 class CleanCMGFeatureEngineering:
     """
     Feature engineering for CMG forecasting with rigorous leakage prevention
@@ -48,7 +111,8 @@ class CleanCMGFeatureEngineering:
         self.feature_names = []
 
     def create_features(self, df: pd.DataFrame, cmg_column: str = 'CMG [$/MWh]',
-                        cmg_programado_df: pd.DataFrame = None) -> pd.DataFrame:
+                        cmg_programado_df: pd.DataFrame = None,
+                        columns: List[str] = None) -> pd.DataFrame:
         """
         Create all features with NO future leakage
 
@@ -58,9 +122,12 @@ class CleanCMGFeatureEngineering:
             cmg_programado_df: Optional DataFrame with CMG Programado forecasts
                                Should have columns: 'target_datetime', 'cmg_usd'
                                indexed by forecast_datetime
+            columns: Optional subset of feature/target columns to create. Only
+                     the producers these columns depend on are run
+                     (default: all features and targets)
 
         Returns:
-            DataFrame with all features and targets
+            DataFrame with all features and targets (or the requested columns)
         """
         df_feat = df.copy()
         self.feature_names = []
@@ -73,167 +140,173 @@ class CleanCMGFeatureEngineering:
         if cmg_column not in df_feat.columns:
             raise ValueError(f"Column '{cmg_column}' not found in DataFrame")
 
+        graph = self.build_feature_graph(include_programado=cmg_programado_df is not None)
+        target_names = set(self.get_target_names())
+
+        if columns is None:
+            requested = graph.outputs
+        else:
+            requested = list(dict.fromkeys(columns))
+            unknown = [c for c in requested if c not in graph.outputs]
+            if unknown:
+                raise ValueError(f"Unknown feature columns: {unknown}")
+
         print(f"Creating features for {len(df_feat)} hours of data...")
         print(f"Date range: {df_feat.index.min()} to {df_feat.index.max()}")
 
+        values = {
+            'index': df_feat.index,
+            'cmg': df_feat[cmg_column],
+            'cmg_programado': cmg_programado_df
+        }
+
+        # 1-6. Base features, 8. targets (only what was requested)
+        graph.compute([c for c in requested if not c.startswith('cmg_prog_')], values)
+
+        # 7. CMG Programado features (if available)
+        prog_requested = [c for c in requested if c.startswith('cmg_prog_')]
+        if prog_requested and not self._compute_programado_features(graph, prog_requested, values):
+            requested = [c for c in requested if c not in prog_requested]
+
+        self.feature_names = [c for c in requested if c not in target_names]
+
+        features = pd.DataFrame({c: np.asarray(values[c]) for c in requested}, index=df_feat.index)
+        df_feat = pd.concat([df_feat.drop(columns=[c for c in requested if c in df_feat.columns]), features], axis=1)
+
+        print(f"✓ Created {len(self.feature_names)} features")
+        print(f"✓ Created {len([c for c in requested if c in target_names])} target variables")
+
+        return df_feat
+
+    def build_feature_graph(self, include_programado: bool = False) -> FeatureGraph:
+        """
+        Declare every feature and target as a named producer
+
+        Source nodes: 'index' (DatetimeIndex), 'cmg' (CMG series) and
+        'cmg_programado' (CMG Programado frame). Output order matches the
+        feature_names order of a full create_features() run.
+        """
+        graph = FeatureGraph()
+
+        # Shared intermediates (not output columns)
+        graph.add('cmg_shift_1', ['cmg'], lambda cmg: cmg.shift(1), output=False)
+        graph.add('is_zero_shift_1', ['cmg'], lambda cmg: (cmg.shift(1) == 0).astype(int), output=False)
+
         # 1. Time-based features (always available, no leakage)
-        df_feat = self._add_time_features(df_feat)
+        self._add_time_features(graph)
 
         # 2. Lag features (shifted, so no leakage)
-        df_feat = self._add_lag_features(df_feat, cmg_column)
+        self._add_lag_features(graph)
 
         # 3. Rolling statistics (CRITICAL: shift(1) before rolling)
-        df_feat = self._add_rolling_features(df_feat, cmg_column)
+        self._add_rolling_features(graph)
 
         # 4. Zero pattern features
-        df_feat = self._add_zero_pattern_features(df_feat, cmg_column)
+        self._add_zero_pattern_features(graph)
 
         # 5. Trend features
-        df_feat = self._add_trend_features(df_feat, cmg_column)
+        self._add_trend_features(graph)
 
         # 6. Seasonal features
-        df_feat = self._add_seasonal_features(df_feat, cmg_column)
+        self._add_seasonal_features(graph)
 
-        # 7. CMG Programado features (if available)
-        if cmg_programado_df is not None:
-            df_feat = self._add_cmg_programado_features(df_feat, cmg_column, cmg_programado_df)
+        # 7. CMG Programado features
+        if include_programado:
+            self._add_cmg_programado_features(graph)
 
-        # 8. Create targets for all horizons
-        df_feat = self._add_targets(df_feat, cmg_column)
+        # 8. Targets for all horizons
+        self._add_targets(graph)
 
-        print(f"✓ Created {len(self.feature_names)} features")
-        print(f"✓ Created {len(self.target_horizons)} target variables")
-
-        return df_feat
+        return graph
 
-    def _add_time_features(self, df: pd.DataFrame) -> pd.DataFrame:
+    def _add_time_features(self, graph: FeatureGraph) -> None:
         """
         Add time-based features with cyclical encoding
         These are always available at prediction time, no leakage risk
         """
         # Hour of day (0-23)
-        df['hour'] = df.index.hour
-        df['hour_sin'] = np.sin(2 * np.pi * df['hour'] / 24)
-        df['hour_cos'] = np.cos(2 * np.pi * df['hour'] / 24)
-        self.feature_names.extend(['hour', 'hour_sin', 'hour_cos'])
+        graph.add('hour', ['index'], lambda idx: pd.Series(idx.hour, index=idx))
+        graph.add('hour_sin', ['hour'], lambda hour: np.sin(2 * np.pi * hour / 24))
+        graph.add('hour_cos', ['hour'], lambda hour: np.cos(2 * np.pi * hour / 24))
 
         # Day of week (0-6)
-        df['day_of_week'] = df.index.dayofweek
-        df['dow_sin'] = np.sin(2 * np.pi * df['day_of_week'] / 7)
-        df['dow_cos'] = np.cos(2 * np.pi * df['day_of_week'] / 7)
-        self.feature_names.extend(['day_of_week', 'dow_sin', 'dow_cos'])
+        graph.add('day_of_week', ['index'], lambda idx: pd.Series(idx.dayofweek, index=idx))
+        graph.add('dow_sin', ['day_of_week'], lambda dow: np.sin(2 * np.pi * dow / 7))
+        graph.add('dow_cos', ['day_of_week'], lambda dow: np.cos(2 * np.pi * dow / 7))
 
         # Month (1-12)
-        df['month'] = df.index.month
-        df['month_sin'] = np.sin(2 * np.pi * df['month'] / 12)
-        df['month_cos'] = np.cos(2 * np.pi * df['month'] / 12)
-        self.feature_names.extend(['month', 'month_sin', 'month_cos'])
+        graph.add('month', ['index'], lambda idx: pd.Series(idx.month, index=idx))
+        graph.add('month_sin', ['month'], lambda month: np.sin(2 * np.pi * month / 12))
+        graph.add('month_cos', ['month'], lambda month: np.cos(2 * np.pi * month / 12))
 
         # Weekend indicator
-        df['is_weekend'] = (df['day_of_week'] >= 5).astype(int)
-        self.feature_names.append('is_weekend')
+        graph.add('is_weekend', ['day_of_week'], lambda dow: (dow >= 5).astype(int))
 
         # Time of day categories
-        df['is_night'] = ((df['hour'] >= 0) & (df['hour'] < 6)).astype(int)
-        df['is_morning'] = ((df['hour'] >= 6) & (df['hour'] < 12)).astype(int)
-        df['is_afternoon'] = ((df['hour'] >= 12) & (df['hour'] < 18)).astype(int)
-        df['is_evening'] = ((df['hour'] >= 18) & (df['hour'] < 24)).astype(int)
-        self.feature_names.extend(['is_night', 'is_morning', 'is_afternoon', 'is_evening'])
+        graph.add('is_night', ['hour'], lambda hour: ((hour >= 0) & (hour < 6)).astype(int))
+        graph.add('is_morning', ['hour'], lambda hour: ((hour >= 6) & (hour < 12)).astype(int))
+        graph.add('is_afternoon', ['hour'], lambda hour: ((hour >= 12) & (hour < 18)).astype(int))
+        graph.add('is_evening', ['hour'], lambda hour: ((hour >= 18) & (hour < 24)).astype(int))
 
-        return df
-
-    def _add_lag_features(self, df: pd.DataFrame, cmg_column: str) -> pd.DataFrame:
+    def _add_lag_features(self, graph: FeatureGraph) -> None:
         """
         Add lagged CMG values
         Lags are inherently safe (use past data)
         """
         for lag in self.lag_hours:
-            df[f'cmg_lag_{lag}h'] = df[cmg_column].shift(lag)
-            self.feature_names.append(f'cmg_lag_{lag}h')
-
-        return df
+            graph.add(f'cmg_lag_{lag}h', ['cmg'], lambda cmg, lag=lag: cmg.shift(lag))
 
-    def _add_rolling_features(self, df: pd.DataFrame, cmg_column: str) -> pd.DataFrame:
+    def _add_rolling_features(self, graph: FeatureGraph) -> None:
         """
         Add rolling statistics with PROPER SHIFT to prevent leakage
 
         CRITICAL FIX: shift(1) BEFORE rolling() to exclude current hour
         """
         for window in self.rolling_windows:
-            # CORRECT: shift(1) ensures we only use past data
-            shifted_series = df[cmg_column].shift(1)
-
-            # Mean
-            df[f'cmg_mean_{window}h'] = shifted_series.rolling(
-                window, min_periods=1
-            ).mean()
+            # CORRECT: cmg_shift_1 ensures we only use past data
+            graph.add(f'cmg_mean_{window}h', ['cmg_shift_1'],
+                      lambda s, w=window: s.rolling(w, min_periods=1).mean())
 
             # Std deviation
-            df[f'cmg_std_{window}h'] = shifted_series.rolling(
-                window, min_periods=1
-            ).std().fillna(0)
+            graph.add(f'cmg_std_{window}h', ['cmg_shift_1'],
+                      lambda s, w=window: s.rolling(w, min_periods=1).std().fillna(0))
 
-            # Min
-            df[f'cmg_min_{window}h'] = shifted_series.rolling(
-                window, min_periods=1
-            ).min()
-
-            # Max
-            df[f'cmg_max_{window}h'] = shifted_series.rolling(
-                window, min_periods=1
-            ).max()
+            # Min / Max
+            graph.add(f'cmg_min_{window}h', ['cmg_shift_1'],
+                      lambda s, w=window: s.rolling(w, min_periods=1).min())
+            graph.add(f'cmg_max_{window}h', ['cmg_shift_1'],
+                      lambda s, w=window: s.rolling(w, min_periods=1).max())
 
             # Range
-            df[f'cmg_range_{window}h'] = (
-                df[f'cmg_max_{window}h'] - df[f'cmg_min_{window}h']
-            )
+            graph.add(f'cmg_range_{window}h', [f'cmg_max_{window}h', f'cmg_min_{window}h'],
+                      lambda high, low: high - low)
 
             # Coefficient of variation (CV)
-            df[f'cmg_cv_{window}h'] = df[f'cmg_std_{window}h'] / (
-                df[f'cmg_mean_{window}h'] + 1e-6
-            )
-
-            self.feature_names.extend([
-                f'cmg_mean_{window}h', f'cmg_std_{window}h',
-                f'cmg_min_{window}h', f'cmg_max_{window}h',
-                f'cmg_range_{window}h', f'cmg_cv_{window}h'
-            ])
-
-        return df
+            graph.add(f'cmg_cv_{window}h', [f'cmg_std_{window}h', f'cmg_mean_{window}h'],
+                      lambda std, mean: std / (mean + 1e-6))
 
-    def _add_zero_pattern_features(self, df: pd.DataFrame, cmg_column: str) -> pd.DataFrame:
+    def _add_zero_pattern_features(self, graph: FeatureGraph) -> None:
         """
         Add features about zero CMG patterns
         CRITICAL: Use shifted data only
         """
-        # Create shifted zero indicator
-        is_zero_shifted = (df[cmg_column].shift(1) == 0).astype(int)
-
         for window in [6, 12, 24, 48, 168]:
             # Count of zeros in window
-            df[f'zeros_count_{window}h'] = is_zero_shifted.rolling(
-                window, min_periods=1
-            ).sum()
+            graph.add(f'zeros_count_{window}h', ['is_zero_shift_1'],
+                      lambda z, w=window: z.rolling(w, min_periods=1).sum())
 
             # Ratio of zeros in window
-            df[f'zeros_ratio_{window}h'] = df[f'zeros_count_{window}h'] / window
-
-            self.feature_names.extend([
-                f'zeros_count_{window}h', f'zeros_ratio_{window}h'
-            ])
+            graph.add(f'zeros_ratio_{window}h', [f'zeros_count_{window}h'],
+                      lambda count, w=window: count / w)
 
         # Hours since last zero (using shifted data)
         # This is tricky - need to compute from past only
-        df['hours_since_zero'] = self._compute_hours_since_zero(df[cmg_column])
-        self.feature_names.append('hours_since_zero')
+        graph.add('hours_since_zero', ['cmg'], self._compute_hours_since_zero)
 
         # Binary indicators for zero at specific lags (critical for transitions!)
-        df['was_zero_1h_ago'] = (df[cmg_column].shift(1) == 0).astype(int)
-        df['was_zero_2h_ago'] = (df[cmg_column].shift(2) == 0).astype(int)
-        df['was_zero_24h_ago'] = (df[cmg_column].shift(24) == 0).astype(int)
-        self.feature_names.extend(['was_zero_1h_ago', 'was_zero_2h_ago', 'was_zero_24h_ago'])
-
-        return df
+        for lag in [1, 2, 24]:
+            graph.add(f'was_zero_{lag}h_ago', ['cmg'],
+                      lambda cmg, lag=lag: (cmg.shift(lag) == 0).astype(int))
 
     def _compute_hours_since_zero(self, cmg_series: pd.Series) -> pd.Series:
         """
@@ -249,7 +322,7 @@ class CleanCMGFeatureEngineering:
 
         return hours_since
 
-    def _add_trend_features(self, df: pd.DataFrame, cmg_column: str) -> pd.DataFrame:
+    def _add_trend_features(self, graph: FeatureGraph) -> None:
         """
         Add trend features (changes over time)
         Use only past data
@@ -257,59 +330,42 @@ class CleanCMGFeatureEngineering:
         NOTE: Using absolute differences instead of percentage changes
         to avoid inf values when CMG = 0
         """
+        # Absolute difference from last known over various windows
+        # Shows magnitude of recent changes (volatility indicator)
+        for window in [6, 12, 24, 48]:
+            graph.add(f'cmg_trend_{window}h', ['cmg_shift_1'],
+                      lambda s, w=window: s - s.shift(w))
+
         # Absolute change features (no division, no inf!)
         # These represent "how much did CMG change?" in absolute $/MWh terms
 
         # 1h change: difference between t-1 and t-2
-        df['cmg_change_1h'] = df[cmg_column].shift(1) - df[cmg_column].shift(2)
+        graph.add('cmg_change_1h', ['cmg'], lambda cmg: cmg.shift(1) - cmg.shift(2))
 
         # 24h change: difference between t-1 and t-25
-        df['cmg_change_24h'] = df[cmg_column].shift(1) - df[cmg_column].shift(25)
+        graph.add('cmg_change_24h', ['cmg'], lambda cmg: cmg.shift(1) - cmg.shift(25))
 
         # 48h change: longer-term trend
-        df['cmg_change_48h'] = df[cmg_column].shift(1) - df[cmg_column].shift(49)
-
-        # Absolute difference from last known over various windows
-        # Shows magnitude of recent changes (volatility indicator)
-        for window in [6, 12, 24, 48]:
-            shifted = df[cmg_column].shift(1)
-            df[f'cmg_trend_{window}h'] = shifted - shifted.shift(window)
-            self.feature_names.append(f'cmg_trend_{window}h')
-
-        self.feature_names.extend([
-            'cmg_change_1h', 'cmg_change_24h', 'cmg_change_48h'
-        ])
-
-        return df
+        graph.add('cmg_change_48h', ['cmg'], lambda cmg: cmg.shift(1) - cmg.shift(49))
 
-    def _add_seasonal_features(self, df: pd.DataFrame, cmg_column: str) -> pd.DataFrame:
+    def _add_seasonal_features(self, graph: FeatureGraph) -> None:
         """
         Add seasonal/weekly pattern features
         """
         # Same hour yesterday
-        df['cmg_same_hour_yesterday'] = df[cmg_column].shift(24)
+        graph.add('cmg_same_hour_yesterday', ['cmg'], lambda cmg: cmg.shift(24))
 
         # Same hour last week
-        df['cmg_same_hour_last_week'] = df[cmg_column].shift(168)
+        graph.add('cmg_same_hour_last_week', ['cmg'], lambda cmg: cmg.shift(168))
 
         # 7-day median at this hour (robust to anomalies)
-        df['cmg_7d_median_same_hour'] = self._compute_7day_median(df[cmg_column])
+        graph.add('cmg_7d_median_same_hour', ['cmg'], self._compute_7day_median)
 
         # Difference from seasonal patterns
-        df['cmg_diff_vs_yesterday'] = (
-            df[cmg_column].shift(1) - df['cmg_same_hour_yesterday']
-        )
-        df['cmg_diff_vs_last_week'] = (
-            df[cmg_column].shift(1) - df['cmg_same_hour_last_week']
-        )
-
-        self.feature_names.extend([
-            'cmg_same_hour_yesterday', 'cmg_same_hour_last_week',
-            'cmg_7d_median_same_hour', 'cmg_diff_vs_yesterday',
-            'cmg_diff_vs_last_week'
-        ])
-
-        return df
+        graph.add('cmg_diff_vs_yesterday', ['cmg_shift_1', 'cmg_same_hour_yesterday'],
+                  lambda prev, yesterday: prev - yesterday)
+        graph.add('cmg_diff_vs_last_week', ['cmg_shift_1', 'cmg_same_hour_last_week'],
+                  lambda prev, last_week: prev - last_week)
 
     def _compute_7day_median(self, cmg_series: pd.Series) -> pd.Series:
         """
@@ -319,8 +375,7 @@ class CleanCMGFeatureEngineering:
         # Shift by 168 hours (7 days) to get same hour last week
         return cmg_series.shift(168).bfill()
 
-    def _add_cmg_programado_features(self, df: pd.DataFrame, cmg_column: str,
-                                      prog_df: pd.DataFrame) -> pd.DataFrame:
+    def _add_cmg_programado_features(self, graph: FeatureGraph) -> None:
         """
         Add CMG Programado (official forecast) as features
 
@@ -333,83 +388,153 @@ class CleanCMGFeatureEngineering:
         - cmg_prog_spread: Difference between Programado and recent actual
         - cmg_prog_vs_mean: Programado relative to recent mean CMG
 
-        IMPORTANT: No leakage because CMG Programado is available at forecast time
-        (it's published before the actual hour)
+        IMPORTANT: No leakage - for base hour t, each cmg_prog_t+{h} is the newest
+        forecast for t+h whose forecast_datetime is before t (point-in-time as-of
+        join, see _asof_programado_matrix)
 
-        Args:
-            df: DataFrame with datetime index
-            cmg_column: Name of actual CMG column
-            prog_df: DataFrame with CMG Programado data
-                     Expected columns: 'forecast_datetime', 'target_datetime', 'cmg_usd'
+        Source node 'cmg_programado': DataFrame with CMG Programado data
+        Expected columns: 'forecast_datetime', 'target_datetime', 'cmg_usd'
         """
+        # (N, H) matrix: programado value for base hour t and horizon h
+        graph.add('cmg_prog_matrix', ['index', 'cmg_programado'],
+                  self._asof_programado_matrix, output=False)
+
+        # Add programado value for each horizon (t+1 to t+24)
+        prog_cols = []
+        for i, h in enumerate(self.target_horizons):
+            graph.add(f'cmg_prog_t+{h}', ['index', 'cmg_prog_matrix'],
+                      lambda idx, matrix, i=i: pd.Series(matrix[:, i], index=idx))
+            prog_cols.append(f'cmg_prog_t+{h}')
+
+        if not prog_cols:
+            return
+
+        # Spread features: difference between programado and recent actual
+        # This captures whether the market expects CMG to rise or fall
+
+        # Average programado across all horizons
+        graph.add('cmg_prog_avg', ['index'] + prog_cols,
+                  lambda idx, *cols: self._row_mean(idx, cols))
+
+        # Spread vs last known actual (shift(1) to use past data only)
+        graph.add('cmg_prog_spread', ['cmg_prog_avg', 'cmg_shift_1'],
+                  lambda avg, prev: avg - prev)
+
+        # Programado vs recent mean (24h rolling)
+        graph.add('cmg_prog_vs_mean', ['cmg_prog_avg', 'cmg_shift_1'],
+                  lambda avg, prev: avg - prev.rolling(24, min_periods=1).mean())
+
+        # Programado trend (is it rising or falling across horizons?)
+        # Compare early horizons (1-6) vs late horizons (19-24)
+        early_cols = [f'cmg_prog_t+{h}' for h in range(1, 7) if f'cmg_prog_t+{h}' in prog_cols]
+        late_cols = [f'cmg_prog_t+{h}' for h in range(19, 25) if f'cmg_prog_t+{h}' in prog_cols]
+        n_early = len(early_cols)
+        graph.add('cmg_prog_trend', ['index'] + early_cols + late_cols,
+                  lambda idx, *cols: self._row_mean(idx, cols[n_early:]) - self._row_mean(idx, cols[:n_early]))
+
+    def _compute_programado_features(self, graph: FeatureGraph, names: List[str],
+                                     values: Dict[str, object]) -> bool:
+        """Compute the requested CMG Programado columns; False if they had to be skipped"""
         print("  Adding CMG Programado features...")
 
-        try:
-            # Prepare programado data: group by (forecast_datetime, horizon)
-            # We want the programado value that was available at forecast time
-            # for each target hour
-
-            # First, ensure prog_df has the right format
-            if 'target_datetime' not in prog_df.columns or 'cmg_usd' not in prog_df.columns:
-                print("  Warning: CMG Programado data missing required columns")
-                return df
-
-            # Create lookup by target_datetime
-            # For each hour in our training data, find the most recent programado forecast
-            # that was available before that hour
-
-            prog_df = prog_df.copy()
-            if 'target_datetime' in prog_df.columns:
-                prog_df['target_datetime'] = pd.to_datetime(prog_df['target_datetime'])
-
-            # Create a lookup: target_datetime -> cmg_programado
-            # Use the most recent forecast for each target hour
-            prog_lookup = prog_df.groupby('target_datetime')['cmg_usd'].last().to_dict()
-
-            # Add programado value for each horizon (t+1 to t+24)
-            for h in self.target_horizons:
-                col_name = f'cmg_prog_t+{h}'
-                # For each row at time t, get the programado forecast for t+h
-                target_times = df.index + pd.Timedelta(hours=h)
-
-                df[col_name] = target_times.map(lambda x: prog_lookup.get(x, np.nan))
-                self.feature_names.append(col_name)
-
-            # Spread features: difference between programado and recent actual
-            # This captures whether the market expects CMG to rise or fall
-
-            # Average programado across all horizons
-            prog_cols = [f'cmg_prog_t+{h}' for h in self.target_horizons if f'cmg_prog_t+{h}' in df.columns]
-            if prog_cols:
-                df['cmg_prog_avg'] = df[prog_cols].mean(axis=1)
-                self.feature_names.append('cmg_prog_avg')
-
-                # Spread vs last known actual (shift(1) to use past data only)
-                df['cmg_prog_spread'] = df['cmg_prog_avg'] - df[cmg_column].shift(1)
-                self.feature_names.append('cmg_prog_spread')
-
-                # Programado vs recent mean (24h rolling)
-                recent_mean = df[cmg_column].shift(1).rolling(24, min_periods=1).mean()
-                df['cmg_prog_vs_mean'] = df['cmg_prog_avg'] - recent_mean
-                self.feature_names.append('cmg_prog_vs_mean')
-
-                # Programado trend (is it rising or falling across horizons?)
-                # Compare early horizons (1-6) vs late horizons (19-24)
-                early_prog = df[[f'cmg_prog_t+{h}' for h in range(1, 7) if f'cmg_prog_t+{h}' in df.columns]].mean(axis=1)
-                late_prog = df[[f'cmg_prog_t+{h}' for h in range(19, 25) if f'cmg_prog_t+{h}' in df.columns]].mean(axis=1)
-                df['cmg_prog_trend'] = late_prog - early_prog
-                self.feature_names.append('cmg_prog_trend')
-
-            print(f"  ✓ Added {len([c for c in prog_cols])} CMG Programado horizon features")
-            print(f"  ✓ Added spread and trend features")
+        prog_df = values['cmg_programado']
+        # First, ensure prog_df has the right format
+        if 'target_datetime' not in prog_df.columns or 'cmg_usd' not in prog_df.columns:
+            print("  Warning: CMG Programado data missing required columns")
+            return False
 
+        try:
+            graph.compute(names, values)
         except Exception as e:
             print(f"  Warning: Error adding CMG Programado features: {e}")
             # Continue without these features
+            return False
+
+        n_horizon = len([c for c in names if c.startswith('cmg_prog_t+')])
+        print(f"  ✓ Added {n_horizon} CMG Programado horizon features")
+        print(f"  ✓ Added spread and trend features")
+        return True
+
+    @staticmethod
+    def _row_mean(index: pd.DatetimeIndex, columns) -> pd.Series:
+        """Row-wise mean of several aligned Series (NaN-skipping, like DataFrame.mean)"""
+        if not columns:
+            return pd.DataFrame(index=index).mean(axis=1)
+        return pd.concat(columns, axis=1).mean(axis=1)
+
+    def _asof_programado_matrix(self, index: pd.DatetimeIndex, prog_df: pd.DataFrame) -> np.ndarray:
+        """
+        Point-in-time lookup of CMG Programado for every (base hour, horizon)
+
+        For base hour t and horizon h, picks the newest forecast for target t+h
+        whose forecast_datetime is strictly before t (what was actually
+        published when the forecast would have been made). Implemented as one
+        sorted merge_asof over all N×H (base, target) pairs.
+
+        Without a forecast_datetime column, falls back to the last value
+        available per target_datetime.
 
-        return df
+        Returns:
+            Array of shape (len(index), len(target_horizons)), NaN where missing
+        """
+        n_rows, n_horizons = len(index), len(self.target_horizons)
+
+        prog = pd.DataFrame({
+            'target_datetime': self._to_index_datetimes(prog_df['target_datetime'], index),
+            'cmg_usd': pd.to_numeric(prog_df['cmg_usd'], errors='coerce')
+        })
+
+        # Row-major (base 0: h1..hH, base 1: h1..hH, ...)
+        base_rep = index.repeat(n_horizons)
+        targets = base_rep + pd.to_timedelta(np.tile(self.target_horizons, n_rows), unit='h')
+
+        if 'forecast_datetime' not in prog_df.columns:
+            prog_lookup = prog.groupby('target_datetime')['cmg_usd'].last()
+            return prog_lookup.reindex(targets).to_numpy(dtype=float).reshape(n_rows, n_horizons)
+
+        prog['forecast_datetime'] = self._to_index_datetimes(prog_df['forecast_datetime'], index)
+
+        # Several nodes can publish the same (forecast, target): average them
+        prog = (prog.dropna(subset=['forecast_datetime', 'target_datetime'])
+                    .groupby(['forecast_datetime', 'target_datetime'], sort=False)['cmg_usd']
+                    .mean()
+                    .reset_index()
+                    .sort_values('forecast_datetime', kind='stable'))
+
+        left = pd.DataFrame({'base': base_rep, 'target_datetime': targets})
+        order = np.argsort(base_rep, kind='stable')
+        merged = pd.merge_asof(
+            left.iloc[order],
+            prog,
+            left_on='base',
+            right_on='forecast_datetime',
+            by='target_datetime',
+            direction='backward',
+            allow_exact_matches=False
+        )
+
+        values = np.empty(n_rows * n_horizons)
+        values[order] = merged['cmg_usd'].to_numpy(dtype=float)
+        return values.reshape(n_rows, n_horizons)
 
-    def _add_targets(self, df: pd.DataFrame, cmg_column: str) -> pd.DataFrame:
+    @staticmethod
+    def _to_index_datetimes(values: pd.Series, index: pd.DatetimeIndex) -> pd.Series:
+        """Parse datetimes and match their timezone to the feature index"""
+        try:
+            series = pd.to_datetime(values)
+        except ValueError:
+            # Mixed UTC offsets (e.g. across a DST change)
+            series = pd.to_datetime(values, utc=True)
+
+        if index.tz is None and series.dt.tz is not None:
+            return series.dt.tz_convert('America/Santiago').dt.tz_localize(None)
+        if index.tz is not None and series.dt.tz is None:
+            return series.dt.tz_localize(index.tz)
+        if index.tz is not None:
+            return series.dt.tz_convert(index.tz)
+        return series
+
+    def _add_targets(self, graph: FeatureGraph) -> None:
         """
         Create target variables for all horizons
 
@@ -418,12 +543,10 @@ class CleanCMGFeatureEngineering:
         """
         for h in self.target_horizons:
             # Binary target: is CMG zero at t+h?
-            df[f'is_zero_t+{h}'] = (df[cmg_column].shift(-h) == 0).astype(float)
+            graph.add(f'is_zero_t+{h}', ['cmg'], lambda cmg, h=h: (cmg.shift(-h) == 0).astype(float))
 
             # Regression target: actual CMG value at t+h
-            df[f'cmg_value_t+{h}'] = df[cmg_column].shift(-h)
-
-        return df
+            graph.add(f'cmg_value_t+{h}', ['cmg'], lambda cmg, h=h: cmg.shift(-h))
 
     def validate_no_leakage(self, df: pd.DataFrame, cmg_column: str) -> Dict[str, bool]:
         """
@@ -523,6 +646,345 @@ class CleanCMGFeatureEngineering:
         return targets
 
 
+class IncrementalFeatureState:
+    """
+    Streaming version of CleanCMGFeatureEngineering's base features
+
+    Keeps just enough state (a short value buffer plus running window
+    accumulators) to produce the feature row for one new CMG hour in
+    O(windows) instead of recomputing the whole frame. The accumulators
+    replicate pandas' rolling kernels (Kahan-compensated mean, Welford
+    variance, monotonic-deque min/max), so every row matches
+    create_features() on the same input bit for bit.
+
+    Feature semantics match the LAST row of a batch run: row t only uses
+    values up to t-1 (cmg_7d_median_same_hour is the plain 168h lag, since
+    bfill cannot look past the last row). CMG Programado features and
+    targets are not part of the state.
+
+    Usage:
+        state = IncrementalFeatureState.from_history(cmg_df)
+        state.save('feature_state.pkl')
+
+        state = IncrementalFeatureState.load('feature_state.pkl')
+        X_base = state.update(new_timestamp, new_cmg_value)
+    """
+
+    ZERO_WINDOWS = [6, 12, 24, 48, 168]
+    TREND_WINDOWS = [6, 12, 24, 48]
+
+    # Same tolerance pandas uses to detect catastrophic cancellation in roll_var
+    _INV_COND_TOL = np.finfo(np.float64).eps * 1e3
+
+    _HOUR_SIN = np.sin(2 * np.pi * np.arange(24) / 24)
+    _HOUR_COS = np.cos(2 * np.pi * np.arange(24) / 24)
+    _DOW_SIN = np.sin(2 * np.pi * np.arange(7) / 7)
+    _DOW_COS = np.cos(2 * np.pi * np.arange(7) / 7)
+    _MONTH_SIN = np.sin(2 * np.pi * np.arange(13) / 12)
+    _MONTH_COS = np.cos(2 * np.pi * np.arange(13) / 12)
+
+    def __init__(self, engineer: CleanCMGFeatureEngineering = None):
+        """
+        Create an empty state (use from_history() to warm it up)
+
+        Args:
+            engineer: Feature engineering configuration to mirror
+                      (default: get_feature_engineer(), the production config)
+        """
+        engineer = engineer or get_feature_engineer()
+        self.rolling_windows = list(engineer.rolling_windows)
+        self.lag_hours = list(engineer.lag_hours)
+
+        # Raw CMG history, long enough for the longest lag/window/change
+        buffer_size = max(self.lag_hours + [w + 1 for w in self.rolling_windows] + [169])
+        self._values = deque(maxlen=buffer_size)
+        self._zero_flags = deque(maxlen=max(self.ZERO_WINDOWS) + 1)
+
+        self.n_rows = 0
+        self.last_timestamp = None
+        self._hours_since_zero = -1
+
+        self._mean = {w: self._new_mean_state() for w in self.rolling_windows}
+        self._var = {w: self._new_var_state() for w in self.rolling_windows}
+        self._min = {w: deque() for w in self.rolling_windows}
+        self._max = {w: deque() for w in self.rolling_windows}
+        self._zero_counts = {w: 0 for w in self.ZERO_WINDOWS}
+
+        self.feature_names = self._build_feature_names()
+        self.features: Dict[str, float] = {}
+
+    # ------------------------------------------------------------------
+    # Construction / persistence
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def from_history(cls, df: pd.DataFrame, cmg_column: str = 'CMG [$/MWh]',
+                     engineer: CleanCMGFeatureEngineering = None) -> 'IncrementalFeatureState':
+        """Replay a historical frame (same input create_features() would get)"""
+        state = cls(engineer)
+        for timestamp, value in zip(df.index, df[cmg_column].to_numpy(dtype=float)):
+            state.update(timestamp, value)
+        return state
+
+    def save(self, path) -> None:
+        """Persist the state to disk"""
+        with open(path, 'wb') as f:
+            pickle.dump(self, f)
+
+    @classmethod
+    def load(cls, path) -> 'IncrementalFeatureState':
+        """Load a state saved with save()"""
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+    # ------------------------------------------------------------------
+    # Streaming update
+    # ------------------------------------------------------------------
+
+    def update(self, timestamp, value: float) -> pd.DataFrame:
+        """
+        Append one CMG hour and return its feature row
+
+        Args:
+            timestamp: Datetime of the new row (the next row of the frame)
+            value: CMG value at that hour (NaN allowed)
+
+        Returns:
+            One-row DataFrame with the base features for `timestamp`
+        """
+        timestamp = pd.Timestamp(timestamp)
+        t = self.n_rows
+        values = self._values
+
+        # Row t of the shift(1) series is the previous raw value
+        prev = values[-1] if t >= 1 else np.nan
+
+        def past(k):
+            """Raw value at row t-k (NaN if before the start of the history)"""
+            return values[-k] if k <= len(values) else np.nan
+
+        features = {}
+
+        # 1. Time features
+        hour, dow, month = timestamp.hour, timestamp.dayofweek, timestamp.month
+        features.update({
+            'hour': hour, 'hour_sin': self._HOUR_SIN[hour], 'hour_cos': self._HOUR_COS[hour],
+            'day_of_week': dow, 'dow_sin': self._DOW_SIN[dow], 'dow_cos': self._DOW_COS[dow],
+            'month': month, 'month_sin': self._MONTH_SIN[month], 'month_cos': self._MONTH_COS[month],
+            'is_weekend': int(dow >= 5),
+            'is_night': int(0 <= hour < 6), 'is_morning': int(6 <= hour < 12),
+            'is_afternoon': int(12 <= hour < 18), 'is_evening': int(18 <= hour < 24),
+        })
+
+        # 2. Lag features
+        for lag in self.lag_hours:
+            features[f'cmg_lag_{lag}h'] = past(lag)
+
+        # 3. Rolling statistics over shift(1): add row t, drop row t-window
+        for window in self.rolling_windows:
+            # Row t-window of the shift(1) series (row 0 is NaN), if it exists
+            dropped = past(window + 1) if t - window >= 0 else None
+
+            mean_state = self._mean[window]
+            if dropped is not None:
+                self._remove_mean(mean_state, dropped)
+            self._add_mean(mean_state, prev)
+            mean = self._calc_mean(mean_state)
+
+            var_state = self._var[window]
+            if dropped is not None:
+                self._remove_var(var_state, dropped)
+            self._add_var(var_state, prev)
+            if var_state['unstable']:
+                self._recompute_var(var_state, window, t)
+            var = self._calc_var(var_state)
+            # zsqrt() clips negative variance to 0, then .fillna(0)
+            std = 0.0 if var != var or var < 0 else math.sqrt(var)
+
+            minimum = self._push_extreme(self._min[window], t, prev, window, lambda a, b: a >= b)
+            maximum = self._push_extreme(self._max[window], t, prev, window, lambda a, b: a <= b)
+
+            features[f'cmg_mean_{window}h'] = mean
+            features[f'cmg_std_{window}h'] = std
+            features[f'cmg_min_{window}h'] = minimum
+            features[f'cmg_max_{window}h'] = maximum
+            features[f'cmg_range_{window}h'] = maximum - minimum
+            features[f'cmg_cv_{window}h'] = std / (mean + 1e-6)
+
+        # 4. Zero pattern features
+        is_zero_prev = int(prev == 0)
+        self._zero_flags.append(is_zero_prev)
+        for window in self.ZERO_WINDOWS:
+            self._zero_counts[window] += is_zero_prev
+            if t - window >= 0:
+                self._zero_counts[window] -= self._zero_flags[-(window + 1)]
+            count = float(self._zero_counts[window])
+            features[f'zeros_count_{window}h'] = count
+            features[f'zeros_ratio_{window}h'] = count / window
+
+        self._hours_since_zero = 0 if is_zero_prev else self._hours_since_zero + 1
+        features['hours_since_zero'] = self._hours_since_zero
+        features['was_zero_1h_ago'] = is_zero_prev
+        features['was_zero_2h_ago'] = int(past(2) == 0)
+        features['was_zero_24h_ago'] = int(past(24) == 0)
+
+        # 5. Trend features
+        for window in self.TREND_WINDOWS:
+            features[f'cmg_trend_{window}h'] = prev - past(window + 1)
+        features['cmg_change_1h'] = prev - past(2)
+        features['cmg_change_24h'] = prev - past(25)
+        features['cmg_change_48h'] = prev - past(49)
+
+        # 6. Seasonal features
+        features['cmg_same_hour_yesterday'] = past(24)
+        features['cmg_same_hour_last_week'] = past(168)
+        features['cmg_7d_median_same_hour'] = past(168)
+        features['cmg_diff_vs_yesterday'] = prev - past(24)
+        features['cmg_diff_vs_last_week'] = prev - past(168)
+
+        values.append(float(value))
+        self.n_rows += 1
+        self.last_timestamp = timestamp
+        self.features = features
+
+        return self.to_frame()
+
+    def to_frame(self) -> pd.DataFrame:
+        """Current feature row as a one-row DataFrame (same column order as batch)"""
+        return pd.DataFrame([[self.features[name] for name in self.feature_names]],
+                            index=pd.DatetimeIndex([self.last_timestamp]),
+                            columns=self.feature_names)
+
+    def _build_feature_names(self) -> List[str]:
+        names = ['hour', 'hour_sin', 'hour_cos', 'day_of_week', 'dow_sin', 'dow_cos',
+                 'month', 'month_sin', 'month_cos', 'is_weekend',
+                 'is_night', 'is_morning', 'is_afternoon', 'is_evening']
+        names += [f'cmg_lag_{lag}h' for lag in self.lag_hours]
+        for w in self.rolling_windows:
+            names += [f'cmg_mean_{w}h', f'cmg_std_{w}h', f'cmg_min_{w}h',
+                      f'cmg_max_{w}h', f'cmg_range_{w}h', f'cmg_cv_{w}h']
+        for w in self.ZERO_WINDOWS:
+            names += [f'zeros_count_{w}h', f'zeros_ratio_{w}h']
+        names += ['hours_since_zero', 'was_zero_1h_ago', 'was_zero_2h_ago', 'was_zero_24h_ago']
+        names += [f'cmg_trend_{w}h' for w in self.TREND_WINDOWS]
+        names += ['cmg_change_1h', 'cmg_change_24h', 'cmg_change_48h']
+        names += ['cmg_same_hour_yesterday', 'cmg_same_hour_last_week',
+                  'cmg_7d_median_same_hour', 'cmg_diff_vs_yesterday', 'cmg_diff_vs_last_week']
+        return names
+
+    # ------------------------------------------------------------------
+    # Window accumulators (mirror pandas/_libs/window/aggregations.pyx)
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _new_mean_state() -> Dict[str, float]:
+        return {'nobs': 0, 'sum_x': 0.0, 'neg_ct': 0, 'comp_add': 0.0, 'comp_remove': 0.0,
+                'same_ct': 0, 'prev_value': np.nan}
+
+    @staticmethod
+    def _add_mean(s: Dict, val: float) -> None:
+        if val == val:
+            s['nobs'] += 1
+            y = val - s['comp_add']
+            t = s['sum_x'] + y
+            s['comp_add'] = t - s['sum_x'] - y
+            s['sum_x'] = t
+            if math.copysign(1.0, val) < 0:
+                s['neg_ct'] += 1
+            s['same_ct'] = s['same_ct'] + 1 if val == s['prev_value'] else 1
+            s['prev_value'] = val
+
+    @staticmethod
+    def _remove_mean(s: Dict, val: float) -> None:
+        if val == val:
+            s['nobs'] -= 1
+            y = -val - s['comp_remove']
+            t = s['sum_x'] + y
+            s['comp_remove'] = t - s['sum_x'] - y
+            s['sum_x'] = t
+            if math.copysign(1.0, val) < 0:
+                s['neg_ct'] -= 1
+
+    @staticmethod
+    def _calc_mean(s: Dict) -> float:
+        nobs = s['nobs']
+        if nobs < 1:
+            return np.nan
+        result = s['sum_x'] / nobs
+        if s['same_ct'] >= nobs:
+            result = s['prev_value']
+        elif s['neg_ct'] == 0 and result < 0:
+            result = 0.0
+        elif s['neg_ct'] == nobs and result > 0:
+            result = 0.0
+        return result
+
+    @staticmethod
+    def _new_var_state() -> Dict[str, float]:
+        return {'nobs': 0.0, 'mean_x': 0.0, 'ssqdm_x': 0.0, 'comp_add': 0.0, 'comp_remove': 0.0,
+                'unstable': False}
+
+    @classmethod
+    def _add_var(cls, s: Dict, val: float) -> None:
+        if val != val:
+            return
+        prev_m2 = s['ssqdm_x']
+        s['nobs'] += 1
+        prev_mean = s['mean_x'] - s['comp_add']
+        y = val - s['comp_add']
+        t = y - s['mean_x']
+        s['comp_add'] = t + s['mean_x'] - y
+        s['mean_x'] = s['mean_x'] + t / s['nobs'] if s['nobs'] else 0.0
+        s['ssqdm_x'] = s['ssqdm_x'] + (val - prev_mean) * (val - s['mean_x'])
+        if prev_m2 * cls._INV_COND_TOL > s['ssqdm_x']:
+            s['unstable'] = True
+
+    @classmethod
+    def _remove_var(cls, s: Dict, val: float) -> None:
+        if val != val:
+            return
+        prev_m2 = s['ssqdm_x']
+        s['nobs'] -= 1
+        if s['nobs']:
+            prev_mean = s['mean_x'] - s['comp_remove']
+            y = val - s['comp_remove']
+            t = y - s['mean_x']
+            s['comp_remove'] = t + s['mean_x'] - y
+            s['mean_x'] = s['mean_x'] - t / s['nobs']
+            s['ssqdm_x'] = s['ssqdm_x'] - (val - prev_mean) * (val - s['mean_x'])
+            if prev_m2 * cls._INV_COND_TOL > s['ssqdm_x']:
+                s['unstable'] = True
+        else:
+            s['mean_x'] = 0.0
+            s['ssqdm_x'] = 0.0
+            s['unstable'] = False
+
+    def _recompute_var(self, s: Dict, window: int, t: int) -> None:
+        """Rebuild the variance accumulator from the raw window (as pandas does)"""
+        s.update(self._new_var_state())
+        # Rows max(0, t+1-window)..t of the shift(1) series; row 0 is NaN
+        for row in range(max(1, t + 1 - window), t + 1):
+            self._add_var(s, self._values[-(t - row + 1)])
+        s['unstable'] = False
+
+    @staticmethod
+    def _calc_var(s: Dict) -> float:
+        if s['nobs'] > 1:
+            return s['ssqdm_x'] / (s['nobs'] - 1.0)
+        return np.nan
+
+    @staticmethod
+    def _push_extreme(window_deque: deque, t: int, val: float, window: int, dominated) -> float:
+        """Monotonic deque update for rolling min/max; returns the window extreme"""
+        if val == val:
+            while window_deque and dominated(window_deque[-1][1], val):
+                window_deque.pop()
+            window_deque.append((t, val))
+        while window_deque and window_deque[0][0] <= t - window:
+            window_deque.popleft()
+        return window_deque[0][1] if window_deque else np.nan
+
+
 def create_train_val_test_splits(
     df: pd.DataFrame,
     train_ratio: float = 0.70,
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+ML Feature Store
+================
+
+On-disk cache for CleanCMGFeatureEngineering.create_features() output, so
+repeated training and hyper-parameter runs skip feature engineering.
+
+Entries live under data/feature_store/<key>/ where <key> hashes:
+- the feature engineering configuration (horizons, windows, lags, version)
+- the CMG Programado frame (if any)
+
+Each entry stores the engineered matrix (Parquet, feature columns as
+float32; pickle if pyarrow is not installed), a fingerprint of the raw CMG
+series it was built from, and an IncrementalFeatureState.
+
+Lookup:
+1. Same raw series       -> load the matrix, no feature engineering
+2. Raw series extended   -> only the new tail hours are computed (streamed
+   through the saved IncrementalFeatureState) and appended; targets are
+   refreshed for the rows whose future hours became known.
+   Only without CMG Programado (its features depend on the whole frame).
+3. Anything else         -> full create_features() and the entry is replaced
+
+Usage:
+    from ml_feature_store import cached_create_features
+
+    df_feat = cached_create_features(feature_engineer, df, cmg_column='CMG [$/MWh]')
+    feature_names = feature_engineer.get_feature_names()
+"""
+
+import json
+import hashlib
+import shutil
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from ml_feature_engineering import CleanCMGFeatureEngineering, IncrementalFeatureState
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+FEATURE_STORE_DIR = PROJECT_ROOT / "data" / "feature_store"
+
+# Bump when create_features() changes so old entries stop matching
+FEATURE_VERSION = 2
+
+
+def _series_fingerprint(index: pd.DatetimeIndex, values: np.ndarray) -> str:
+    """Hash of a raw CMG series (timestamps + values)"""
+    digest = hashlib.sha256()
+    digest.update(np.asarray(index.asi8, dtype=np.int64).tobytes())
+    digest.update(np.ascontiguousarray(values, dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+def _frame_fingerprint(df: Optional[pd.DataFrame]) -> str:
+    """Hash of an arbitrary DataFrame (CMG Programado), order-sensitive"""
+    if df is None:
+        return 'none'
+    hashed = pd.util.hash_pandas_object(df.reset_index(drop=True), index=False)
+    digest = hashlib.sha256(hashed.to_numpy().tobytes())
+    digest.update(','.join(map(str, df.columns)).encode())
+    return digest.hexdigest()
+
+
+class FeatureStore:
+    """Disk cache of engineered feature matrices"""
+
+    def __init__(self, root: Path = FEATURE_STORE_DIR):
+        self.root = Path(root)
+
+    def entry_key(self, engineer: CleanCMGFeatureEngineering, cmg_column: str,
+                  cmg_programado_df: Optional[pd.DataFrame] = None) -> str:
+        """Cache key: feature configuration + CMG Programado frame"""
+        config = {
+            'version': FEATURE_VERSION,
+            'cmg_column': cmg_column,
+            'target_horizons': list(engineer.target_horizons),
+            'rolling_windows': list(engineer.rolling_windows),
+            'lag_hours': list(engineer.lag_hours),
+            'programado': _frame_fingerprint(cmg_programado_df)
+        }
+        return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()[:16]
+
+    def get_or_create(self, engineer: CleanCMGFeatureEngineering, df: pd.DataFrame,
+                      cmg_column: str = 'CMG [$/MWh]',
+                      cmg_programado_df: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """
+        Drop-in replacement for engineer.create_features(df, cmg_column, cmg_programado_df)
+
+        Also restores engineer.feature_names so get_feature_names() works as usual.
+        """
+        entry_dir = self.root / self.entry_key(engineer, cmg_column, cmg_programado_df)
+        values = df[cmg_column].to_numpy(dtype=float)
+        meta = self._read_meta(entry_dir)
+
+        if meta is not None:
+            n_cached = meta['n_rows']
+            if n_cached == len(df) and meta['raw_fingerprint'] == _series_fingerprint(df.index, values):
+                print(f"  ✓ Feature store hit: {entry_dir.name} ({n_cached:,} rows)")
+                engineer.feature_names = list(meta['feature_names'])
+                df_feat = self._read_frame(entry_dir, meta)
+                # Parquet drops the index freq; the fingerprint guarantees the same timestamps
+                df_feat.index = df.index
+                return df_feat
+
+            extends = (
+                cmg_programado_df is None
+                and len(df) > n_cached
+                and meta['raw_fingerprint'] == _series_fingerprint(df.index[:n_cached], values[:n_cached])
+            )
+            if extends:
+                print(f"  ✓ Feature store tail update: {entry_dir.name} (+{len(df) - n_cached} rows)")
+                df_feat = self._append_tail(entry_dir, meta, engineer, df, cmg_column)
+                self._write_entry(entry_dir, engineer, df, values, df_feat, cmg_column, meta['state'])
+                return df_feat
+
+        print(f"  Feature store miss: computing features ({len(df):,} rows)")
+        df_feat = engineer.create_features(df, cmg_column=cmg_column, cmg_programado_df=cmg_programado_df)
+
+        state = None
+        if cmg_programado_df is None:
+            state = IncrementalFeatureState.from_history(df, cmg_column=cmg_column, engineer=engineer)
+
+        df_feat = self._downcast(df_feat, engineer.get_feature_names())
+        self._write_entry(entry_dir, engineer, df, values, df_feat, cmg_column,
+                          'state.pkl' if state is not None else None, state)
+        return df_feat
+
+    # ------------------------------------------------------------------
+    # Tail update
+    # ------------------------------------------------------------------
+
+    def _append_tail(self, entry_dir: Path, meta: dict, engineer: CleanCMGFeatureEngineering,
+                     df: pd.DataFrame, cmg_column: str) -> pd.DataFrame:
+        cached = self._read_frame(entry_dir, meta)
+        state = IncrementalFeatureState.load(entry_dir / meta['state'])
+        feature_names = list(meta['feature_names'])
+
+        tail = df.iloc[meta['n_rows']:]
+        rows = [state.update(ts, v) for ts, v in zip(tail.index, tail[cmg_column].to_numpy(dtype=float))]
+        new_rows = pd.concat(rows)[feature_names]
+        new_rows.insert(0, cmg_column, tail[cmg_column].to_numpy())
+
+        df_feat = pd.concat([cached[[cmg_column] + feature_names], self._downcast(new_rows, feature_names)])
+        df_feat.index = df.index
+        cmg = df[cmg_column]
+
+        # bfill() looks forward, so new hours can fill gaps in earlier rows
+        if 'cmg_7d_median_same_hour' in feature_names:
+            df_feat['cmg_7d_median_same_hour'] = (
+                engineer._compute_7day_median(cmg).astype(df_feat['cmg_7d_median_same_hour'].dtype)
+            )
+
+        # Targets for the whole frame (cheap, and earlier rows gain newly known futures)
+        targets = {}
+        for h in engineer.target_horizons:
+            targets[f'is_zero_t+{h}'] = (cmg.shift(-h) == 0).astype(float)
+            targets[f'cmg_value_t+{h}'] = cmg.shift(-h)
+        df_feat = pd.concat([df_feat, pd.DataFrame(targets, index=df.index)], axis=1)
+
+        engineer.feature_names = feature_names
+        state.save(entry_dir / meta['state'])
+        return df_feat[list(cached.columns)].astype(cached.dtypes.to_dict())
+
+    # ------------------------------------------------------------------
+    # Storage
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _downcast(df_feat: pd.DataFrame, feature_names) -> pd.DataFrame:
+        """Store feature columns as float32 (targets and raw CMG keep full precision)"""
+        float_cols = [c for c in feature_names if c in df_feat.columns and df_feat[c].dtype.kind == 'f']
+        return df_feat.astype({c: np.float32 for c in float_cols})
+
+    @staticmethod
+    def _read_meta(entry_dir: Path) -> Optional[dict]:
+        meta_file = entry_dir / "meta.json"
+        if not meta_file.exists():
+            return None
+        try:
+            with open(meta_file, 'r') as f:
+                return json.load(f)
+        except (ValueError, OSError) as e:
+            print(f"  ⚠️  Ignoring unreadable feature store entry {entry_dir.name}: {e}")
+            return None
+
+    @staticmethod
+    def _read_frame(entry_dir: Path, meta: dict) -> pd.DataFrame:
+        path = entry_dir / meta['matrix']
+        if path.suffix == '.parquet':
+            return pd.read_parquet(path)
+        return pd.read_pickle(path)
+
+    def _write_entry(self, entry_dir: Path, engineer: CleanCMGFeatureEngineering, df: pd.DataFrame,
+                     values: np.ndarray, df_feat: pd.DataFrame, cmg_column: str,
+                     state_file: Optional[str], state: Optional[IncrementalFeatureState] = None):
+        tmp_dir = entry_dir.with_name(entry_dir.name + '.tmp')
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_dir.mkdir(parents=True)
+
+        try:
+            df_feat.to_parquet(tmp_dir / "features.parquet")
+            matrix = "features.parquet"
+        except ImportError:
+            # pyarrow/fastparquet not installed
+            df_feat.to_pickle(tmp_dir / "features.pkl")
+            matrix = "features.pkl"
+
+        if state is not None:
+            state.save(tmp_dir / state_file)
+        elif state_file is not None and (entry_dir / state_file).exists():
+            shutil.copy2(entry_dir / state_file, tmp_dir / state_file)
+
+        meta = {
+            'n_rows': len(df),
+            'first_index': str(df.index.min()),
+            'last_index': str(df.index.max()),
+            'raw_fingerprint': _series_fingerprint(df.index, values),
+            'cmg_column': cmg_column,
+            'feature_names': engineer.get_feature_names(),
+            'matrix': matrix,
+            'state': state_file,
+            'feature_version': FEATURE_VERSION
+        }
+        with open(tmp_dir / "meta.json", 'w') as f:
+            json.dump(meta, f, indent=2)
+
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        tmp_dir.rename(entry_dir)
+
+
+def cached_create_features(engineer: CleanCMGFeatureEngineering, df: pd.DataFrame,
+                           cmg_column: str = 'CMG [$/MWh]',
+                           cmg_programado_df: Optional[pd.DataFrame] = None,
+                           store: Optional[FeatureStore] = None) -> pd.DataFrame:
+    """create_features() through the default on-disk FeatureStore"""
+    return (store or FeatureStore()).get_or_create(
+        engineer, df, cmg_column=cmg_column, cmg_programado_df=cmg_programado_df
+    )
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+ML Model Bundle
+===============
+
+Loads the whole models_24h/ tree exactly once per process:
+
+- Stage 1 (zero detection): LightGBM + XGBoost boosters per horizon
+- Stage 2 (value prediction): LightGBM median/q10/q90 + XGBoost per horizon
+- Feature orders (feature_names.pkl for both stages)
+- Decision thresholds (hour-based or horizon-based)
+- Meta-calibrator for zero probabilities
+
+Every stage of the forecast receives the same ModelBundle instead of
+re-opening booster files, so model I/O is paid once per run. The bundle
+also records how long each stage took to load (see load_time_report()).
+
+Usage:
+    from ml_model_bundle import ModelBundle
+
+    bundle = ModelBundle.load()
+    print(bundle.load_time_report())
+"""
+
+import time
+import pickle
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import lightgbm as lgb
+import xgboost as xgb
+
+# Paths relative to project root (scripts/production/ -> project root)
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+MODELS_DIR = PROJECT_ROOT / "models_24h"
+
+
+def load_optimal_thresholds(models_dir: Path = MODELS_DIR) -> Tuple[Dict[int, float], str]:
+    """Load optimal decision thresholds - now hour-based instead of horizon-based"""
+    zero_dir = Path(models_dir) / "zero_detection"
+
+    # Try new hour-based calibrated thresholds first
+    hour_thresholds_npy = zero_dir / "optimal_thresholds_by_hour_calibrated.npy"
+    hour_thresholds_csv = zero_dir / "optimal_thresholds_by_hour_calibrated.csv"
+
+    if hour_thresholds_npy.exists():
+        thresholds_array = np.load(hour_thresholds_npy)
+        thresholds_dict = {h: float(thresholds_array[h]) for h in range(24)}
+        print(f"  ✓ Loaded hour-based calibrated thresholds (range: {min(thresholds_dict.values()):.3f}-{max(thresholds_dict.values()):.3f})")
+        return thresholds_dict, 'hour-based'
+
+    elif hour_thresholds_csv.exists():
+        thresholds_df = pd.read_csv(hour_thresholds_csv)
+        thresholds_dict = {int(row['target_hour']): row['threshold'] for _, row in thresholds_df.iterrows()}
+        print(f"  ✓ Loaded hour-based thresholds (range: {min(thresholds_dict.values()):.3f}-{max(thresholds_dict.values()):.3f})")
+        return thresholds_dict, 'hour-based'
+
+    # Fallback to old horizon-based thresholds
+    horizon_thresholds_file = zero_dir / "optimal_thresholds.csv"
+    if horizon_thresholds_file.exists():
+        thresholds_df = pd.read_csv(horizon_thresholds_file)
+        thresholds_dict = {}
+        for _, row in thresholds_df.iterrows():
+            horizon_str = row['horizon']
+            if isinstance(horizon_str, str) and horizon_str.startswith('t+'):
+                horizon = int(horizon_str.replace('t+', ''))
+                thresholds_dict[horizon] = row['threshold']
+        print(f"  ⚠️  Using old horizon-based thresholds (range: {min(thresholds_dict.values()):.3f}-{max(thresholds_dict.values()):.3f})")
+        return thresholds_dict, 'horizon-based'
+
+    # Last resort
+    print("  ⚠️  No thresholds found, using fixed 0.5")
+    return {h: 0.5 for h in range(24)}, 'fixed'
+
+
+class ModelBundle:
+    """
+    In-memory copy of every production model artifact
+    """
+
+    def __init__(self, models_dir: Path = MODELS_DIR, horizons: List[int] = None):
+        """
+        Create an empty bundle (use ModelBundle.load() to populate it)
+
+        Args:
+            models_dir: Root of the trained models tree (default: models_24h/)
+            horizons: Horizons to load (default: 1 to 24)
+        """
+        self.models_dir = Path(models_dir)
+        self.horizons = horizons or list(range(1, 25))
+
+        self.zero_detection: Dict[int, Dict[str, object]] = {}
+        self.value_prediction: Dict[int, Dict[str, object]] = {}
+        self.stage1_feature_names: List[str] = []
+        self.stage2_feature_names: List[str] = []
+        self.optimal_thresholds: Dict[int, float] = {}
+        self.threshold_type: str = 'fixed'
+        self.meta_calibrator = None
+
+        # stage name -> seconds spent loading it
+        self.load_times: Dict[str, float] = {}
+
+    @classmethod
+    def load(cls, models_dir: Path = MODELS_DIR, horizons: List[int] = None) -> 'ModelBundle':
+        """Load every artifact under models_dir and return the populated bundle"""
+        bundle = cls(models_dir=models_dir, horizons=horizons)
+        bundle._load_feature_names()
+        bundle._load_thresholds()
+        bundle._load_meta_calibrator()
+        bundle._load_zero_detection()
+        bundle._load_value_prediction()
+        return bundle
+
+    @contextmanager
+    def _timed(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.load_times[stage] = self.load_times.get(stage, 0.0) + time.perf_counter() - start
+
+    def _load_feature_names(self):
+        with self._timed('feature_names'):
+            with open(self.models_dir / "zero_detection" / "feature_names.pkl", 'rb') as f:
+                self.stage1_feature_names = list(pickle.load(f))
+            with open(self.models_dir / "value_prediction" / "feature_names.pkl", 'rb') as f:
+                self.stage2_feature_names = list(pickle.load(f))
+
+    def _load_thresholds(self):
+        with self._timed('thresholds'):
+            self.optimal_thresholds, self.threshold_type = load_optimal_thresholds(self.models_dir)
+
+    def _load_meta_calibrator(self):
+        with self._timed('meta_calibrator'):
+            meta_calibrator_path = self.models_dir / "zero_detection" / "meta_calibrator.pkl"
+            if meta_calibrator_path.exists():
+                import joblib
+                self.meta_calibrator = joblib.load(meta_calibrator_path)
+                print(f"  ✓ Loaded meta-calibrator for probability calibration")
+
+    def _load_zero_detection(self):
+        with self._timed('zero_detection'):
+            zero_dir = self.models_dir / "zero_detection"
+            for h in self.horizons:
+                lgb_path = zero_dir / f"lgb_t+{h}.txt"
+                xgb_path = zero_dir / f"xgb_t+{h}.json"
+
+                if lgb_path.exists() and xgb_path.exists():
+                    self.zero_detection[h] = {
+                        'lgb': lgb.Booster(model_file=str(lgb_path)),
+                        'xgb': xgb.Booster(model_file=str(xgb_path))
+                    }
+
+    def _load_value_prediction(self):
+        with self._timed('value_prediction'):
+            value_dir = self.models_dir / "value_prediction"
+            for h in self.horizons:
+                lgb_med_path = value_dir / f"lgb_median_t+{h}.txt"
+                lgb_q10_path = value_dir / f"lgb_q10_t+{h}.txt"
+                lgb_q90_path = value_dir / f"lgb_q90_t+{h}.txt"
+                xgb_path = value_dir / f"xgb_t+{h}.json"
+
+                if all(p.exists() for p in [lgb_med_path, lgb_q10_path, lgb_q90_path, xgb_path]):
+                    xgb_model = xgb.Booster()
+                    xgb_model.load_model(str(xgb_path))
+
+                    self.value_prediction[h] = {
+                        'lgb_median': lgb.Booster(model_file=str(lgb_med_path)),
+                        'lgb_q10': lgb.Booster(model_file=str(lgb_q10_path)),
+                        'lgb_q90': lgb.Booster(model_file=str(lgb_q90_path)),
+                        'xgb': xgb_model
+                    }
+
+    @property
+    def available_horizons(self) -> List[int]:
+        """Horizons with both Stage 1 and Stage 2 models loaded"""
+        return [h for h in self.horizons
+                if h in self.zero_detection and h in self.value_prediction]
+
+    @property
+    def base_feature_names(self) -> List[str]:
+        """Engineered features read by either stage (Stage 1 meta-features excluded)"""
+        names = list(self.stage1_feature_names)
+        names += [c for c in self.stage2_feature_names
+                  if not c.startswith('zero_risk_') and c not in names]
+        return names
+
+    def threshold_for(self, horizon: int, target_hour: int) -> float:
+        """Decision threshold for a horizon: hour-based if available, else horizon-based"""
+        if self.threshold_type == 'hour-based':
+            return self.optimal_thresholds.get(target_hour, 0.5)
+        return self.optimal_thresholds.get(horizon, 0.5)
+
+    def load_time_report(self) -> str:
+        """Human-readable per-stage load times"""
+        total = sum(self.load_times.values())
+        lines = ["  Model load times:"]
+        for stage, seconds in self.load_times.items():
+            share = seconds / total * 100 if total > 0 else 0.0
+            lines.append(f"    {stage:<17} {seconds:7.3f}s ({share:5.1f}%)")
+        lines.append(f"    {'total':<17} {total:7.3f}s")
+        return "\n".join(lines)
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+ML Prediction Archive (columnar)
+================================
+
+Append-only store for every published 24h forecast, replacing one JSON
+file per hour in data/ml_predictions/archive/.
+
+Layout (data/ml_predictions/store/):
+- YYYY-MM/part-*.parquet  one small file per append (one hourly run), one row per (forecast, horizon)
+- YYYY-MM.parquet         a closed month's parts, compacted into one file
+- index.json              rows and forecast_datetime range per file
+
+The store is committed with data/, so an append never rewrites an existing
+file: each run adds a part of a few KB, and compact() merges a month's parts
+once the month is over.
+
+Schema:
+    forecast_datetime, horizon, target_datetime, predicted, prob_zero,
+    threshold, q10, q50, q90, model_version, generated_at
+
+Range queries only open the partitions whose range overlaps the request.
+
+Usage:
+    from ml_prediction_archive import PredictionArchive
+
+    archive = PredictionArchive()
+    archive.append_forecast(forecast)                       # ml_hourly_forecast output
+    archive.compact()                                       # merge parts of closed months
+    df = archive.query(start='2026-05-01', end='2026-05-31')
+"""
+
+import json
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+STORE_DIR = PROJECT_ROOT / "data" / "ml_predictions" / "store"
+
+COLUMNS = [
+    'forecast_datetime', 'horizon', 'target_datetime', 'predicted', 'prob_zero',
+    'threshold', 'q10', 'q50', 'q90', 'model_version', 'generated_at'
+]
+FLOAT_COLUMNS = ['predicted', 'prob_zero', 'threshold', 'q10', 'q50', 'q90']
+
+
+def forecast_rows(forecast: Dict) -> List[Dict]:
+    """
+    Flatten one forecast snapshot (latest.json / archive JSON format) into archive rows
+
+    Older snapshots lack some fields (thresholds, raw probabilities); those become None.
+    """
+    rows = []
+    for fc in forecast.get('forecasts', []):
+        interval = fc.get('confidence_interval') or {}
+        rows.append({
+            'forecast_datetime': forecast['base_datetime'],
+            'horizon': fc['horizon'],
+            'target_datetime': fc['target_datetime'],
+            'predicted': fc.get('predicted_cmg'),
+            'prob_zero': fc.get('zero_probability'),
+            'threshold': fc.get('decision_threshold'),
+            'q10': interval.get('lower_10th'),
+            'q50': interval.get('median', fc.get('value_prediction')),
+            'q90': interval.get('upper_90th'),
+            'model_version': forecast.get('model_version'),
+            'generated_at': forecast.get('generated_at')
+        })
+    return rows
+
+
+def forecast_to_frame(forecast: Dict) -> pd.DataFrame:
+    """One forecast snapshot as typed archive rows"""
+    return _normalize(pd.DataFrame(forecast_rows(forecast), columns=COLUMNS))
+
+
+def _normalize(df: pd.DataFrame) -> pd.DataFrame:
+    """Apply the archive dtypes"""
+    df = df[COLUMNS].copy()
+    for col in ['forecast_datetime', 'target_datetime', 'generated_at']:
+        df[col] = to_naive_datetime(df[col])
+    df['horizon'] = df['horizon'].astype(np.int8)
+    df[FLOAT_COLUMNS] = df[FLOAT_COLUMNS].apply(pd.to_numeric, errors='coerce').astype(np.float32)
+    df['model_version'] = df['model_version'].astype('string')
+    return df
+
+
+def to_naive_datetime(values: pd.Series) -> pd.Series:
+    """Parse datetimes; tz-aware values (old generated_at '... UTC') become naive UTC"""
+    try:
+        parsed = pd.to_datetime(values)
+    except ValueError:
+        # Mix of naive and '... UTC' strings
+        parsed = pd.to_datetime(values, utc=True, format='mixed')
+    if parsed.dt.tz is not None:
+        parsed = parsed.dt.tz_convert('UTC').dt.tz_localize(None)
+    return parsed
+
+
+def _month_of(file: str) -> str:
+    """Forecast month of an archive file ('YYYY-MM.parquet' or 'YYYY-MM/part-*.parquet')"""
+    return file.split('/')[0].replace('.parquet', '')
+
+
+class PredictionArchive:
+    """Monthly-partitioned Parquet archive of published forecasts"""
+
+    def __init__(self, root: Path = STORE_DIR):
+        self.root = Path(root)
+        self.index_file = self.root / "index.json"
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+
+    def append_forecast(self, forecast: Dict) -> int:
+        """Append one forecast snapshot; returns rows written"""
+        return self.append(forecast_to_frame(forecast))
+
+    def append(self, rows: pd.DataFrame) -> int:
+        """
+        Append archive rows (any number of forecasts/months)
+
+        Writes one new part file per forecast month; existing files are
+        never touched (see compact()).
+        """
+        if rows.empty:
+            return 0
+
+        rows = _normalize(rows)
+        index = self.load_index()
+        run = f"{datetime.now().strftime('%Y%m%dT%H%M%S%f')}-{uuid.uuid4().hex[:8]}"
+
+        for month, new_rows in rows.groupby(rows['forecast_datetime'].dt.strftime('%Y-%m'), sort=True):
+            file = f"{month}/part-{run}.parquet"
+            new_rows = new_rows.sort_values(['forecast_datetime', 'generated_at', 'horizon'], kind='stable')
+            self._write_partition(self.root / file, new_rows)
+            index[file] = self._partition_entry(file, new_rows)
+
+        self._write_index(index)
+        return len(rows)
+
+    def compact(self, before: Optional[str] = None) -> List[str]:
+        """
+        Merge each month's part files into YYYY-MM.parquet
+
+        Args:
+            before: Only compact months before this 'YYYY-MM' (default: the
+                    newest month in the archive, which is still being appended to)
+
+        Returns:
+            Months compacted
+        """
+        index = self.load_index()
+        months = sorted({_month_of(file) for file in index})
+        if not months:
+            return []
+        before = before or months[-1]
+
+        compacted = []
+        for month in months:
+            parts = sorted(file for file in index if _month_of(file) == month and '/' in file)
+            if month >= before or not parts:
+                continue
+
+            monthly = f"{month}.parquet"
+            files = ([monthly] if monthly in index else []) + parts
+            df = pd.concat([pd.read_parquet(self.root / file) for file in files], ignore_index=True)
+            df = df.sort_values(['forecast_datetime', 'generated_at', 'horizon'], kind='stable')
+            self._write_partition(self.root / monthly, df)
+
+            index[monthly] = self._partition_entry(monthly, df)
+            for file in parts:
+                del index[file]
+            # Index first: a crash before the unlinks only leaves unindexed parts,
+            # which queries never read
+            self._write_index(index)
+            for file in parts:
+                (self.root / file).unlink()
+            try:
+                (self.root / month).rmdir()
+            except OSError:
+                pass
+            compacted.append(month)
+
+        return compacted
+
+    def _write_partition(self, path: Path, df: pd.DataFrame):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix('.parquet.tmp')
+        df.to_parquet(tmp_path, index=False)
+        tmp_path.replace(path)
+
+    @staticmethod
+    def _partition_entry(file: str, df: pd.DataFrame) -> Dict:
+        return {
+            'file': file,
+            'rows': int(len(df)),
+            'forecasts': int(df['forecast_datetime'].nunique()),
+            'min_forecast_datetime': df['forecast_datetime'].min().strftime('%Y-%m-%d %H:%M:%S'),
+            'max_forecast_datetime': df['forecast_datetime'].max().strftime('%Y-%m-%d %H:%M:%S')
+        }
+
+    # ------------------------------------------------------------------
+    # Index
+    # ------------------------------------------------------------------
+
+    def load_index(self) -> Dict[str, Dict]:
+        """File index (path relative to the store -> entry); empty if the archive is new"""
+        if not self.index_file.exists():
+            return {}
+        with open(self.index_file, 'r') as f:
+            return json.load(f).get('partitions', {})
+
+    def _write_index(self, partitions: Dict[str, Dict]):
+        self.root.mkdir(parents=True, exist_ok=True)
+        payload = {
+            'updated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'columns': COLUMNS,
+            'partitions': dict(sorted(partitions.items()))
+        }
+        tmp_file = self.index_file.with_suffix('.json.tmp')
+        with open(tmp_file, 'w') as f:
+            json.dump(payload, f, indent=2)
+        tmp_file.replace(self.index_file)
+
+    def rebuild_index(self) -> Dict[str, Dict]:
+        """Re-scan partition files (after manual edits or an interrupted write)"""
+        partitions = {}
+        for path in sorted(self.root.glob('*.parquet')) + sorted(self.root.glob('*/part-*.parquet')):
+            file = path.relative_to(self.root).as_posix()
+            partitions[file] = self._partition_entry(file, pd.read_parquet(path))
+        self._write_index(partitions)
+        return partitions
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def query(self, start=None, end=None, horizons: Optional[List[int]] = None,
+              columns: Optional[List[str]] = None, latest_only: bool = False) -> pd.DataFrame:
+        """
+        Archive rows with start <= forecast_datetime <= end
+
+        Args:
+            start, end: Forecast time bounds (inclusive, anything pd.Timestamp accepts)
+            horizons: Only these horizons
+            columns: Only these columns (forecast_datetime and horizon always included)
+            latest_only: Keep only the newest snapshot per (forecast_datetime, horizon)
+        """
+        start = pd.Timestamp(start) if start is not None else None
+        end = pd.Timestamp(end) if end is not None else None
+
+        if columns is not None:
+            needed = ['forecast_datetime', 'horizon'] + (['generated_at'] if latest_only else [])
+            columns = list(dict.fromkeys(needed + list(columns)))
+
+        frames = []
+        for entry in self.load_index().values():
+            if start is not None and pd.Timestamp(entry['max_forecast_datetime']) < start:
+                continue
+            if end is not None and pd.Timestamp(entry['min_forecast_datetime']) > end:
+                continue
+
+            filters = []
+            if start is not None:
+                filters.append(('forecast_datetime', '>=', start))
+            if end is not None:
+                filters.append(('forecast_datetime', '<=', end))
+            if horizons is not None:
+                filters.append(('horizon', 'in', [int(h) for h in horizons]))
+
+            frames.append(pd.read_parquet(self.root / entry['file'], columns=columns,
+                                          filters=filters or None))
+
+        if not frames:
+            return _normalize(pd.DataFrame(columns=COLUMNS))[columns or COLUMNS]
+
+        df = pd.concat(frames, ignore_index=True)
+        if latest_only:
+            # Several snapshots can share a base hour (stale data), possibly in
+            # different files; keep the newest
+            df = df.sort_values(['forecast_datetime', 'generated_at', 'horizon'], kind='stable')
+            df = df.drop_duplicates(['forecast_datetime', 'horizon'], keep='last')
+        return df.reset_index(drop=True)
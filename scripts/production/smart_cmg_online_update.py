@@ -6,18 +6,22 @@ Uses the CORRECT v4 API endpoint that works
 """
 
 import json
-import requests
 import time
 import sys
 from pathlib import Path
 from datetime import datetime, timedelta
 import pytz
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 
 # Add lib path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
+from lib.utils.sip_fetcher import SIPPageFetcher, all_nodes_complete
+from lib.utils.sip_page_index import INDEX_FILE, SIPPageIndex
+from lib.utils.sip_snapshot import PAGE_SIZE as SNAPSHOT_PAGE_SIZE, SNAPSHOT_FILE, build_snapshot, write_snapshot
+
 try:
     from lib.utils.supabase_client import SupabaseClient
     SUPABASE_AVAILABLE = True
@@ -31,6 +35,10 @@ SIP_API_KEY = os.environ.get('SIP_API_KEY')
 if not SIP_API_KEY:
     raise ValueError("SIP_API_KEY environment variable not set")
 SIP_BASE_URL = 'https://sipub.api.coordinador.cl:443'
+SIP_FETCHER = SIPPageFetcher(SIP_API_KEY)
+
+# Dates fetched concurrently (all pages share SIP_FETCHER's rate limit)
+MAX_CONCURRENT_DATES = 3
 
 # Our 3 target nodes for historical data
 CMG_NODES = [
@@ -44,6 +52,9 @@ CACHE_DIR = Path('data/cache')
 CACHE_FILE = CACHE_DIR / 'cmg_historical_latest.json'
 METADATA_FILE = CACHE_DIR / 'metadata.json'
 
+# Pages our nodes were found on in past fetches (requested first)
+PAGE_INDEX = SIPPageIndex(CACHE_DIR / INDEX_FILE)
+
 def load_existing_cache():
     """Load existing cache data"""
     if not CACHE_FILE.exists():
@@ -132,114 +143,62 @@ def determine_missing_hours(existing_keys, target_dates, nodes, date_node_hours=
     
     return missing
 
-def fetch_page_with_retry(url, params, page_num, max_retries=10):
-    """Fetch a single page with retry logic"""
-    wait_time = 2
-    
-    for attempt in range(max_retries):
-        try:
-            response = requests.get(url, params=params, timeout=60)
-            
-            if response.status_code == 200:
-                data = response.json()
-                records = data.get('data', [])
-                return records, len(records)
-            
-            elif response.status_code == 502:
-                wait_time = min(wait_time * 1.5, 60)
-                print(f"      Page {page_num}: 502 error, attempt {attempt+1}/{max_retries}, waiting {wait_time:.1f}s")
-                time.sleep(wait_time)
-            
-            elif response.status_code == 429:
-                wait_time = min(wait_time * 2, 60)
-                print(f"      Page {page_num}: Rate limited, attempt {attempt+1}/{max_retries}, waiting {wait_time:.1f}s")
-                time.sleep(wait_time)
-            
-            elif response.status_code == 403:
-                print(f"      Page {page_num}: 403 Forbidden - API key may be invalid")
-                return [], 0
-            
-            else:
-                print(f"      Page {page_num}: Error {response.status_code}, attempt {attempt+1}/{max_retries}")
-                time.sleep(3)
-        
-        except requests.exceptions.Timeout:
-            print(f"      Page {page_num}: Timeout, attempt {attempt+1}/{max_retries}")
-            time.sleep(5)
-        
-        except Exception as e:
-            print(f"      Page {page_num}: Exception {str(e)[:50]}, attempt {attempt+1}/{max_retries}")
-            time.sleep(5)
-    
-    print(f"      Page {page_num}: Failed after {max_retries} attempts")
-    return [], 0
+def fetch_cmg_online_for_date(date_str, nodes, hours=None):
+    """
+    Fetch CMG Online data using the CORRECT v4 API with proper pagination.
 
-def fetch_cmg_online_for_date(date_str, nodes):
-    """Fetch CMG Online data using the CORRECT v4 API with proper pagination"""
+    Pages are fetched concurrently under the shared SIP rate limiter, pages
+    known to hold our nodes first, and fetching stops as soon as every
+    requested node has the requested hours (default 24/24).
+    """
     url = f"{SIP_BASE_URL}/costo-marginal-online/v4/findByDate"
     
     all_records = []
-    page = 1
-    consecutive_empty = 0
     location_hours = defaultdict(set)
     
     print(f"📊 Fetching {date_str}: targeting {len(nodes)} nodes")
     
-    while consecutive_empty < 3:
-        params = {
-            'startDate': date_str,
-            'endDate': date_str,
-            'page': page,
-            'limit': 4000,  # Use 4000 as per working implementation
-            'user_key': SIP_API_KEY  # user_key, not api_key!
-        }
+    def on_page(page, records):
+        # Filter for our nodes and process
+        our_records = []
+        for record in records:
+            node = record.get('barra_transf', '')  # Use barra_transf field
+            if node in nodes:
+                # Use hra field for hour (not hora)
+                hour = record.get('hra', 0)
+                
+                # Parse the record properly
+                parsed = parse_historical_record(record, date_str)
+                if parsed:
+                    our_records.append(parsed)
+                    location_hours[node].add(hour)
+                    PAGE_INDEX.record(node, hour, page)
         
-        records, count = fetch_page_with_retry(url, params, page)
+        all_records.extend(our_records)
         
-        if count > 0:
-            consecutive_empty = 0
-            
-            # Filter for our nodes and process
-            our_records = []
-            for record in records:
-                node = record.get('barra_transf', '')  # Use barra_transf field
-                if node in nodes:
-                    # Use hra field for hour (not hora)
-                    hour = record.get('hra', 0)
-                    
-                    # Parse the record properly
-                    parsed = parse_historical_record(record, date_str)
-                    if parsed:
-                        our_records.append(parsed)
-                        location_hours[node].add(hour)
-            
-            all_records.extend(our_records)
-            
-            # Show progress
-            unique_hours = set()
-            for hours in location_hours.values():
-                unique_hours.update(hours)
-            
-            if our_records:
-                print(f"   Page {page:3d}: {count:4d} total, {len(our_records):3d} for our nodes, coverage: {len(unique_hours)}/24 hours")
-            
-            # Check if this is the last page
-            if count < 4000:
-                print(f"   Page {page} is the last page ({count} < 4000)")
-                break
-            
-            page += 1
-            
-            # Safety limit
-            if page > 50:
-                print(f"   Reached page limit (50)")
-                break
-        else:
-            consecutive_empty += 1
-            if consecutive_empty >= 3:
-                print(f"   End of data (3 consecutive empty pages)")
-                break
-            page += 1
+        # Show progress
+        if our_records:
+            unique_hours = set().union(*location_hours.values())
+            print(f"   Page {page:3d}: {len(our_records):3d} for our nodes, coverage: {len(unique_hours)}/24 hours")
+    
+    # Pages known to hold our nodes first; the full scan only runs on misses.
+    # Only our nodes' records are decoded from each page
+    stats = SIP_FETCHER.fetch_pages(
+        url, {'startDate': date_str, 'endDate': date_str}, on_page,
+        pages=PAGE_INDEX.plan(nodes, range(1, 51), hours if hours is not None else range(24)),
+        done=lambda: all_nodes_complete(location_hours, nodes, hours),
+        nodes=nodes
+    )
+    print(f"   {stats['total_records']} records scanned")
+    
+    if stats['stopped_early']:
+        print(f"   All requested hours found after {len(stats['pages_fetched'])} pages")
+    elif stats['last_page'] is not None:
+        print(f"   Page {stats['last_page']} is the last page")
+    else:
+        print(f"   Reached page limit (50)")
+    if stats['failed_pages']:
+        print(f"   ⚠️ Failed pages: {sorted(stats['failed_pages'])}")
     
     # Show coverage summary
     print(f"   Coverage summary:")
@@ -296,21 +255,65 @@ def fetch_missing_data(missing_hours):
         by_date[item['date']].append(item)
     
     all_records = []
+    now = datetime.now(pytz.timezone('America/Santiago'))
     
-    for date_str, date_items in by_date.items():
+    def fetch_date(date_str):
+        date_items = by_date[date_str]
         # Get unique nodes for this date
         nodes_needed = list(set(item['node'] for item in date_items))
         
-        # Fetch data for this date
-        records = fetch_cmg_online_for_date(date_str, nodes_needed)
-        all_records.extend(records)
+        # Stop once the missing hours that can already be published are found
+        hours_needed = sorted(set(item['hour'] for item in date_items
+                                  if date_str < now.strftime('%Y-%m-%d') or item['hour'] < now.hour))
         
-        # Brief pause between dates
-        if len(by_date) > 1:
-            time.sleep(1)
+        return fetch_cmg_online_for_date(date_str, nodes_needed, hours_needed)
+    
+    # Fetch dates concurrently; the shared token bucket keeps the total rate in check
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_DATES) as executor:
+        for records in executor.map(fetch_date, sorted(by_date)):
+            all_records.extend(records)
+    
+    PAGE_INDEX.save()
     
     return all_records
 
+def to_supabase_records(new_records, node_id_map):
+    """
+    Transform parsed records to cmg_online rows.
+
+    IMPORTANT: Deduplicates by (datetime, node_id), keeping only the LATEST
+    value. CMG Online has 15-minute granularity, so we may have multiple
+    records per hour.
+
+    Returns:
+        (rows, skipped) where skipped counts records of nodes missing from
+        the nodes table
+    """
+    records_dict = {}
+    skipped = 0
+
+    for record in new_records:
+        node_code = record['node']
+        node_id = node_id_map.get(node_code)
+
+        if node_id is None:
+            print(f"⚠️  Warning: Node '{node_code}' not found in nodes table, skipping record")
+            skipped += 1
+            continue
+
+        # Keep only the latest record (overwrite if duplicate)
+        records_dict[(record['datetime'], node_id)] = {
+            'datetime': record['datetime'],
+            'date': record['date'],
+            'hour': record['hour'],
+            'node': node_code,
+            'node_id': node_id,
+            'cmg_usd': float(record['cmg_usd']),
+            'source': 'sip_api'
+        }
+
+    return list(records_dict.values()), skipped
+
 def merge_with_cache(cache_data, new_records):
     """Merge new records with existing cache"""
     if 'data' not in cache_data:
@@ -396,6 +399,19 @@ def main():
     with open(CACHE_FILE, 'w') as f:
         json.dump(cache_data, f, indent=2)
 
+    # Refresh the dashboard's SIP snapshot (served by api/index.py)
+    try:
+        snapshot_index = SIPPageIndex(CACHE_DIR / INDEX_FILE, page_size=SNAPSHOT_PAGE_SIZE)
+        snapshot = build_snapshot(now, SIP_API_KEY, page_index=snapshot_index)
+        snapshot_index.save()
+        if snapshot:
+            write_snapshot(snapshot, CACHE_DIR / SNAPSHOT_FILE)
+            print(f"✅ SIP snapshot: {len(snapshot['series'])} records for {snapshot['date']}")
+        else:
+            print("⚠️ SIP snapshot: no records, keeping previous snapshot")
+    except Exception as e:
+        print(f"⚠️ Failed to refresh SIP snapshot: {e}")
+
     # Write new records to Supabase (dual-write strategy)
     if new_records and SUPABASE_AVAILABLE:
         try:
@@ -407,41 +423,12 @@ def main():
             node_id_map = supabase.get_node_id_map()
             print(f"   Found {len(node_id_map)} nodes: {list(node_id_map.keys())}")
 
-            # Transform records to Supabase format
-            # IMPORTANT: Deduplicate by (datetime, node_id) - keep only the LATEST value
-            # CMG Online has 15-minute granularity, so we may have multiple records per hour
-            records_dict = {}
-            skipped = 0
-
-            for record in new_records:
-                node_code = record['node']
-                node_id = node_id_map.get(node_code)
-
-                if node_id is None:
-                    print(f"⚠️  Warning: Node '{node_code}' not found in nodes table, skipping record")
-                    skipped += 1
-                    continue
-
-                # Use (datetime, node_id) as key to deduplicate
-                key = (record['datetime'], node_id)
-
-                # Keep only the latest record (overwrite if duplicate)
-                records_dict[key] = {
-                    'datetime': record['datetime'],
-                    'date': record['date'],
-                    'hour': record['hour'],
-                    'node': node_code,
-                    'node_id': node_id,
-                    'cmg_usd': float(record['cmg_usd']),
-                    'source': 'sip_api'
-                }
+            # Transform records to Supabase format (deduplicated by datetime, node_id)
+            supabase_records, skipped = to_supabase_records(new_records, node_id_map)
 
             if skipped > 0:
                 print(f"⚠️  Skipped {skipped} records due to missing nodes")
 
-            # Convert deduplicated dict back to list
-            supabase_records = list(records_dict.values())
-
             if len(supabase_records) < len(new_records):
                 duplicates_removed = len(new_records) - len(supabase_records)
                 print(f"   Deduplicated: {duplicates_removed} duplicate (datetime, node) pairs removed")
@@ -453,6 +440,23 @@ def main():
                 supabase.insert_cmg_online_batch(batch)
 
             print(f"✅ Wrote {len(supabase_records)} records to Supabase")
+
+            # Recompute forecast errors for the days these actuals cover.
+            # Imported here so a broken rollup module cannot disable the writes above
+            try:
+                from forecast_error_rollup import rollup_new_actuals
+                rolled_up = rollup_new_actuals(supabase, [r['date'] for r in supabase_records])
+                print(f"✅ Rolled up {rolled_up} forecast errors")
+            except Exception as e:
+                print(f"⚠️ Failed to roll up forecast errors: {e}")
+
+            # Store the heatmaps of days that have left the refetch window
+            try:
+                from heatmap_materializer import materialize_pending
+                materialized = materialize_pending(supabase)
+                print(f"✅ Materialized heatmaps for {len(materialized)} days")
+            except Exception as e:
+                print(f"⚠️ Failed to materialize heatmaps: {e}")
         except Exception as e:
             print(f"⚠️ Failed to write to Supabase: {e}")
             print("   (Cache file still updated successfully)")
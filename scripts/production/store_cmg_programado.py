@@ -325,6 +325,16 @@ def main():
                 print(f"   ⚠️  WARNING: Some records failed to insert!")
             else:
                 print(f"   🎉 All records inserted successfully!")
+
+            # Keep the forecast_runs index (historical_comparison summary) in sync
+            if successful_records > 0:
+                try:
+                    refreshed = supabase.refresh_forecast_runs(
+                        'prog', [r['forecast_datetime'] for r in supabase_records])
+                    if refreshed is not None:
+                        print(f"   ✅ Refreshed {refreshed} forecast run(s) in index")
+                except Exception as e:
+                    print(f"   ⚠️ Failed to refresh forecast_runs index: {e}")
         except Exception as e:
             print(f"⚠️ Failed to write to Supabase: {e}")
             print("   (Gist and local cache still updated)")
@@ -239,6 +239,15 @@ def main():
                 supabase.insert_ml_predictions_batch(batch)
 
             print(f"✅ Wrote {len(supabase_records)} predictions to Supabase")
+
+            # Keep the forecast_runs index (historical_comparison summary) in sync
+            try:
+                refreshed = supabase.refresh_forecast_runs(
+                    'ml', [r['forecast_datetime'] for r in supabase_records])
+                if refreshed is not None:
+                    print(f"✅ Refreshed {refreshed} forecast run(s) in index")
+            except Exception as e:
+                print(f"⚠️ Failed to refresh forecast_runs index: {e}")
         except Exception as e:
             print(f"⚠️ Failed to write to Supabase: {e}")
             print("   (Gist and local cache still updated)")
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Supabase Mirror
+===============
+
+Local, incrementally synced copy of the Supabase tables used for training
+and analysis, so repeated experiments do not re-download months of rows.
+
+Layout (data/supabase_mirror/):
+- <table>.parquet   every mirrored row (deduplicated on id)
+- state.json        per table: updated_at watermark per node, first exported
+                    date, row count, last sync
+
+Sync:
+1. First sync of a table -> paginated, parallel export of the last --days days
+2. Later syncs           -> only rows with updated_at >= the node's watermark
+   (updated_at is bumped by a trigger on every upsert, so revised rows are
+   picked up too). Rows of nodes not seen before are fetched from the
+   oldest watermark.
+3. extend_history()      -> export the dates before the first exported date,
+   for readers that need a longer window than the first sync pulled
+
+Readers check coverage_gap() before trusting a date window.
+
+Rows deleted in Supabase are not removed from the mirror.
+
+Usage:
+    python scripts/production/supabase_mirror.py                  # sync all tables
+    python scripts/production/supabase_mirror.py --tables cmg_online
+    python scripts/production/supabase_mirror.py --status
+
+    from supabase_mirror import SupabaseMirror
+    df = SupabaseMirror().read('cmg_online', start_date='2025-01-01')
+"""
+
+import sys
+import json
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+MIRROR_DIR = PROJECT_ROOT / "data" / "supabase_mirror"
+
+# table -> DATE column for range exports/reads, column the watermarks are kept per
+MIRROR_TABLES = {
+    'cmg_online': {'date_column': 'date', 'node_column': 'node_id'},
+    'cmg_programado': {'date_column': 'target_date', 'node_column': 'node_id'},
+    'ml_predictions': {'date_column': 'target_date', 'node_column': None},
+}
+
+# Watermark key for tables without a node column
+ALL_NODES = '_all'
+
+
+class SupabaseMirror:
+    """Parquet mirror of Supabase tables with per-node updated_at watermarks"""
+
+    def __init__(self, root: Path = MIRROR_DIR):
+        self.root = Path(root)
+        self.state_file = self.root / "state.json"
+
+    # ------------------------------------------------------------------
+    # State
+    # ------------------------------------------------------------------
+
+    def load_state(self) -> Dict[str, Dict]:
+        if not self.state_file.exists():
+            return {}
+        with open(self.state_file, 'r') as f:
+            return json.load(f)
+
+    def _write_state(self, state: Dict[str, Dict]):
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.state_file.with_suffix('.json.tmp')
+        with open(tmp_file, 'w') as f:
+            json.dump(state, f, indent=2)
+        tmp_file.replace(self.state_file)
+
+    def has_table(self, table: str) -> bool:
+        return table in self.load_state() and self._path(table).exists()
+
+    def _path(self, table: str) -> Path:
+        return self.root / f"{table}.parquet"
+
+    # ------------------------------------------------------------------
+    # Sync
+    # ------------------------------------------------------------------
+
+    def sync(self, client, tables: Optional[List[str]] = None, days: int = 365) -> Dict[str, int]:
+        """
+        Pull new and updated rows for each table; returns rows fetched per table
+
+        Args:
+            client: SupabaseClient
+            tables: Tables to sync (default: all of MIRROR_TABLES)
+            days: History exported on a table's first sync
+        """
+        fetched = {}
+        for table in tables or list(MIRROR_TABLES):
+            fetched[table] = self.sync_table(client, table, days)
+        return fetched
+
+    def sync_table(self, client, table: str, days: int = 365) -> int:
+        spec = MIRROR_TABLES[table]
+        node_column = spec['node_column']
+        state = self.load_state()
+        watermarks = state.get(table, {}).get('watermarks', {})
+        history_start = state.get(table, {}).get('start_date')
+
+        if not watermarks or not self._path(table).exists():
+            end = datetime.now() + timedelta(days=2)  # programado/predictions target the future
+            start = end - timedelta(days=days + 2)
+            print(f"  {table}: first sync, exporting {start:%Y-%m-%d} to {end:%Y-%m-%d}...")
+            history_start = start.strftime('%Y-%m-%d')
+            new_rows = client.export_range(table, spec['date_column'],
+                                           start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d'))
+            existing = None
+        else:
+            new_rows = self._fetch_since(client, table, node_column, watermarks)
+            existing = pd.read_parquet(self._path(table))
+
+        if new_rows.empty:
+            if existing is None:
+                print(f"  ⚠️  {table}: no rows in Supabase for this range")
+            else:
+                print(f"  ✓ {table}: up to date ({len(existing):,} rows)")
+            return 0
+
+        merged = new_rows if existing is None else pd.concat([existing, new_rows], ignore_index=True)
+        merged = merged.drop_duplicates('id', keep='last').sort_values('id').reset_index(drop=True)
+        self._write_table(table, merged)
+
+        state[table] = {
+            'watermarks': {**watermarks, **self._watermarks(new_rows, node_column)},
+            'rows': int(len(merged)),
+            'synced_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+        if history_start:
+            state[table]['start_date'] = history_start
+        self._write_state(state)
+        print(f"  ✓ {table}: {len(new_rows):,} new/updated rows → {len(merged):,} rows")
+        return len(new_rows)
+
+    def extend_history(self, client, table: str, start_date: str) -> int:
+        """
+        Export rows from start_date up to the first exported date and merge them
+
+        Watermarks are left alone: older rows say nothing about which rows
+        changed since the last sync. Returns rows fetched.
+        """
+        history_start = self.history_start(table)
+        if history_start is None or start_date >= history_start:
+            return 0
+
+        spec = MIRROR_TABLES[table]
+        print(f"  {table}: extending history, exporting {start_date} to {history_start}...")
+        new_rows = client.export_range(table, spec['date_column'], start_date, history_start)
+
+        state = self.load_state()
+        if not new_rows.empty:
+            merged = pd.concat([pd.read_parquet(self._path(table)), new_rows], ignore_index=True)
+            merged = merged.drop_duplicates('id', keep='last').sort_values('id').reset_index(drop=True)
+            self._write_table(table, merged)
+            state[table]['rows'] = int(len(merged))
+        # Recorded even when Supabase has nothing older, so the export isn't repeated
+        state[table]['start_date'] = start_date
+        self._write_state(state)
+        print(f"  ✓ {table}: {len(new_rows):,} older rows → {state[table]['rows']:,} rows")
+        return len(new_rows)
+
+    @staticmethod
+    def _fetch_since(client, table: str, node_column: Optional[str],
+                     watermarks: Dict[str, str]) -> pd.DataFrame:
+        """Rows updated since each node's watermark, plus rows of unseen nodes"""
+        queries = []
+        for key, watermark in watermarks.items():
+            filters = [(node_column, f"eq.{key}")] if node_column else []
+            queries.append((watermark, filters))
+        if node_column:
+            known = ','.join(watermarks)
+            queries.append((min(watermarks.values()), [(node_column, f"not.in.({known})")]))
+
+        with ThreadPoolExecutor(max_workers=len(queries)) as executor:
+            frames = list(executor.map(
+                lambda query: client.export_updated_since(table, *query), queries
+            ))
+        frames = [f for f in frames if not f.empty]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    @staticmethod
+    def _watermarks(rows: pd.DataFrame, node_column: Optional[str]) -> Dict[str, str]:
+        """Latest updated_at per node, kept as the server's string for the next filter"""
+        if rows.empty:
+            return {}
+        updated = pd.to_datetime(rows['updated_at'], utc=True, format='mixed')
+        if node_column is None:
+            return {ALL_NODES: rows.loc[updated.idxmax(), 'updated_at']}
+        latest = updated.groupby(rows[node_column]).idxmax()
+        return {str(node): rows.loc[idx, 'updated_at'] for node, idx in latest.items()}
+
+    def _write_table(self, table: str, df: pd.DataFrame):
+        self.root.mkdir(parents=True, exist_ok=True)
+        path = self._path(table)
+        tmp_path = path.with_suffix('.parquet.tmp')
+        df.to_parquet(tmp_path, index=False)
+        tmp_path.replace(path)
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def read(self, table: str, start_date: Optional[str] = None, end_date: Optional[str] = None,
+             columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Mirrored rows with start_date <= date column <= end_date (both optional, YYYY-MM-DD)"""
+        if not self.has_table(table):
+            raise FileNotFoundError(f"{table} is not mirrored yet (run supabase_mirror.py)")
+
+        date_column = MIRROR_TABLES[table]['date_column']
+        filters = []
+        if start_date:
+            filters.append((date_column, '>=', str(start_date)[:10]))
+        if end_date:
+            filters.append((date_column, '<=', str(end_date)[:10]))
+        return pd.read_parquet(self._path(table), columns=columns, filters=filters or None)
+
+    def date_range(self, table: str) -> Optional[Tuple[str, str]]:
+        """(first, last) value of the table's date column in the mirror; None if empty"""
+        if not self.has_table(table):
+            return None
+        date_column = MIRROR_TABLES[table]['date_column']
+        dates = pd.read_parquet(self._path(table), columns=[date_column])[date_column].dropna()
+        if dates.empty:
+            return None
+        return str(dates.min())[:10], str(dates.max())[:10]
+
+    def history_start(self, table: str) -> Optional[str]:
+        """First date exported into the mirror (mirrors from before this was recorded: first row)"""
+        start_date = self.load_state().get(table, {}).get('start_date')
+        if start_date:
+            return start_date
+        dates = self.date_range(table)
+        return dates[0] if dates else None
+
+    def coverage_gap(self, table: str, start_date: str, end_date: str) -> Optional[str]:
+        """
+        Why the mirror can't serve start_date..end_date (YYYY-MM-DD), or None if it can
+
+        The window is covered when its start is at or after the first exported
+        date and the newest mirrored row reaches end_date.
+        """
+        dates = self.date_range(table)
+        if dates is None:
+            return "not mirrored"
+        history_start = self.history_start(table)
+        if start_date < history_start:
+            return f"history starts {history_start}, {start_date} requested"
+        if dates[1] < end_date:
+            return f"newest row is {dates[1]}, {end_date} requested"
+        return None
+
+    def status(self) -> str:
+        lines = [f"  Mirror: {self.root}"]
+        for table, entry in self.load_state().items():
+            lines.append(f"    {table:<16} {entry['rows']:>10,} rows  (synced {entry['synced_at']})")
+        return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sync the local Supabase mirror')
+    parser.add_argument('--tables', type=str, default=','.join(MIRROR_TABLES),
+                        help='Comma-separated tables to sync')
+    parser.add_argument('--days', type=int, default=365,
+                        help='History exported on a table\'s first sync')
+    parser.add_argument('--mirror-dir', type=str, default=str(MIRROR_DIR),
+                        help='Mirror directory')
+    parser.add_argument('--status', action='store_true', help='Show mirror state and exit')
+    args = parser.parse_args()
+
+    mirror = SupabaseMirror(Path(args.mirror_dir))
+    if args.status:
+        print(mirror.status())
+        return 0
+
+    sys.path.insert(0, str(PROJECT_ROOT))
+    from lib.utils.supabase_client import SupabaseClient
+
+    print("="*80)
+    print("SUPABASE MIRROR SYNC")
+    print("="*80)
+    mirror.sync(SupabaseClient(), tables=args.tables.split(','), days=args.days)
+    print(mirror.status())
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
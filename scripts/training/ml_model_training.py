@@ -6,7 +6,7 @@ ML Model Training Script
 Trains CMG forecasting models with fresh data from Supabase.
 
 Features:
-1. Fetches latest data from Supabase
+1. Reads data from the local Supabase mirror (data/supabase_mirror/) or Supabase
 2. Creates features including CMG Programado (optional)
 3. Uses time-series cross-validation
 4. Trains LightGBM and XGBoost models for each horizon
@@ -15,9 +15,12 @@ Features:
 
 Usage:
     python scripts/ml_model_training.py [--include-programado] [--horizons 1-24]
+    python scripts/ml_model_training.py --threads 16 --workers 8   # 8 horizons at a time, 2 threads each
+    python scripts/ml_model_training.py --sync-mirror   # pull new rows into the mirror first
 
 Requirements:
     - SUPABASE_URL and SUPABASE_SERVICE_KEY environment variables
+      (only to create/sync the mirror or with --data-source supabase)
     - lightgbm, xgboost, scikit-learn, pandas, numpy
 
 Author: Pudidi CMG Prediction System
@@ -28,7 +31,11 @@ import sys
 import os
 import json
 import pickle
+import hashlib
 import argparse
+import tempfile
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from datetime import datetime, timedelta
 from typing import List, Dict, Tuple, Optional
@@ -39,6 +46,9 @@ import numpy as np
 # Add parent directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 sys.path.insert(0, str(Path(__file__).parent))
+# Project root (lib.utils) and scripts/production (feature engineering, mirror)
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+sys.path.insert(0, str(Path(__file__).parent.parent / 'production'))
 
 import lightgbm as lgb
 import xgboost as xgb
@@ -46,6 +56,8 @@ from sklearn.model_selection import TimeSeriesSplit
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 
 from ml_feature_engineering import CleanCMGFeatureEngineering
+from ml_feature_store import FeatureStore
+from supabase_mirror import SupabaseMirror
 
 # Configuration
 MODELS_DIR = Path(__file__).parent.parent / "models_24h"
@@ -53,6 +65,12 @@ DATA_DIR = Path(__file__).parent.parent / "data"
 LOGS_DIR = Path(__file__).parent.parent / "logs"
 LOGS_DIR.mkdir(exist_ok=True)
 
+# Fixed seed so repeated (and parallel) trainings give identical models
+DEFAULT_SEED = 42
+
+# Binning parameters of the shared LightGBM datasets (LightGBM defaults)
+LGB_DATASET_PARAMS = {'verbose': -1}
+
 
 def get_supabase_client():
     """Initialize Supabase client"""
@@ -64,35 +82,58 @@ def get_supabase_client():
         return None
 
 
-def fetch_training_data(supabase, days: int = 365) -> pd.DataFrame:
+def check_mirror_coverage(mirror: SupabaseMirror, tables: List[str], days: int) -> Dict[str, str]:
+    """
+    Tables whose mirrored rows don't cover the last `days` days
+
+    Today's hours are still arriving, so rows up to yesterday count as fresh.
+
+    Returns:
+        table -> reason, for every table with a gap
     """
-    Fetch CMG Online (actuals) data from Supabase for training.
+    start_date = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
+    end_date = (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d')
+    gaps = {}
+    for table in tables:
+        gap = mirror.coverage_gap(table, start_date, end_date)
+        if gap:
+            gaps[table] = gap
+    return gaps
+
+
+def fetch_training_data(supabase, days: int = 365, mirror: Optional[SupabaseMirror] = None) -> pd.DataFrame:
+    """
+    Fetch CMG Online (actuals) data for training.
 
     Args:
-        supabase: SupabaseClient instance
+        supabase: SupabaseClient instance (unused when reading the mirror)
         days: Number of days of history to fetch
+        mirror: Read from this local mirror instead of Supabase
 
     Returns:
         DataFrame with datetime index and CMG values
     """
-    print(f"Fetching {days} days of CMG Online data from Supabase...")
+    source = "local mirror" if mirror is not None else "Supabase"
+    print(f"Fetching {days} days of CMG Online data from {source}...")
 
     end_date = datetime.now()
     start_date = end_date - timedelta(days=days)
 
-    records = supabase.get_cmg_online(
-        start_date=start_date.strftime('%Y-%m-%d'),
-        end_date=end_date.strftime('%Y-%m-%d'),
-        limit=days * 24 * 3  # 3 nodes per hour
-    )
+    if mirror is not None:
+        df = mirror.read('cmg_online', start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'))
+    else:
+        # Paginated, parallel export: a single request would stop at the PostgREST row cap
+        df = supabase.export_cmg_online(
+            start_date=start_date.strftime('%Y-%m-%d'),
+            end_date=end_date.strftime('%Y-%m-%d'),
+            select='datetime,cmg_usd'
+        )
 
-    if not records:
+    if df.empty:
         raise ValueError("No CMG Online data found in Supabase")
 
-    print(f"  Fetched {len(records)} records")
+    print(f"  Fetched {len(df)} records")
 
-    # Convert to DataFrame
-    df = pd.DataFrame(records)
     df['datetime'] = pd.to_datetime(df['datetime'])
 
     # Average across nodes for each hour
@@ -109,46 +150,144 @@ def fetch_training_data(supabase, days: int = 365) -> pd.DataFrame:
     return df_hourly
 
 
-def fetch_cmg_programado(supabase, start_date: str, end_date: str) -> pd.DataFrame:
+def fetch_cmg_programado(supabase, start_date: str, end_date: str,
+                         mirror: Optional[SupabaseMirror] = None) -> pd.DataFrame:
     """
-    Fetch CMG Programado data from Supabase.
+    Fetch CMG Programado data.
 
     Args:
-        supabase: SupabaseClient instance
+        supabase: SupabaseClient instance (unused when reading the mirror)
         start_date: Start date string
         end_date: End date string
+        mirror: Read from this local mirror instead of Supabase
 
     Returns:
         DataFrame with CMG Programado forecasts
     """
     print(f"Fetching CMG Programado data...")
 
-    records = supabase.get_cmg_programado(
-        start_date=start_date,
-        end_date=end_date,
-        latest_forecast_only=False,
-        limit=100000
-    )
+    if mirror is not None:
+        df = mirror.read('cmg_programado', start_date, end_date)
+    else:
+        # Feature engineering only reads these three columns
+        df = supabase.export_cmg_programado(start_date=start_date, end_date=end_date,
+                                            select='forecast_datetime,target_datetime,cmg_usd')
 
-    if not records:
+    if df.empty:
         print("  Warning: No CMG Programado data found")
         return None
 
-    print(f"  Fetched {len(records)} programado records")
+    print(f"  Fetched {len(df)} programado records")
 
-    df = pd.DataFrame(records)
     df['target_datetime'] = pd.to_datetime(df['target_datetime'])
 
     return df
 
 
+def _lgb_determinism(seed: int) -> Dict:
+    """LightGBM params that make results independent of timing and scheduling"""
+    return {
+        'seed': seed,
+        'deterministic': True,
+        # Skip the row/col-wise timing test, whose outcome can vary run to run
+        'force_col_wise': True
+    }
+
+
+class SharedLGBDataset:
+    """
+    LightGBM train/val datasets binned once and shared by every horizon.
+
+    All horizons train on the same feature matrix and differ only in the
+    target column. The feature-complete rows are binned once. Each horizon
+    then gets a row subset (rows whose target is known) with its own label.
+    Validation bins come from the training set, as with reference=train_data.
+
+    With a cache_dir the binned datasets are saved in LightGBM binary format,
+    keyed by a fingerprint of the feature matrices. Worker processes and
+    later runs load them instead of re-binning.
+    """
+
+    def __init__(self, train: lgb.Dataset, val: lgb.Dataset,
+                 train_rows: np.ndarray, val_rows: np.ndarray, path: Optional[Path] = None):
+        self.train = train
+        self.val = val
+        # Boolean masks over X_train / X_val rows that were binned (no NaN features)
+        self.train_rows = train_rows
+        self.val_rows = val_rows
+        self.path = path
+
+    @staticmethod
+    def fingerprint(X_train: pd.DataFrame, X_val: pd.DataFrame) -> str:
+        digest = hashlib.sha256(','.join(X_train.columns).encode())
+        for X in (X_train, X_val):
+            digest.update(np.ascontiguousarray(X.to_numpy(dtype=np.float64)).tobytes())
+        return digest.hexdigest()[:16]
+
+    @classmethod
+    def build(cls, X_train: pd.DataFrame, X_val: pd.DataFrame,
+              cache_dir: Optional[Path] = None) -> 'SharedLGBDataset':
+        """Bin X_train/X_val once (or load the matching binaries from cache_dir)"""
+        path = Path(cache_dir) / cls.fingerprint(X_train, X_val) if cache_dir else None
+        if path is not None and (path / "train.bin").exists():
+            print(f"  Loading binned LightGBM datasets from {path}")
+            return cls.load(path)
+
+        train_rows = X_train.notna().all(axis=1).to_numpy()
+        val_rows = X_val.notna().all(axis=1).to_numpy()
+
+        # Labels are placeholders; every horizon sets its own on a subset
+        train = lgb.Dataset(
+            X_train[train_rows], label=np.zeros(int(train_rows.sum())), params=LGB_DATASET_PARAMS
+        ).construct()
+        val = lgb.Dataset(
+            X_val[val_rows], label=np.zeros(int(val_rows.sum())), reference=train, params=LGB_DATASET_PARAMS
+        ).construct()
+        print(f"  Binned LightGBM datasets once: {train.num_data()} train / {val.num_data()} val rows")
+
+        shared = cls(train, val, train_rows, val_rows)
+        if path is not None:
+            shared.save(path)
+        return shared
+
+    def save(self, path: Path):
+        path.mkdir(parents=True, exist_ok=True)
+        self.train.save_binary(str(path / "train.bin"))
+        self.val.save_binary(str(path / "val.bin"))
+        np.savez(path / "rows.npz", train_rows=self.train_rows, val_rows=self.val_rows)
+        self.path = path
+
+    @classmethod
+    def load(cls, path: Path) -> 'SharedLGBDataset':
+        path = Path(path)
+        train = lgb.Dataset(str(path / "train.bin"), params=LGB_DATASET_PARAMS).construct()
+        # reference keeps train/val in one reference chain, as lgb.train() expects
+        val = lgb.Dataset(str(path / "val.bin"), reference=train, params=LGB_DATASET_PARAMS).construct()
+        rows = np.load(path / "rows.npz")
+        return cls(train, val, rows['train_rows'], rows['val_rows'], path)
+
+    def for_target(self, y_train: pd.Series, y_val: pd.Series) -> Tuple[lgb.Dataset, lgb.Dataset]:
+        """Train/val datasets for one target: known-target rows, re-labelled, no re-binning"""
+        datasets = []
+        for base, rows, y in [(self.train, self.train_rows, y_train), (self.val, self.val_rows, y_val)]:
+            labels = y.to_numpy(dtype=np.float64)[rows]
+            keep = np.flatnonzero(~np.isnan(labels))
+            subset = base.subset(keep).construct()
+            subset.set_label(labels[keep])
+            datasets.append(subset)
+        return datasets[0], datasets[1]
+
+
 def train_value_model(
     X_train: pd.DataFrame,
     y_train: pd.Series,
     X_val: pd.DataFrame,
     y_val: pd.Series,
     horizon: int,
-    model_type: str = 'lgb'
+    model_type: str = 'lgb',
+    num_threads: int = -1,
+    seed: int = DEFAULT_SEED,
+    lgb_data: Optional['SharedLGBDataset'] = None
 ) -> Tuple[any, Dict]:
     """
     Train a value prediction model.
@@ -158,6 +297,9 @@ def train_value_model(
         X_val, y_val: Validation data
         horizon: Forecast horizon (1-24)
         model_type: 'lgb' or 'xgb'
+        num_threads: Booster threads (-1 = all cores)
+        seed: Random seed (bagging / feature subsampling)
+        lgb_data: Pre-binned LightGBM datasets shared by all horizons (optional)
 
     Returns:
         Trained model and metrics dict
@@ -187,11 +329,15 @@ def train_value_model(
             'bagging_fraction': 0.8,
             'bagging_freq': 5,
             'verbose': -1,
-            'n_jobs': -1
+            'n_jobs': num_threads,
+            **_lgb_determinism(seed)
         }
 
-        train_data = lgb.Dataset(X_train_clean, label=y_train_clean)
-        val_data = lgb.Dataset(X_val_clean, label=y_val_clean, reference=train_data)
+        if lgb_data is not None:
+            train_data, val_data = lgb_data.for_target(y_train, y_val)
+        else:
+            train_data = lgb.Dataset(X_train_clean, label=y_train_clean)
+            val_data = lgb.Dataset(X_val_clean, label=y_val_clean, reference=train_data)
 
         model = lgb.train(
             params,
@@ -209,7 +355,8 @@ def train_value_model(
             'learning_rate': 0.05,
             'subsample': 0.8,
             'colsample_bytree': 0.8,
-            'n_jobs': -1
+            'n_jobs': num_threads,
+            'seed': seed
         }
 
         train_data = xgb.DMatrix(X_train_clean, label=y_train_clean)
@@ -247,7 +394,10 @@ def train_zero_model(
     X_val: pd.DataFrame,
     y_val: pd.Series,
     horizon: int,
-    model_type: str = 'lgb'
+    model_type: str = 'lgb',
+    num_threads: int = -1,
+    seed: int = DEFAULT_SEED,
+    lgb_data: Optional['SharedLGBDataset'] = None
 ) -> Tuple[any, Dict]:
     """
     Train a zero detection (classification) model.
@@ -257,6 +407,9 @@ def train_zero_model(
         X_val, y_val: Validation data
         horizon: Forecast horizon (1-24)
         model_type: 'lgb' or 'xgb'
+        num_threads: Booster threads (-1 = all cores)
+        seed: Random seed (feature subsampling)
+        lgb_data: Pre-binned LightGBM datasets shared by all horizons (optional)
 
     Returns:
         Trained model and metrics dict
@@ -288,11 +441,15 @@ def train_zero_model(
             'feature_fraction': 0.8,
             'scale_pos_weight': scale_pos_weight,
             'verbose': -1,
-            'n_jobs': -1
+            'n_jobs': num_threads,
+            **_lgb_determinism(seed)
         }
 
-        train_data = lgb.Dataset(X_train_clean, label=y_train_clean)
-        val_data = lgb.Dataset(X_val_clean, label=y_val_clean, reference=train_data)
+        if lgb_data is not None:
+            train_data, val_data = lgb_data.for_target(y_train, y_val)
+        else:
+            train_data = lgb.Dataset(X_train_clean, label=y_train_clean)
+            val_data = lgb.Dataset(X_val_clean, label=y_val_clean, reference=train_data)
 
         model = lgb.train(
             params,
@@ -311,7 +468,8 @@ def train_zero_model(
             'max_depth': 6,
             'learning_rate': 0.05,
             'scale_pos_weight': scale_pos_weight,
-            'n_jobs': -1
+            'n_jobs': num_threads,
+            'seed': seed
         }
 
         train_data = xgb.DMatrix(X_train_clean, label=y_train_clean)
@@ -349,6 +507,150 @@ def train_zero_model(
     return model, metrics
 
 
+def train_horizon(
+    h: int,
+    train_df: pd.DataFrame,
+    val_df: pd.DataFrame,
+    feature_names: List[str],
+    num_threads: int = -1,
+    seed: int = DEFAULT_SEED,
+    lgb_data: Optional[SharedLGBDataset] = None
+) -> Tuple[Dict, Dict, List[str]]:
+    """
+    Train the value and zero detection models (LGB + XGB) for one horizon.
+
+    Returns:
+        (models, metrics, log_lines) - metrics as {'value': {...}, 'zero': {...}}
+    """
+    models = {}
+    metrics = {'value': {}, 'zero': {}}
+    log = [f"\n{'='*60}", f"Training models for horizon t+{h}", '='*60]
+
+    # Prepare data
+    X_train = train_df[feature_names]
+    X_val = val_df[feature_names]
+
+    y_train_value = train_df[f'cmg_value_t+{h}']
+    y_val_value = val_df[f'cmg_value_t+{h}']
+
+    y_train_zero = train_df[f'is_zero_t+{h}']
+    y_val_zero = val_df[f'is_zero_t+{h}']
+
+    # Train value prediction models (LGB and XGB)
+    for model_type, name in [('lgb', 'LightGBM'), ('xgb', 'XGBoost')]:
+        log.append(f"  Training {name} value model...")
+        model, model_metrics = train_value_model(
+            X_train, y_train_value, X_val, y_val_value, h, model_type, num_threads, seed, lgb_data
+        )
+        if model:
+            models[f'{model_type}_value_t+{h}'] = model
+            metrics['value'][f'{model_type}_t+{h}'] = model_metrics
+            log.append(f"    MAE: ${model_metrics['mae']:.2f}")
+
+    # Train zero detection models
+    for model_type, name in [('lgb', 'LightGBM'), ('xgb', 'XGBoost')]:
+        log.append(f"  Training {name} zero detection model...")
+        model, model_metrics = train_zero_model(
+            X_train, y_train_zero, X_val, y_val_zero, h, model_type, num_threads, seed, lgb_data
+        )
+        if model:
+            models[f'{model_type}_zero_t+{h}'] = model
+            metrics['zero'][f'{model_type}_t+{h}'] = model_metrics
+            log.append(f"    AUC: {model_metrics['auc']:.3f}, F1: {model_metrics['f1']:.3f}")
+
+    return models, metrics, log
+
+
+# Training frames shared by every task in a worker process (set once per worker)
+_WORKER_DATA = {}
+
+
+def _init_training_worker(train_df, val_df, feature_names, num_threads, seed, lgb_dataset_path):
+    _WORKER_DATA.update(
+        train_df=train_df, val_df=val_df, feature_names=feature_names,
+        num_threads=num_threads, seed=seed,
+        lgb_data=SharedLGBDataset.load(lgb_dataset_path)
+    )
+
+
+def _train_horizon_in_worker(h: int):
+    return train_horizon(h, **_WORKER_DATA)
+
+
+def plan_thread_budget(n_tasks: int, thread_budget: Optional[int] = None,
+                       workers: Optional[int] = None) -> Tuple[int, int]:
+    """
+    Split a global thread budget into (workers, threads per worker)
+
+    workers × threads per worker never exceeds the budget (default: all cores).
+    """
+    thread_budget = max(1, thread_budget or os.cpu_count() or 1)
+    if workers is None:
+        workers = min(n_tasks, thread_budget)
+    workers = max(1, min(workers, n_tasks, thread_budget))
+    return workers, max(1, thread_budget // workers)
+
+
+def train_all_horizons(
+    horizons: List[int],
+    train_df: pd.DataFrame,
+    val_df: pd.DataFrame,
+    feature_names: List[str],
+    thread_budget: Optional[int] = None,
+    workers: Optional[int] = None,
+    seed: int = DEFAULT_SEED,
+    lgb_dataset_dir: Optional[Path] = None
+) -> Tuple[Dict, Dict]:
+    """
+    Train every horizon, fanned out across a process pool.
+
+    Each horizon is one task. Boosters inside a worker get
+    thread_budget // workers threads, so the machine is never
+    oversubscribed. Results are merged in horizon order, and with a
+    fixed seed and thread budget they do not depend on scheduling.
+
+    LightGBM datasets are binned once (SharedLGBDataset). Workers load the
+    binned binaries from lgb_dataset_dir (a temporary directory if unset).
+
+    Returns:
+        (all_models, all_metrics)
+    """
+    workers, num_threads = plan_thread_budget(len(horizons), thread_budget, workers)
+    print(f"\nTraining {len(horizons)} horizons: {workers} worker(s) × {num_threads} thread(s)")
+
+    X_train, X_val = train_df[feature_names], val_df[feature_names]
+
+    if workers == 1:
+        lgb_data = SharedLGBDataset.build(X_train, X_val, cache_dir=lgb_dataset_dir)
+        results = (train_horizon(h, train_df, val_df, feature_names, num_threads, seed, lgb_data)
+                   for h in horizons)
+        return _merge_horizon_results(results)
+
+    with tempfile.TemporaryDirectory(prefix='lgb_datasets_') as tmp_dir:
+        lgb_data = SharedLGBDataset.build(X_train, X_val, cache_dir=lgb_dataset_dir or Path(tmp_dir))
+
+        # spawn: forking after OpenMP has started can deadlock the children
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=mp.get_context('spawn'),
+            initializer=_init_training_worker,
+            initargs=(train_df, val_df, feature_names, num_threads, seed, lgb_data.path)
+        ) as executor:
+            # map() yields in submission (horizon) order
+            return _merge_horizon_results(executor.map(_train_horizon_in_worker, horizons))
+
+
+def _merge_horizon_results(results) -> Tuple[Dict, Dict]:
+    all_models = {}
+    all_metrics = {'value': {}, 'zero': {}}
+    for models, metrics, log in results:
+        print("\n".join(log))
+        all_models.update(models)
+        all_metrics['value'].update(metrics['value'])
+        all_metrics['zero'].update(metrics['zero'])
+    return all_models, all_metrics
+
+
 def save_models(
     models: Dict,
     feature_names: List[str],
@@ -412,6 +714,20 @@ def main():
                         help='Days of history to use for training')
     parser.add_argument('--output-dir', type=str, default=None,
                         help='Output directory for models')
+    parser.add_argument('--no-feature-cache', action='store_true',
+                        help='Recompute features instead of using data/feature_store/')
+    parser.add_argument('--threads', type=int, default=None,
+                        help='Total thread budget across all workers (default: all cores)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Parallel horizon workers (default: min(horizons, threads))')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED,
+                        help='Random seed for all boosters')
+    parser.add_argument('--lgb-dataset-dir', type=str, default=None,
+                        help='Keep binned LightGBM datasets here and reuse them across runs')
+    parser.add_argument('--data-source', choices=['mirror', 'supabase'], default='mirror',
+                        help='Read training data from the local mirror (default) or Supabase')
+    parser.add_argument('--sync-mirror', action='store_true',
+                        help='Pull new rows into the local mirror before training')
     args = parser.parse_args()
 
     # Parse horizons
@@ -429,16 +745,44 @@ def main():
     print(f"Training days: {args.days}")
     print()
 
+    # Local mirror: network I/O only to create, extend or refresh it
+    mirror = SupabaseMirror() if args.data_source == 'mirror' else None
+    tables = ['cmg_online'] + (['cmg_programado'] if args.include_programado else [])
+    gaps = check_mirror_coverage(mirror, tables, args.days) if mirror is not None else {}
+    for table, gap in gaps.items():
+        print(f"⚠️  Mirror does not cover the last {args.days} days of {table}: {gap}")
+    needs_sync = mirror is not None and (args.sync_mirror or bool(gaps))
+
     # Initialize Supabase
-    supabase = get_supabase_client()
-    if supabase is None:
-        print("Error: Could not initialize Supabase client")
-        print("Make sure SUPABASE_URL and SUPABASE_SERVICE_KEY are set")
-        sys.exit(1)
+    supabase = None
+    if mirror is None or needs_sync:
+        supabase = get_supabase_client()
+        if supabase is None and (mirror is None or not all(mirror.has_table(t) for t in tables)):
+            print("Error: Could not initialize Supabase client")
+            print("Make sure SUPABASE_URL and SUPABASE_SERVICE_KEY are set")
+            sys.exit(1)
+
+    if needs_sync and supabase is not None:
+        print("Syncing local Supabase mirror...")
+        mirror.sync(supabase, tables=tables, days=max(args.days, 365))
+        history_start = (datetime.now() - timedelta(days=args.days)).strftime('%Y-%m-%d')
+        for table in tables:
+            mirror.extend_history(supabase, table, history_start)
+        gaps = check_mirror_coverage(mirror, tables, args.days)
+        print()
+
+    if gaps:
+        print("="*80)
+        print(f"⚠️  WARNING: the local mirror does not cover the requested {args.days} days")
+        for table, gap in gaps.items():
+            print(f"   {table}: {gap}")
+        print("   Training continues on the rows the mirror has; the window is truncated.")
+        print("="*80)
+        print()
 
     # Fetch training data
     try:
-        df = fetch_training_data(supabase, days=args.days)
+        df = fetch_training_data(supabase, days=args.days, mirror=mirror)
     except Exception as e:
         print(f"Error fetching training data: {e}")
         sys.exit(1)
@@ -450,7 +794,8 @@ def main():
             prog_df = fetch_cmg_programado(
                 supabase,
                 start_date=df.index.min().strftime('%Y-%m-%d'),
-                end_date=df.index.max().strftime('%Y-%m-%d')
+                end_date=df.index.max().strftime('%Y-%m-%d'),
+                mirror=mirror
             )
         except Exception as e:
             print(f"Warning: Could not fetch CMG Programado: {e}")
@@ -463,11 +808,19 @@ def main():
         lag_hours=[1, 2, 3, 6, 12, 24, 48, 168]
     )
 
-    df_feat = feature_engineer.create_features(
-        df,
-        cmg_column='CMG [$/MWh]',
-        cmg_programado_df=prog_df
-    )
+    if args.no_feature_cache:
+        df_feat = feature_engineer.create_features(
+            df,
+            cmg_column='CMG [$/MWh]',
+            cmg_programado_df=prog_df
+        )
+    else:
+        df_feat = FeatureStore().get_or_create(
+            feature_engineer,
+            df,
+            cmg_column='CMG [$/MWh]',
+            cmg_programado_df=prog_df
+        )
 
     feature_names = feature_engineer.get_feature_names()
     print(f"Created {len(feature_names)} features")
@@ -483,62 +836,12 @@ def main():
     print(f"\nTrain: {len(train_df)} samples ({train_df.index.min()} to {train_df.index.max()})")
     print(f"Val: {len(val_df)} samples ({val_df.index.min()} to {val_df.index.max()})")
 
-    # Train models for each horizon
-    all_models = {}
-    all_metrics = {'value': {}, 'zero': {}}
-
-    for h in horizons:
-        print(f"\n{'='*60}")
-        print(f"Training models for horizon t+{h}")
-        print('='*60)
-
-        # Prepare data
-        X_train = train_df[feature_names]
-        X_val = val_df[feature_names]
-
-        y_train_value = train_df[f'cmg_value_t+{h}']
-        y_val_value = val_df[f'cmg_value_t+{h}']
-
-        y_train_zero = train_df[f'is_zero_t+{h}']
-        y_val_zero = val_df[f'is_zero_t+{h}']
-
-        # Train value prediction models (LGB and XGB)
-        print(f"  Training LightGBM value model...")
-        lgb_model, lgb_metrics = train_value_model(
-            X_train, y_train_value, X_val, y_val_value, h, 'lgb'
-        )
-        if lgb_model:
-            all_models[f'lgb_value_t+{h}'] = lgb_model
-            all_metrics['value'][f'lgb_t+{h}'] = lgb_metrics
-            print(f"    MAE: ${lgb_metrics['mae']:.2f}")
-
-        print(f"  Training XGBoost value model...")
-        xgb_model, xgb_metrics = train_value_model(
-            X_train, y_train_value, X_val, y_val_value, h, 'xgb'
-        )
-        if xgb_model:
-            all_models[f'xgb_value_t+{h}'] = xgb_model
-            all_metrics['value'][f'xgb_t+{h}'] = xgb_metrics
-            print(f"    MAE: ${xgb_metrics['mae']:.2f}")
-
-        # Train zero detection models
-        print(f"  Training LightGBM zero detection model...")
-        lgb_zero, lgb_zero_metrics = train_zero_model(
-            X_train, y_train_zero, X_val, y_val_zero, h, 'lgb'
-        )
-        if lgb_zero:
-            all_models[f'lgb_zero_t+{h}'] = lgb_zero
-            all_metrics['zero'][f'lgb_t+{h}'] = lgb_zero_metrics
-            print(f"    AUC: {lgb_zero_metrics['auc']:.3f}, F1: {lgb_zero_metrics['f1']:.3f}")
-
-        print(f"  Training XGBoost zero detection model...")
-        xgb_zero, xgb_zero_metrics = train_zero_model(
-            X_train, y_train_zero, X_val, y_val_zero, h, 'xgb'
-        )
-        if xgb_zero:
-            all_models[f'xgb_zero_t+{h}'] = xgb_zero
-            all_metrics['zero'][f'xgb_t+{h}'] = xgb_zero_metrics
-            print(f"    AUC: {xgb_zero_metrics['auc']:.3f}, F1: {xgb_zero_metrics['f1']:.3f}")
+    # Train models for each horizon (in parallel across horizons)
+    all_models, all_metrics = train_all_horizons(
+        horizons, train_df, val_df, feature_names,
+        thread_budget=args.threads, workers=args.workers, seed=args.seed,
+        lgb_dataset_dir=Path(args.lgb_dataset_dir) if args.lgb_dataset_dir else None
+    )
 
     # Save models
     output_dir = Path(args.output_dir) if args.output_dir else MODELS_DIR
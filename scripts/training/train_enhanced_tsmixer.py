@@ -62,6 +62,7 @@ from sklearn.metrics import mean_absolute_error
 from pytorch_lightning.callbacks import StochasticWeightAveraging
 
 from ml_feature_engineering import CleanCMGFeatureEngineering
+from ml_feature_store import cached_create_features
 
 torch.set_float32_matmul_precision('high')
 
@@ -560,7 +561,7 @@ def run_enhanced_training(
     )
     df_for_features = df_raw.copy()
     df_for_features.columns = ['CMG [$/MWh]']
-    df_feat = feature_engineer.create_features(df_for_features, cmg_column='CMG [$/MWh]')
+    df_feat = cached_create_features(feature_engineer, df_for_features, cmg_column='CMG [$/MWh]')
     feature_names = feature_engineer.get_feature_names()
 
     print(f"Features: {len(feature_names)}")
@@ -60,6 +60,7 @@ from sklearn.metrics import mean_absolute_error
 import pickle
 
 from ml_feature_engineering import CleanCMGFeatureEngineering
+from ml_feature_store import cached_create_features
 
 # Enable TF32 for faster training on Ampere+ GPUs
 torch.set_float32_matmul_precision('high')
@@ -1103,7 +1104,7 @@ def run_hybrid_training(
     )
     df_for_features = df_raw.copy()
     df_for_features.columns = ['CMG [$/MWh]']
-    df_feat = feature_engineer.create_features(df_for_features, cmg_column='CMG [$/MWh]')
+    df_feat = cached_create_features(feature_engineer, df_for_features, cmg_column='CMG [$/MWh]')
     feature_names = feature_engineer.get_feature_names()
     print(f"  ML Ensemble format: {df_feat.shape} with {len(feature_names)} features")
 
@@ -0,0 +1,182 @@
+-- ============================================================
+-- MIGRATION 006: Add Range Performance RPC Function
+-- ============================================================
+-- Date: 2026-10-17
+-- Purpose: Aggregate forecast distances server-side for /api/performance_range
+--
+-- The endpoint used to download every ML and Programado forecast row
+-- plus all actuals for the range (tens of thousands of rows for a few
+-- weeks) and average |forecast - actual| in Python. This function
+-- returns the distance sums and counts already grouped by day and by
+-- horizon: at most ~100 rows regardless of the range length.
+--
+-- Usage (via PostgREST):
+--   POST /rest/v1/rpc/range_performance_metrics
+--   Body: {"p_start_date": "2025-11-01", "p_end_date": "2025-11-30"}
+--
+-- Returns one row per (dimension, source, bucket):
+--   dimension = 'day'      → bucket_date = target date (Santiago)
+--   dimension = 'horizon'  → horizon 1-24, forecasts MADE in the range
+--   dimension = 'coverage' → error_count = rows considered per source
+-- ============================================================
+
+-- Drop existing function if it exists (for re-running migration)
+DROP FUNCTION IF EXISTS range_performance_metrics(DATE, DATE);
+
+-- ============================================================
+-- MAIN FUNCTION: range_performance_metrics
+-- ============================================================
+CREATE OR REPLACE FUNCTION range_performance_metrics(
+    p_start_date DATE,
+    p_end_date DATE
+)
+RETURNS TABLE(
+    dimension TEXT,                 -- 'day' | 'horizon' | 'coverage'
+    source TEXT,                    -- 'ml' | 'prog' (coverage also 'prog_raw', 'actuals')
+    bucket_date DATE,               -- Target date for 'day' rows
+    horizon INTEGER,                -- 1-24 for 'horizon' rows
+    distance_sum DOUBLE PRECISION,  -- Sum of |forecast - actual|
+    error_count INTEGER             -- Number of forecasts with an actual
+)
+LANGUAGE sql
+STABLE  -- Function doesn't modify data
+AS $$
+    WITH
+    -- ============================================================
+    -- Actuals: (date, hour) → CMG averaged across nodes
+    -- The UTC bounds are a coarse, index-friendly prefilter; the
+    -- Santiago date condition is the exact one
+    -- ============================================================
+    actuals AS (
+        SELECT date, hour, AVG(cmg_usd)::DOUBLE PRECISION AS cmg_actual
+        FROM cmg_online_santiago
+        WHERE datetime >= (p_start_date - 1)::TIMESTAMPTZ
+          AND datetime < (p_end_date + 2)::TIMESTAMPTZ
+          AND date BETWEEN p_start_date AND p_end_date
+        GROUP BY date, hour
+    ),
+
+    -- ============================================================
+    -- Forecasts made from the day before the range: a t+24 forecast
+    -- made on day N targets day N+1
+    -- ============================================================
+    ml AS (
+        SELECT forecast_date, target_date, target_hour, horizon,
+               cmg_predicted::DOUBLE PRECISION AS predicted
+        FROM ml_predictions_santiago
+        WHERE forecast_datetime >= (p_start_date - 2)::TIMESTAMPTZ
+          AND forecast_datetime < (p_end_date + 2)::TIMESTAMPTZ
+          AND forecast_date BETWEEN p_start_date - 1 AND p_end_date
+    ),
+    prog_raw AS (
+        SELECT forecast_date, target_date, target_hour,
+               cmg_usd::DOUBLE PRECISION AS predicted,
+               target_datetime > forecast_datetime AS is_future,
+               FLOOR(EXTRACT(EPOCH FROM (target_datetime - forecast_datetime)) / 3600)::INTEGER AS horizon
+        FROM cmg_programado_santiago
+        WHERE forecast_datetime >= (p_start_date - 2)::TIMESTAMPTZ
+          AND forecast_datetime < (p_end_date + 2)::TIMESTAMPTZ
+          AND forecast_date BETWEEN p_start_date - 1 AND p_end_date
+    ),
+    -- Only future targets, first 24 hours (matching ML predictions)
+    prog AS (
+        SELECT * FROM prog_raw
+        WHERE is_future AND horizon <= 24
+    ),
+
+    -- ============================================================
+    -- Absolute errors where the target hour has an actual
+    -- ============================================================
+    errors AS (
+        SELECT 'ml'::TEXT AS source, f.forecast_date, f.target_date, f.horizon,
+               ABS(f.predicted - a.cmg_actual) AS distance
+        FROM ml f
+        JOIN actuals a ON a.date = f.target_date AND a.hour = f.target_hour
+        UNION ALL
+        SELECT 'prog'::TEXT, f.forecast_date, f.target_date, f.horizon,
+               ABS(f.predicted - a.cmg_actual)
+        FROM prog f
+        JOIN actuals a ON a.date = f.target_date AND a.hour = f.target_hour
+    )
+
+    -- Temporal dimension: by TARGET date
+    SELECT 'day'::TEXT, e.source, e.target_date, NULL::INTEGER,
+           SUM(e.distance), COUNT(*)::INTEGER
+    FROM errors e
+    GROUP BY e.source, e.target_date
+
+    UNION ALL
+
+    -- Structural dimension: by horizon, forecasts MADE in the range
+    SELECT 'horizon'::TEXT, e.source, NULL::DATE, e.horizon,
+           SUM(e.distance), COUNT(*)::INTEGER
+    FROM errors e
+    WHERE e.forecast_date BETWEEN p_start_date AND p_end_date
+      AND e.horizon BETWEEN 1 AND 24
+    GROUP BY e.source, e.horizon
+
+    UNION ALL
+
+    -- Data coverage
+    SELECT 'coverage', 'ml', NULL, NULL, NULL, (SELECT COUNT(*) FROM ml)::INTEGER
+    UNION ALL
+    SELECT 'coverage', 'prog', NULL, NULL, NULL, (SELECT COUNT(*) FROM prog)::INTEGER
+    UNION ALL
+    SELECT 'coverage', 'prog_raw', NULL, NULL, NULL, (SELECT COUNT(*) FROM prog_raw)::INTEGER
+    UNION ALL
+    SELECT 'coverage', 'actuals', NULL, NULL, NULL, (SELECT COUNT(*) FROM actuals)::INTEGER
+$$;
+
+-- ============================================================
+-- DOCUMENTATION
+-- ============================================================
+COMMENT ON FUNCTION range_performance_metrics(DATE, DATE) IS
+'Forecast distance sums and counts for ML predictions and CMG Programado.
+
+Parameters:
+  p_start_date: First date of the range (inclusive, Santiago time)
+  p_end_date: Last date of the range (inclusive, Santiago time)
+
+Returns rows of (dimension, source, bucket_date, horizon, distance_sum, error_count):
+  day:      per source and target date; average = distance_sum / error_count
+  horizon:  per source and horizon (1-24), only forecasts made in the range
+  coverage: error_count = ML forecasts, filtered Programado forecasts,
+            raw Programado rows and actual hours considered
+
+Distances are |forecast - actual|, with actuals averaged across nodes.
+Programado horizons are whole hours between forecast and target, first 24 only.
+
+Example:
+  SELECT * FROM range_performance_metrics(''2025-11-01''::DATE, ''2025-11-30''::DATE);
+
+  POST /rest/v1/rpc/range_performance_metrics
+  {"p_start_date": "2025-11-01", "p_end_date": "2025-11-30"}
+';
+
+-- ============================================================
+-- PERMISSIONS
+-- ============================================================
+GRANT EXECUTE ON FUNCTION range_performance_metrics TO anon;
+GRANT EXECUTE ON FUNCTION range_performance_metrics TO authenticated;
+GRANT EXECUTE ON FUNCTION range_performance_metrics TO service_role;
+
+-- ============================================================
+-- VERIFICATION
+-- ============================================================
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM pg_proc
+        WHERE proname = 'range_performance_metrics'
+    ) THEN
+        RAISE NOTICE '✅ MIGRATION 006 COMPLETED: range_performance_metrics function created';
+        RAISE NOTICE '';
+        RAISE NOTICE 'Test with: SELECT * FROM range_performance_metrics(CURRENT_DATE - 7, CURRENT_DATE);';
+        RAISE NOTICE '';
+        RAISE NOTICE 'API Usage:';
+        RAISE NOTICE '  POST /rest/v1/rpc/range_performance_metrics';
+        RAISE NOTICE '  Body: {"p_start_date": "2025-11-01", "p_end_date": "2025-11-30"}';
+    ELSE
+        RAISE EXCEPTION '❌ MIGRATION 006 FAILED: Function not created';
+    END IF;
+END$$;
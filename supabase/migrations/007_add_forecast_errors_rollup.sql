@@ -0,0 +1,181 @@
+-- ============================================================
+-- MIGRATION 007: Forecast Errors Rollup Table
+-- ============================================================
+-- Date: 2026-10-17
+-- Purpose: Compute |forecast - actual| once, at ingest time
+--
+-- Range performance, the daily heatmap and the historical comparison
+-- all used to join raw forecasts against actuals on every request.
+-- forecast_errors holds one row per (forecast_datetime, horizon,
+-- source, node) with the forecast, the actual (averaged across nodes)
+-- and the signed error, plus Santiago date/hour columns for indexed
+-- lookups.
+--
+-- Maintained by scripts/production/forecast_error_rollup.py, which
+-- smart_cmg_online_update.py runs for the target hours of every batch
+-- of new actuals. After running this migration, backfill once:
+--   python scripts/production/forecast_error_rollup.py --rebuild
+--
+-- range_performance_metrics (migration 006) is redefined to aggregate
+-- this table instead of the raw views; its result shape is unchanged.
+-- ============================================================
+
+-- ============================================================
+-- STEP 1: forecast_errors table
+-- ============================================================
+CREATE TABLE IF NOT EXISTS forecast_errors (
+    id BIGSERIAL PRIMARY KEY,
+    source TEXT NOT NULL CHECK (source IN ('ml', 'prog')),
+    node TEXT NOT NULL,                     -- Programado node code, 'ALL' for ML (system-wide)
+    forecast_datetime TIMESTAMPTZ NOT NULL,
+    target_datetime TIMESTAMPTZ NOT NULL,
+    horizon INTEGER NOT NULL CHECK (horizon BETWEEN 1 AND 24),
+    forecast_date DATE NOT NULL,            -- Santiago timezone
+    forecast_hour INTEGER NOT NULL,
+    target_date DATE NOT NULL,              -- Santiago timezone
+    target_hour INTEGER NOT NULL,
+    predicted DOUBLE PRECISION NOT NULL,
+    actual DOUBLE PRECISION NOT NULL,       -- CMG Online averaged across nodes
+    error DOUBLE PRECISION NOT NULL,        -- predicted - actual
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    CONSTRAINT forecast_errors_forecast_horizon_source_node_key
+        UNIQUE (forecast_datetime, horizon, source, node)
+);
+
+COMMENT ON TABLE forecast_errors IS 'Forecast vs actual errors, one row per forecast value with an actual (rollup, rebuildable)';
+
+-- Temporal lookups (by target day) and structural/heatmap lookups (by forecast day)
+CREATE INDEX IF NOT EXISTS idx_forecast_errors_source_target ON forecast_errors(source, target_date);
+CREATE INDEX IF NOT EXISTS idx_forecast_errors_source_forecast ON forecast_errors(source, forecast_date, forecast_hour);
+
+DROP TRIGGER IF EXISTS update_forecast_errors_updated_at ON forecast_errors;
+CREATE TRIGGER update_forecast_errors_updated_at BEFORE UPDATE ON forecast_errors
+    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+-- ============================================================
+-- STEP 2: RLS Policies
+-- ============================================================
+ALTER TABLE forecast_errors ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Allow anonymous read access to forecast_errors" ON forecast_errors;
+CREATE POLICY "Allow anonymous read access to forecast_errors"
+    ON forecast_errors FOR SELECT
+    USING (true);
+
+DROP POLICY IF EXISTS "Allow service role write access to forecast_errors" ON forecast_errors;
+CREATE POLICY "Allow service role write access to forecast_errors"
+    ON forecast_errors FOR ALL
+    USING (auth.role() = 'service_role');
+
+-- ============================================================
+-- STEP 3: range_performance_metrics over the rollup
+-- ============================================================
+DROP FUNCTION IF EXISTS range_performance_metrics(DATE, DATE);
+
+CREATE OR REPLACE FUNCTION range_performance_metrics(
+    p_start_date DATE,
+    p_end_date DATE
+)
+RETURNS TABLE(
+    dimension TEXT,                 -- 'day' | 'horizon' | 'coverage'
+    source TEXT,                    -- 'ml' | 'prog' (coverage also 'prog_raw', 'actuals')
+    bucket_date DATE,               -- Target date for 'day' rows
+    horizon INTEGER,                -- 1-24 for 'horizon' rows
+    distance_sum DOUBLE PRECISION,  -- Sum of |forecast - actual|
+    error_count INTEGER             -- Number of forecasts with an actual
+)
+LANGUAGE sql
+STABLE  -- Function doesn't modify data
+AS $$
+    -- Temporal dimension: by TARGET date
+    SELECT 'day'::TEXT, fe.source, fe.target_date, NULL::INTEGER,
+           SUM(ABS(fe.error)), COUNT(*)::INTEGER
+    FROM forecast_errors fe
+    WHERE fe.target_date BETWEEN p_start_date AND p_end_date
+    GROUP BY fe.source, fe.target_date
+
+    UNION ALL
+
+    -- Structural dimension: by horizon, forecasts MADE in the range
+    SELECT 'horizon'::TEXT, fe.source, NULL::DATE, fe.horizon,
+           SUM(ABS(fe.error)), COUNT(*)::INTEGER
+    FROM forecast_errors fe
+    WHERE fe.forecast_date BETWEEN p_start_date AND p_end_date
+      AND fe.target_date BETWEEN p_start_date AND p_end_date
+    GROUP BY fe.source, fe.horizon
+
+    UNION ALL
+
+    -- Data coverage: counts only, from the raw views (UTC bounds are an
+    -- index-friendly prefilter, the Santiago date condition the exact one)
+    SELECT 'coverage', 'ml', NULL, NULL, NULL, COUNT(*)::INTEGER
+    FROM ml_predictions_santiago
+    WHERE forecast_datetime >= (p_start_date - 2)::TIMESTAMPTZ
+      AND forecast_datetime < (p_end_date + 2)::TIMESTAMPTZ
+      AND forecast_date BETWEEN p_start_date - 1 AND p_end_date
+
+    UNION ALL
+
+    SELECT 'coverage', 'prog', NULL, NULL, NULL,
+           COUNT(*) FILTER (WHERE target_datetime > forecast_datetime
+                              AND target_datetime <= forecast_datetime + INTERVAL '24 hours')::INTEGER
+    FROM cmg_programado_santiago
+    WHERE forecast_datetime >= (p_start_date - 2)::TIMESTAMPTZ
+      AND forecast_datetime < (p_end_date + 2)::TIMESTAMPTZ
+      AND forecast_date BETWEEN p_start_date - 1 AND p_end_date
+
+    UNION ALL
+
+    SELECT 'coverage', 'prog_raw', NULL, NULL, NULL, COUNT(*)::INTEGER
+    FROM cmg_programado_santiago
+    WHERE forecast_datetime >= (p_start_date - 2)::TIMESTAMPTZ
+      AND forecast_datetime < (p_end_date + 2)::TIMESTAMPTZ
+      AND forecast_date BETWEEN p_start_date - 1 AND p_end_date
+
+    UNION ALL
+
+    SELECT 'coverage', 'actuals', NULL, NULL, NULL, COUNT(DISTINCT (date, hour))::INTEGER
+    FROM cmg_online_santiago
+    WHERE datetime >= (p_start_date - 1)::TIMESTAMPTZ
+      AND datetime < (p_end_date + 2)::TIMESTAMPTZ
+      AND date BETWEEN p_start_date AND p_end_date
+$$;
+
+COMMENT ON FUNCTION range_performance_metrics(DATE, DATE) IS
+'Forecast distance sums and counts for ML predictions and CMG Programado,
+aggregated from the forecast_errors rollup (migration 007).
+
+Parameters:
+  p_start_date: First date of the range (inclusive, Santiago time)
+  p_end_date: Last date of the range (inclusive, Santiago time)
+
+Returns rows of (dimension, source, bucket_date, horizon, distance_sum, error_count):
+  day:      per source and target date; average = distance_sum / error_count
+  horizon:  per source and horizon (1-24), only forecasts made in the range
+  coverage: error_count = ML forecasts, filtered Programado forecasts,
+            raw Programado rows and actual hours considered
+
+Example:
+  SELECT * FROM range_performance_metrics(''2025-11-01''::DATE, ''2025-11-30''::DATE);
+';
+
+GRANT EXECUTE ON FUNCTION range_performance_metrics TO anon;
+GRANT EXECUTE ON FUNCTION range_performance_metrics TO authenticated;
+GRANT EXECUTE ON FUNCTION range_performance_metrics TO service_role;
+
+-- ============================================================
+-- STEP 4: Verification
+-- ============================================================
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM information_schema.tables
+        WHERE table_name = 'forecast_errors'
+    ) THEN
+        RAISE NOTICE '✅ MIGRATION 007 COMPLETED: forecast_errors table created';
+        RAISE NOTICE '';
+        RAISE NOTICE 'Backfill with: python scripts/production/forecast_error_rollup.py --rebuild';
+    ELSE
+        RAISE EXCEPTION '❌ MIGRATION 007 FAILED: forecast_errors table not created';
+    END IF;
+END$$;
@@ -0,0 +1,64 @@
+-- ============================================================
+-- MIGRATION 008: Precomputed Daily Heatmaps
+-- ============================================================
+-- Date: 2026-10-17
+-- Purpose: Serve /api/performance_heatmap from stored matrices
+--
+-- The endpoint used to run three full-day queries and build the ML and
+-- CMG Programado 24×24 error matrices on every request. Once a day's
+-- actuals are complete (the day and the next one, which t+24 forecasts
+-- target), scripts/production/heatmap_materializer.py stores both
+-- matrices here; the endpoint only computes recent days live.
+--
+-- matrix is packed row-major: element [forecast_hour * 24 + horizon - 1]
+-- holds forecast - actual (NULL where the target has no actual).
+--
+-- Backfill after running this migration:
+--   python scripts/production/heatmap_materializer.py --days 90
+-- ============================================================
+
+CREATE TABLE IF NOT EXISTS daily_heatmaps (
+    date DATE NOT NULL,                     -- Forecast date (Santiago)
+    source TEXT NOT NULL CHECK (source IN ('ml', 'prog')),
+    matrix REAL[] NOT NULL CHECK (cardinality(matrix) = 576),
+    total_distance DOUBLE PRECISION NOT NULL,
+    error_count INTEGER NOT NULL,
+    forecast_count INTEGER NOT NULL,
+    actual_hours INTEGER[] NOT NULL,        -- Hours of the date with actuals
+    computed_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (date, source)
+);
+
+COMMENT ON TABLE daily_heatmaps IS 'Per-day 24×24 forecast error matrices (ML, CMG Programado), packed row-major';
+
+-- ============================================================
+-- RLS Policies
+-- ============================================================
+ALTER TABLE daily_heatmaps ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Allow anonymous read access to daily_heatmaps" ON daily_heatmaps;
+CREATE POLICY "Allow anonymous read access to daily_heatmaps"
+    ON daily_heatmaps FOR SELECT
+    USING (true);
+
+DROP POLICY IF EXISTS "Allow service role write access to daily_heatmaps" ON daily_heatmaps;
+CREATE POLICY "Allow service role write access to daily_heatmaps"
+    ON daily_heatmaps FOR ALL
+    USING (auth.role() = 'service_role');
+
+-- ============================================================
+-- Verification
+-- ============================================================
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM information_schema.tables
+        WHERE table_name = 'daily_heatmaps'
+    ) THEN
+        RAISE NOTICE '✅ MIGRATION 008 COMPLETED: daily_heatmaps table created';
+        RAISE NOTICE '';
+        RAISE NOTICE 'Backfill with: python scripts/production/heatmap_materializer.py --days 90';
+    ELSE
+        RAISE EXCEPTION '❌ MIGRATION 008 FAILED: daily_heatmaps table not created';
+    END IF;
+END$$;
@@ -0,0 +1,129 @@
+-- ============================================================
+-- MIGRATION 009: Forecast Runs Index
+-- ============================================================
+-- Date: 2026-10-17
+-- Purpose: List available forecasts without scanning every forecast row
+--
+-- /api/historical_comparison summary mode only needs to know which
+-- (date, hour) forecasts exist, but it paged through up to 60K ML and
+-- Programado rows to find out. forecast_runs keeps one row per
+-- (source, forecast_datetime) with the number of horizons, so the
+-- summary reads ~24 rows per day and source instead.
+--
+-- Maintained by the writers (store_ml_predictions.py,
+-- store_cmg_programado.py), which call refresh_forecast_runs() with the
+-- forecast_datetimes they just wrote; counts are taken from the base
+-- tables, so partial or repeated writes stay exact.
+--
+-- Usage (via PostgREST):
+--   POST /rest/v1/rpc/refresh_forecast_runs
+--   Body: {"p_source": "ml", "p_forecast_datetimes": ["2025-11-20T10:00:00+00:00"]}
+-- ============================================================
+
+-- ============================================================
+-- STEP 1: forecast_runs table
+-- ============================================================
+CREATE TABLE IF NOT EXISTS forecast_runs (
+    source TEXT NOT NULL CHECK (source IN ('ml', 'prog')),
+    forecast_datetime TIMESTAMPTZ NOT NULL,
+    forecast_date DATE NOT NULL,            -- Santiago timezone
+    forecast_hour INTEGER NOT NULL,
+    horizon_count INTEGER NOT NULL,         -- Distinct target hours in the run
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (source, forecast_datetime)
+);
+
+COMMENT ON TABLE forecast_runs IS 'One row per ML / CMG Programado forecast run, with its horizon count';
+
+CREATE INDEX IF NOT EXISTS idx_forecast_runs_date ON forecast_runs(forecast_date, forecast_hour);
+
+ALTER TABLE forecast_runs ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Allow anonymous read access to forecast_runs" ON forecast_runs;
+CREATE POLICY "Allow anonymous read access to forecast_runs"
+    ON forecast_runs FOR SELECT
+    USING (true);
+
+DROP POLICY IF EXISTS "Allow service role write access to forecast_runs" ON forecast_runs;
+CREATE POLICY "Allow service role write access to forecast_runs"
+    ON forecast_runs FOR ALL
+    USING (auth.role() = 'service_role');
+
+-- ============================================================
+-- STEP 2: refresh_forecast_runs
+-- ============================================================
+DROP FUNCTION IF EXISTS refresh_forecast_runs(TEXT, TIMESTAMPTZ[]);
+
+CREATE OR REPLACE FUNCTION refresh_forecast_runs(
+    p_source TEXT,
+    p_forecast_datetimes TIMESTAMPTZ[]
+)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    refreshed INTEGER;
+BEGIN
+    IF p_source = 'ml' THEN
+        INSERT INTO forecast_runs (source, forecast_datetime, forecast_date, forecast_hour, horizon_count)
+        SELECT
+            'ml',
+            forecast_datetime,
+            DATE(forecast_datetime AT TIME ZONE 'America/Santiago'),
+            EXTRACT(HOUR FROM forecast_datetime AT TIME ZONE 'America/Santiago')::INTEGER,
+            COUNT(DISTINCT target_datetime)::INTEGER
+        FROM ml_predictions
+        WHERE forecast_datetime = ANY(p_forecast_datetimes)
+        GROUP BY forecast_datetime
+        ON CONFLICT (source, forecast_datetime) DO UPDATE
+            SET horizon_count = EXCLUDED.horizon_count, updated_at = NOW();
+    ELSIF p_source = 'prog' THEN
+        INSERT INTO forecast_runs (source, forecast_datetime, forecast_date, forecast_hour, horizon_count)
+        SELECT
+            'prog',
+            forecast_datetime,
+            DATE(forecast_datetime AT TIME ZONE 'America/Santiago'),
+            EXTRACT(HOUR FROM forecast_datetime AT TIME ZONE 'America/Santiago')::INTEGER,
+            COUNT(DISTINCT target_datetime)::INTEGER
+        FROM cmg_programado
+        WHERE forecast_datetime = ANY(p_forecast_datetimes)
+        GROUP BY forecast_datetime
+        ON CONFLICT (source, forecast_datetime) DO UPDATE
+            SET horizon_count = EXCLUDED.horizon_count, updated_at = NOW();
+    ELSE
+        RAISE EXCEPTION 'Unknown source: % (expected ml or prog)', p_source;
+    END IF;
+
+    GET DIAGNOSTICS refreshed = ROW_COUNT;
+    RETURN refreshed;
+END;
+$$;
+
+COMMENT ON FUNCTION refresh_forecast_runs(TEXT, TIMESTAMPTZ[]) IS
+'Recount the horizons of the given forecast runs from ml_predictions (p_source = ''ml'')
+or cmg_programado (p_source = ''prog'') and upsert them into forecast_runs.
+Returns the number of runs refreshed.';
+
+GRANT EXECUTE ON FUNCTION refresh_forecast_runs TO service_role;
+
+-- ============================================================
+-- STEP 3: Backfill existing forecasts
+-- ============================================================
+SELECT refresh_forecast_runs('ml', ARRAY(SELECT DISTINCT forecast_datetime FROM ml_predictions));
+SELECT refresh_forecast_runs('prog', ARRAY(SELECT DISTINCT forecast_datetime FROM cmg_programado));
+
+-- ============================================================
+-- STEP 4: Verification
+-- ============================================================
+DO $$
+DECLARE
+    ml_runs INTEGER;
+    prog_runs INTEGER;
+BEGIN
+    SELECT COUNT(*) INTO ml_runs FROM forecast_runs WHERE source = 'ml';
+    SELECT COUNT(*) INTO prog_runs FROM forecast_runs WHERE source = 'prog';
+
+    RAISE NOTICE '✅ MIGRATION 009 COMPLETED: forecast_runs table created';
+    RAISE NOTICE 'ML runs: %', ml_runs;
+    RAISE NOTICE 'CMG Programado runs: %', prog_runs;
+END$$;
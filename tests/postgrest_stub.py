@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+In-process PostgREST stand-in for SupabaseClient tests
+
+Serves GET /rest/v1/<table> from in-memory rows with the subset of
+PostgREST used by the client: eq/gt/gte/lt/lte/in (and not.) filters,
+or=(...)/and(...) logic trees, select, order, limit/offset, Prefer: count=exact and a server-side max-rows cap.
+POST /rest/v1/<table>?on_conflict=... upserts rows; POST /rest/v1/rpc/<function>
+calls a Python stand-in from `functions` (404 when absent, like an undeployed migration).
+DELETE /rest/v1/<table> removes the rows matching its filters.
+Install it as the client's session:
+
+    client = SupabaseClient()
+    client.session = PostgRESTStub({'cmg_online': rows})
+"""
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+
+class StubResponse:
+    def __init__(self, status_code, payload, headers=None):
+        self.status_code = status_code
+        self._payload = payload
+        self.headers = headers or {}
+        self.text = str(payload)
+
+    def json(self):
+        return self._payload
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"HTTP {self.status_code}", response=self)
+
+
+def _parse(value):
+    for cast in (int, float):
+        try:
+            return cast(value)
+        except ValueError:
+            pass
+    return value
+
+
+def _matches(row, column, expression):
+    if expression.startswith('not.'):
+        return not _matches(row, column, expression[4:])
+    op, _, raw = expression.partition('.')
+    if len(raw) > 1 and raw[0] == raw[-1] == '"':
+        raw = raw[1:-1]
+    value = row.get(column)
+    if op == 'in':
+        return str(value) in raw.strip('()').split(',')
+    target = _parse(raw) if not isinstance(value, str) else raw
+    if value is None:
+        return False
+    return {
+        'eq': lambda: value == target,
+        'gt': lambda: value > target,
+        'gte': lambda: value >= target,
+        'lt': lambda: value < target,
+        'lte': lambda: value <= target,
+    }[op]()
+
+
+def _split_top(body):
+    """Split a logic-tree body on commas outside parentheses and quotes"""
+    parts, depth, quoted, current = [], 0, False, ''
+    for char in body:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char in '()':
+            depth += 1 if char == '(' else -1
+        elif not quoted and depth == 0 and char == ',':
+            parts.append(current)
+            current = ''
+            continue
+        current += char
+    return parts + [current]
+
+
+def _matches_tree(row, kind, body):
+    results = []
+    for part in _split_top(body):
+        if part.startswith(('and(', 'or(')):
+            nested_kind, _, nested = part.partition('(')
+            results.append(_matches_tree(row, nested_kind, nested[:-1]))
+        else:
+            column, _, expression = part.partition('.')
+            results.append(_matches(row, column, expression))
+    return any(results) if kind == 'or' else all(results)
+
+
+class PostgRESTStub:
+    def __init__(self, tables, max_rows=1000, functions=None):
+        self.tables = tables
+        self.max_rows = max_rows
+        self.functions = functions or {}
+        self.requests = []
+
+    def post(self, url, json=None, headers=None, timeout=None):
+        parsed = urlparse(url)
+        name = parsed.path.rsplit('/', 1)[-1]
+        if '/rpc/' not in parsed.path:
+            return self._upsert(name, parse_qs(parsed.query).get('on_conflict', [''])[0], json)
+
+        self.requests.append((f'rpc/{name}', json))
+        if name not in self.functions:
+            return StubResponse(404, {'code': 'PGRST202'})
+        try:
+            return StubResponse(200, self.functions[name](**json))
+        except Exception as e:
+            # A failing function surfaces as a PostgREST 500
+            return StubResponse(500, {'message': str(e)})
+
+    def _upsert(self, table, on_conflict, records):
+        self.requests.append((table, records))
+        columns = on_conflict.split(',') if on_conflict else None
+        rows = self.tables.setdefault(table, [])
+        index = {tuple(r[c] for c in columns): i for i, r in enumerate(rows)} if columns else {}
+        for record in records:
+            key = tuple(record[c] for c in columns) if columns else None
+            if key in index:
+                rows[index[key]] = {**rows[index[key]], **record}
+            else:
+                index[key] = len(rows)
+                rows.append(dict(record))
+        return StubResponse(201, [])
+
+    def delete(self, url, params=None, headers=None, timeout=None):
+        table = urlparse(url).path.rsplit('/', 1)[-1]
+        params = list(params.items()) if isinstance(params, dict) else list(params or [])
+        self.requests.append((f'delete/{table}', params))
+        self.tables[table] = [r for r in self.tables.get(table, [])
+                              if not all(_matches(r, key, str(value)) for key, value in params)]
+        return StubResponse(204, [])
+
+    def get(self, url, params=None, headers=None, timeout=None):
+        table = urlparse(url).path.rsplit('/', 1)[-1]
+        params = list(params.items()) if isinstance(params, dict) else list(params or [])
+        self.requests.append((table, params))
+
+        rows = list(self.tables.get(table, []))
+        select, order, limit, offset = '*', None, None, 0
+        for key, value in params:
+            if key == 'select':
+                select = value
+            elif key == 'order':
+                order = value
+            elif key == 'limit':
+                limit = int(value)
+            elif key == 'offset':
+                offset = int(value)
+            elif key in ('or', 'and'):
+                rows = [r for r in rows if _matches_tree(r, key, str(value)[1:-1])]
+            else:
+                rows = [r for r in rows if _matches(r, key, str(value))]
+
+        if order:
+            for term in reversed(order.split(',')):
+                column, _, direction = term.partition('.')
+                rows.sort(key=lambda r: r[column], reverse=direction == 'desc')
+
+        total = len(rows)
+        limit = min(limit or self.max_rows, self.max_rows)
+        rows = rows[offset:offset + limit]
+        if select != '*':
+            columns = select.split(',')
+            rows = [{c: r[c] for c in columns} for r in rows]
+
+        response_headers = {}
+        if 'count=exact' in (headers or {}).get('Prefer', ''):
+            span = f"{offset}-{offset + len(rows) - 1}" if rows else '*'
+            response_headers['Content-Range'] = f"{span}/{total}"
+        return StubResponse(200, rows, response_headers)
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""predict_batch matches the per-horizon, one-row-at-a-time forecast loop"""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+import xgboost as xgb
+from scipy.special import logit
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'scripts' / 'production'))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from ml_batch_inference import build_stage2_features, predict_batch
+from ml_model_bundle import ModelBundle
+from test_incremental_features import make_cmg_series, make_engineer
+
+
+@pytest.fixture(scope='module')
+def bundle():
+    return ModelBundle.load()
+
+
+@pytest.fixture(scope='module')
+def base_features(bundle):
+    df = make_engineer().create_features(make_cmg_series(hours=600))
+    return df[bundle.stage1_feature_names]
+
+
+def reference_forecast(bundle, X_base_row, base_datetime):
+    """The loop ml_hourly_forecast.generate_forecast ran before batching (one base row)"""
+    X_base_ordered = X_base_row[bundle.stage1_feature_names]
+    meta_features = pd.DataFrame(index=X_base_row.index)
+    for h in bundle.horizons:
+        lgb_pred = bundle.zero_detection[h]['lgb'].predict(X_base_ordered)[0]
+        xgb_pred = bundle.zero_detection[h]['xgb'].predict(xgb.DMatrix(X_base_ordered))[0]
+        meta_features[f'zero_risk_lgb_t+{h}'] = lgb_pred
+        meta_features[f'zero_risk_xgb_t+{h}'] = xgb_pred
+        meta_features[f'zero_risk_avg_t+{h}'] = (lgb_pred + xgb_pred) / 2
+
+    X_full = pd.concat([X_base_row, meta_features], axis=1)
+    X_full = X_full.replace([np.inf, -np.inf], np.nan).fillna(0).clip(-1e6, 1e6)
+    X_stage2 = X_full[bundle.stage2_feature_names]
+    X_stage1 = X_full[bundle.stage1_feature_names]
+
+    rows = []
+    for h in range(1, 25):
+        target_time = base_datetime + pd.Timedelta(hours=h)
+        lgb_zero = bundle.zero_detection[h]['lgb'].predict(X_stage1)[0]
+        xgb_zero = bundle.zero_detection[h]['xgb'].predict(xgb.DMatrix(X_stage1))[0]
+        zero_prob_raw = (lgb_zero + xgb_zero) / 2
+
+        zero_prob = bundle.meta_calibrator.predict_proba(pd.DataFrame([{
+            'logit_p': logit(np.clip(zero_prob_raw, 1e-6, 1 - 1e-6)),
+            'hour_sin': np.sin(2 * np.pi * target_time.hour / 24),
+            'hour_cos': np.cos(2 * np.pi * target_time.hour / 24),
+            'month_sin': np.sin(2 * np.pi * target_time.month / 12),
+            'month_cos': np.cos(2 * np.pi * target_time.month / 12),
+            'zeros_24h': X_stage1['zeros_count_24h'].values[0],
+            'zeros_168h': X_stage1['zeros_count_168h'].values[0],
+            'horizon': h
+        }]))[:, 1][0]
+
+        models = bundle.value_prediction[h]
+        value_median = (models['lgb_median'].predict(X_stage2)[0] +
+                        models['xgb'].predict(xgb.DMatrix(X_stage2))[0]) / 2
+        threshold = bundle.threshold_for(h, target_time.hour)
+        rows.append({
+            'zero_prob_raw': zero_prob_raw,
+            'zero_prob': zero_prob,
+            'threshold': threshold,
+            'value_median': value_median,
+            'value_q10': models['lgb_q10'].predict(X_stage2)[0],
+            'value_q90': models['lgb_q90'].predict(X_stage2)[0],
+            'predicted': 0 if zero_prob > threshold else max(0, value_median)
+        })
+    return pd.DataFrame(rows)
+
+
+@pytest.mark.parametrize('n_rows', [1, 5])
+def test_batch_matches_per_horizon_loop(bundle, base_features, n_rows):
+    # Spread the base hours out so they cover different hours and zero runs
+    X_base = base_features.iloc[-24 * n_rows::24]
+    X_stage2, X_stage1 = build_stage2_features(bundle, X_base)
+    batch = predict_batch(bundle, X_stage2, X_stage1, X_base.index)
+
+    assert batch['predicted'].shape == (n_rows, 24)
+    for row, base_datetime in enumerate(X_base.index):
+        expected = reference_forecast(bundle, X_base.loc[[base_datetime]], base_datetime)
+        for column in expected.columns:
+            np.testing.assert_allclose(batch[column][row], expected[column].to_numpy(),
+                                       rtol=1e-9, atol=1e-9, err_msg=f"{base_datetime} {column}")
+        assert list(batch['target_datetimes'][row]) == list(
+            (base_datetime + pd.to_timedelta(np.arange(1, 25), unit='h')).to_numpy())
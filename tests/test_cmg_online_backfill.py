@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""CMG Online backfill: concurrent dates, journaled units, resume after a failure"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'scripts' / 'production'))
+
+from cmg_online_backfill import BackfillJournal, date_range, run_backfill
+
+NODES = ['NVA_P.MONTT___220', 'PIDPID________110']
+
+
+def fake_fetch(day, nodes):
+    hours = range(20) if day.endswith('-03') else range(24)
+    return [{'date': day, 'hour': h, 'node': node} for node in nodes for h in hours]
+
+
+def test_resumes_from_journal_after_failed_write(tmp_path):
+    days = date_range('2025-09-01', '2025-09-04')
+    journal_path = tmp_path / 'journal.jsonl'
+    fetched, written = [], []
+
+    def fetch_day(day, nodes):
+        fetched.append((day, tuple(nodes)))
+        return fake_fetch(day, nodes)
+
+    def failing_write(day, records):
+        if day == '2025-09-02':
+            raise RuntimeError('upsert failed')
+        written.append(day)
+
+    summary = run_backfill(days, NODES, fetch_day, failing_write, BackfillJournal(journal_path))
+    assert summary['failed_dates'] == ['2025-09-02'] and summary['units_done'] == 6
+    assert summary['incomplete_units'] == [f'2025-09-03 {n} (20/24h)' for n in NODES]
+
+    # Rerun: only the failed date is fetched again
+    fetched.clear()
+    with open(journal_path, 'a') as f:
+        f.write('{"date": "2025-09-0')  # Torn line from a crash mid-write
+    summary = run_backfill(days, NODES, fetch_day, lambda d, r: written.append(d),
+                           BackfillJournal(journal_path))
+    assert fetched == [('2025-09-02', tuple(NODES))]
+    assert summary['units_skipped'] == 6 and not summary['failed_dates']
+
+    # --redo-incomplete retries the units that had missing hours
+    fetched.clear()
+    run_backfill(days, NODES, fetch_day, lambda d, r: None, BackfillJournal(journal_path),
+                 redo_incomplete=True)
+    assert fetched == [('2025-09-03', tuple(NODES))]
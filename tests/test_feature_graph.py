@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""Column subsets from the feature graph match a full create_features run"""
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'scripts' / 'production'))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from test_incremental_features import make_cmg_series, make_engineer
+
+
+def test_subset_matches_full_run():
+    df = make_cmg_series()
+    full = make_engineer().create_features(df)
+
+    columns = ['cmg_cv_24h', 'zeros_ratio_168h', 'cmg_diff_vs_last_week', 'hour_sin', 'cmg_value_t+6']
+    engineer = make_engineer()
+    subset = engineer.create_features(df, columns=columns)
+
+    assert list(subset.columns) == list(df.columns) + columns
+    assert engineer.get_feature_names() == columns[:-1]
+    pd.testing.assert_frame_equal(subset[columns], full[columns])
+
+
+def test_unknown_column_raises():
+    with pytest.raises(ValueError):
+        make_engineer().create_features(make_cmg_series(), columns=['cmg_lag_999h'])
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""FeatureStore: cache hits and tail updates match a fresh create_features run"""
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'scripts' / 'production'))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from ml_feature_store import FeatureStore
+from test_incremental_features import make_cmg_series, make_engineer
+
+
+def test_hit_returns_cached_matrix(tmp_path):
+    df = make_cmg_series(hours=600)
+    store = FeatureStore(tmp_path)
+
+    builder = make_engineer()
+    first = store.get_or_create(builder, df)
+    engineer = make_engineer()
+    second = store.get_or_create(engineer, df)
+
+    pd.testing.assert_frame_equal(first, second)
+    # Feature names are restored without running create_features()
+    assert engineer.get_feature_names() == builder.get_feature_names()
+
+
+def test_tail_update_matches_full_rebuild(tmp_path):
+    df = make_cmg_series(hours=900)
+    store = FeatureStore(tmp_path / 'incremental')
+    store.get_or_create(make_engineer(), df.iloc[:700])
+    store.get_or_create(make_engineer(), df.iloc[:800])
+    appended = store.get_or_create(make_engineer(), df)
+
+    rebuilt = FeatureStore(tmp_path / 'full').get_or_create(make_engineer(), df)
+    pd.testing.assert_frame_equal(appended, rebuilt)
+
+
+def test_changed_history_is_recomputed(tmp_path):
+    df = make_cmg_series(hours=600)
+    store = FeatureStore(tmp_path)
+    store.get_or_create(make_engineer(), df)
+
+    revised = df.copy()
+    revised.iloc[10, 0] = 999.0
+    cached = store.get_or_create(make_engineer(), revised)
+
+    assert cached['cmg_lag_1h'].iloc[11] == 999.0
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""Forecast error rollup: errors per forecast value, idempotent upserts"""
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+import pytz
+import requests
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent.parent / 'scripts' / 'production'))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from forecast_error_rollup import ML_NODE, rebuild_forecast_errors, rollup_new_actuals
+from lib.utils.supabase_client import SupabaseClient
+from postgrest_stub import PostgRESTStub, StubResponse
+
+BASE = datetime(2025, 3, 1, 3, tzinfo=pytz.utc)  # 2025-03-01 00:00 in Santiago
+NODES = ['NVA_P.MONTT___220', 'PIDPID________110']
+
+
+def iso(dt):
+    return dt.isoformat()
+
+
+def make_tables():
+    online, ml, prog = [], [], []
+    for i in range(48):
+        ts = BASE + timedelta(hours=i)
+        for n, node in enumerate(NODES):
+            online.append({'id': len(online) + 1, 'datetime': iso(ts), 'node': node, 'cmg_usd': 10.0 + 2 * n})
+    for f in range(-24, 24):
+        made = BASE + timedelta(hours=f)
+        for h in range(1, 25):
+            ml.append({'id': len(ml) + 1, 'forecast_datetime': iso(made),
+                       'target_datetime': iso(made + timedelta(hours=h)), 'horizon': h, 'cmg_predicted': 14.0})
+        for h in range(0, 48, 6):
+            for node in NODES:
+                prog.append({'id': len(prog) + 1, 'forecast_datetime': iso(made),
+                             'target_datetime': iso(made + timedelta(hours=h)), 'node': node, 'cmg_usd': 8.0})
+    return {'cmg_online': online, 'ml_predictions': ml, 'cmg_programado_santiago': prog}
+
+
+class FailingReads(PostgRESTStub):
+    """Answers reads of one table with a 503 once `after` reads have succeeded"""
+
+    def __init__(self, tables, table, after=0):
+        super().__init__(tables, max_rows=500)
+        self.table, self.remaining = table, after
+
+    def get(self, url, params=None, headers=None, timeout=None):
+        if url.endswith('/' + self.table):
+            if self.remaining == 0:
+                return StubResponse(503, {'message': 'unavailable'})
+            self.remaining -= 1
+        return super().get(url, params, headers, timeout)
+
+
+def make_client(monkeypatch, stub):
+    monkeypatch.setenv('SUPABASE_URL', 'http://stub')
+    monkeypatch.setenv('SUPABASE_SERVICE_KEY', 'key')
+    client = SupabaseClient()
+    client.session = stub
+    return client
+
+
+def test_rollup_upserts_errors_for_actual_days(monkeypatch):
+    client = make_client(monkeypatch, PostgRESTStub(make_tables()))
+
+    count = rollup_new_actuals(client, ['2025-03-01'])
+    assert rollup_new_actuals(client, ['2025-03-01']) == count  # re-running is idempotent
+
+    errors = client.session.tables['forecast_errors']
+    assert len(errors) == count
+    assert {e['target_date'] for e in errors} == {'2025-03-01'}
+
+    ml = [e for e in errors if e['source'] == 'ml']
+    prog = [e for e in errors if e['source'] == 'prog']
+    assert all(e['node'] == ML_NODE and e['actual'] == 11.0 and e['error'] == 3.0 for e in ml)
+    # 24 forecasts (horizons 1-24) target each of the day's 24 hours
+    assert len(ml) == 24 * 24
+    # Programado: horizons 6-24 only (0 and > 24 are dropped), per node
+    assert {e['horizon'] for e in prog} == {6, 12, 18, 24}
+    assert {e['node'] for e in prog} == set(NODES)
+    assert all(e['error'] == -3.0 for e in prog)
+
+
+def test_failed_read_upserts_nothing(monkeypatch):
+    # The second page of ml_predictions fails
+    client = make_client(monkeypatch, FailingReads(make_tables(), 'ml_predictions', after=1))
+
+    with pytest.raises(requests.HTTPError):
+        rollup_new_actuals(client, ['2025-03-01'])
+    assert 'forecast_errors' not in client.session.tables
+
+
+def test_rebuild_keeps_existing_rows_until_it_succeeds(monkeypatch):
+    stale = {'forecast_datetime': '2024-01-01T00:00:00+00:00', 'horizon': 1, 'source': 'ml', 'node': ML_NODE,
+             'updated_at': '2024-01-02T00:00:00+00:00'}
+    tables = {**make_tables(), 'forecast_errors': [stale]}
+    client = make_client(monkeypatch, FailingReads(tables, 'cmg_programado_santiago', after=0))
+    end = BASE + timedelta(hours=47)
+
+    with pytest.raises(requests.HTTPError):
+        rebuild_forecast_errors(client, end)
+    assert client.session.tables['forecast_errors'] == [stale]
+    assert not any(name.startswith('delete/') for name, _ in client.session.requests)
+
+    client.session = PostgRESTStub(client.session.tables)
+    total = rebuild_forecast_errors(client, end)
+    assert total > 0 and stale not in client.session.tables['forecast_errors']
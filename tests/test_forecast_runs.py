@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""forecast_runs index: the store scripts refresh it, historical_comparison's summary reads it"""
+import io
+import json
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytz
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent.parent / 'api'))
+sys.path.insert(0, str(Path(__file__).parent.parent / 'scripts' / 'production'))
+sys.path.insert(0, str(Path(__file__).parent))
+
+import historical_comparison
+import store_cmg_programado
+import store_ml_predictions
+from lib.utils.supabase_client import SupabaseClient
+from postgrest_stub import PostgRESTStub, StubResponse
+
+SANTIAGO = pytz.timezone('America/Santiago')
+
+
+class NoForecastRuns(PostgRESTStub):
+    """A database without migration 009: forecast_runs answers 404"""
+
+    def get(self, url, params=None, headers=None, timeout=None):
+        if url.endswith('/forecast_runs'):
+            return StubResponse(404, {'code': '42P01'})
+        return super().get(url, params, headers, timeout)
+
+
+def make_client(monkeypatch, stub):
+    monkeypatch.setenv('SUPABASE_URL', 'http://stub')
+    monkeypatch.setenv('SUPABASE_SERVICE_KEY', 'key')
+    client = SupabaseClient()
+    client.session = stub
+    return client
+
+
+def get_summary(monkeypatch, client):
+    monkeypatch.setattr(historical_comparison, 'get_supabase_client', lambda: client)
+    request = historical_comparison.handler.__new__(historical_comparison.handler)
+    request.path, request.wfile = '/api/historical_comparison', io.BytesIO()
+    request.send_response = request.send_header = lambda *args: None
+    request.end_headers = lambda: None
+    request.do_GET()
+    return json.loads(request.wfile.getvalue())
+
+
+def expected_hours(day):
+    return [{'date': day, 'hour': 6, 'has_ml': False, 'has_programado': True},
+            {'date': day, 'hour': 5, 'has_ml': True, 'has_programado': True}]
+
+
+def test_summary_reads_forecast_runs(monkeypatch):
+    day = str(datetime.now(SANTIAGO).date() - timedelta(days=1))
+    runs = [{'source': 'ml', 'forecast_date': day, 'forecast_hour': 5, 'horizon_count': 24},
+            {'source': 'prog', 'forecast_date': day, 'forecast_hour': 5, 'horizon_count': 24},
+            {'source': 'prog', 'forecast_date': day, 'forecast_hour': 6, 'horizon_count': 24}]
+    client = make_client(monkeypatch, PostgRESTStub({'forecast_runs': runs}))
+
+    summary = get_summary(monkeypatch, client)
+
+    assert summary['metadata']['source'] == 'forecast_runs'
+    assert summary['data']['available_hours'] == expected_hours(day)
+    assert [table for table, _ in client.session.requests] == ['forecast_runs']
+
+
+def test_summary_scans_views_without_forecast_runs(monkeypatch):
+    day = str(datetime.now(SANTIAGO).date() - timedelta(days=1))
+    ml = [{'id': h, 'forecast_date': day, 'forecast_hour': 5, 'horizon': h} for h in range(1, 25)]
+    prog = [{'id': i + 1, 'forecast_date': day, 'forecast_hour': 5 + i // 24} for i in range(48)]
+    client = make_client(monkeypatch, NoForecastRuns(
+        {'ml_predictions_santiago': ml, 'cmg_programado_santiago': prog}, max_rows=10))
+
+    summary = get_summary(monkeypatch, client)
+
+    assert summary['metadata']['source'] == 'scan'
+    assert summary['data']['available_hours'] == expected_hours(day)
+
+
+def store_with_stub(monkeypatch, tmp_path, module, client):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(module, 'SUPABASE_AVAILABLE', True)
+    monkeypatch.setattr(module, 'SupabaseClient', lambda: client)
+    monkeypatch.setattr(module, 'fetch_existing_gist', lambda: None)
+    monkeypatch.setattr(module, 'update_gist', lambda data: True)
+    module.main()
+
+
+def recording_refresh(calls):
+    def refresh_forecast_runs(p_source, p_forecast_datetimes):
+        calls.append((p_source, p_forecast_datetimes))
+        return len(p_forecast_datetimes)
+    return {'refresh_forecast_runs': refresh_forecast_runs}
+
+
+def test_store_ml_predictions_refreshes_forecast_runs(monkeypatch, tmp_path):
+    base = SANTIAGO.localize(datetime(2025, 3, 1, 5))
+    latest = tmp_path / 'data' / 'ml_predictions' / 'latest.json'
+    latest.parent.mkdir(parents=True)
+    latest.write_text(json.dumps({
+        'base_datetime': base.isoformat(), 'generated_at': base.isoformat(), 'model_version': 'test',
+        'forecasts': [{'horizon': h, 'target_datetime': (base + timedelta(hours=h)).isoformat(),
+                       'predicted_cmg': 50.0, 'zero_probability': 0.1, 'decision_threshold': 0.5}
+                      for h in range(1, 25)]}))
+    calls = []
+    client = make_client(monkeypatch, PostgRESTStub({}, functions=recording_refresh(calls)))
+
+    store_with_stub(monkeypatch, tmp_path, store_ml_predictions, client)
+
+    assert len(client.session.tables['ml_predictions']) == 24
+    assert calls == [('ml', [base.isoformat()])]
+
+
+def test_store_cmg_programado_refreshes_forecast_runs(monkeypatch, tmp_path):
+    fetched = datetime.now(SANTIAGO).replace(minute=0, second=0, microsecond=0)
+    latest = tmp_path / 'data' / 'cache' / 'cmg_programmed_latest.json'
+    latest.parent.mkdir(parents=True)
+    latest.write_text(json.dumps({
+        'timestamp': fetched.isoformat(),
+        'data': [{'node': 'PMontt220', 'cmg_programmed': 60.0,
+                  'datetime': (fetched + timedelta(hours=h)).strftime('%Y-%m-%d %H:%M:%S')}
+                 for h in range(1, 25)]}))
+    calls = []
+    client = make_client(monkeypatch, PostgRESTStub(
+        {'nodes': [{'id': 1, 'code': 'NVA_P.MONTT___220'}]}, functions=recording_refresh(calls)))
+
+    store_with_stub(monkeypatch, tmp_path, store_cmg_programado, client)
+
+    assert len(client.session.tables['cmg_programado']) == 24
+    assert calls == [('prog', [fetched.isoformat()])]
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Daily heatmaps: NumPy matrices, materialized once a day can no longer be refetched"""
+import sys
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import pytz
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent.parent / 'scripts' / 'production'))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from heatmap_materializer import materialize_pending
+from lib.utils.performance_metrics import heatmap_payload, load_day_heatmaps, unpack_day_heatmaps
+from lib.utils.supabase_client import SupabaseClient
+from postgrest_stub import PostgRESTStub
+
+SANTIAGO = pytz.timezone('America/Santiago')
+DAY = date(2025, 3, 1)
+
+
+def local(dt):
+    return {'date': dt.strftime('%Y-%m-%d'), 'hour': dt.hour}
+
+
+def make_tables(actual_hours):
+    """Actual = 10, ML forecasts 10 + horizon, Programado 9 for two nodes"""
+    online, ml, prog = [], [], []
+    start = SANTIAGO.localize(datetime.combine(DAY, datetime.min.time()))
+    for i in range(actual_hours):
+        ts = start + timedelta(hours=i)
+        online.append({'id': i + 1, **local(ts), 'cmg_usd': 10.0})
+    for f in range(24):
+        made = start + timedelta(hours=f)
+        for h in range(1, 25):
+            target = made + timedelta(hours=h)
+            ml.append({'id': len(ml) + 1, 'forecast_date': '2025-03-01', 'forecast_hour': f, 'horizon': h,
+                       'target_date': local(target)['date'], 'target_hour': target.hour,
+                       'cmg_predicted': 10.0 + h})
+        for h in range(0, 30):
+            target = made + timedelta(hours=h)
+            for node in ('A', 'B'):
+                prog.append({'id': len(prog) + 1, 'forecast_date': '2025-03-01', 'forecast_hour': f,
+                             'forecast_datetime': made.isoformat(), 'target_datetime': target.isoformat(),
+                             'target_date': local(target)['date'], 'target_hour': target.hour,
+                             'node': node, 'cmg_usd': 9.0})
+    return {'cmg_online_santiago': online, 'ml_predictions_santiago': ml, 'cmg_programado_santiago': prog}
+
+
+def make_client(monkeypatch, tables):
+    monkeypatch.setenv('SUPABASE_URL', 'http://stub')
+    monkeypatch.setenv('SUPABASE_SERVICE_KEY', 'key')
+    client = SupabaseClient()
+    client.session = PostgRESTStub(tables)
+    return client
+
+
+def test_day_heatmaps_match_exact_targets(monkeypatch):
+    client = make_client(monkeypatch, make_tables(actual_hours=48))
+
+    heatmaps = load_day_heatmaps(client, '2025-03-01')
+    ml = heatmap_payload(heatmaps['ml'], heatmaps['actual_hours'])
+    prog = heatmap_payload(heatmaps['prog'], heatmaps['actual_hours'])
+
+    assert ml['matrix'][5][0] == 1.0 and ml['matrix'][23][23] == 24.0
+    assert ml['error_count'] == ml['forecast_count'] == 576
+    assert prog['forecast_count'] == 2 * 24 * 24  # horizons 1-24 of 0-29, both nodes
+    assert prog['average_distance'] == 1.0 and prog['matrix'][0][0] == -1.0
+    assert ml['actuals_available'] == 24
+
+
+def test_materialize_only_days_outside_the_refetch_window(monkeypatch):
+    # The next day is still refetched: all 48 hours present, but they may be revised
+    client = make_client(monkeypatch, make_tables(actual_hours=48))
+    assert materialize_pending(client, days=3, today=DAY + timedelta(days=3)) == []
+    assert not any(table == 'cmg_online_santiago' for table, _ in client.session.requests)
+
+    assert materialize_pending(client, days=4, today=DAY + timedelta(days=4)) == ['2025-03-01']
+    stored = unpack_day_heatmaps(client.session.tables['daily_heatmaps'])
+    assert stored == {key: value for key, value in load_day_heatmaps(client, '2025-03-01').items()
+                      if key != 'next_day_actual_hours'}
+
+    # Once settled, missing hours are final too
+    client = make_client(monkeypatch, make_tables(actual_hours=30))
+    assert materialize_pending(client, days=4, today=DAY + timedelta(days=4)) == ['2025-03-01']
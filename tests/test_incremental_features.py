@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""Parity test: IncrementalFeatureState vs CleanCMGFeatureEngineering.create_features"""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'scripts' / 'production'))
+
+from ml_feature_engineering import CleanCMGFeatureEngineering, IncrementalFeatureState
+
+
+def make_cmg_series(hours=900, seed=42):
+    """Synthetic CMG with zero runs, flat runs, spikes, a negative and missing values"""
+    rng = np.random.default_rng(seed)
+    values = rng.gamma(2.0, 40.0, hours)
+    values[rng.random(hours) < 0.25] = 0.0          # zero hours
+    values[300:330] = 55.5                         # constant run
+    values[400] = 1e7                              # spike -> unstable variance path
+    values[401:420] = 0.0
+    values[500] = -3.2                             # negative price
+    values[rng.random(hours) < 0.02] = np.nan      # missing values
+    index = pd.date_range('2025-03-01', periods=hours, freq='h')
+    return pd.DataFrame({'CMG [$/MWh]': values}, index=index)
+
+
+def make_engineer():
+    return CleanCMGFeatureEngineering(
+        target_horizons=list(range(1, 25)),
+        rolling_windows=[6, 12, 24, 48, 168],
+        lag_hours=[1, 2, 3, 6, 12, 24, 48, 168]
+    )
+
+
+def assert_bitwise_equal(expected, actual, column):
+    expected = np.asarray(expected, dtype=float)
+    actual = np.asarray(actual, dtype=float)
+    same = (expected.view(np.int64) == actual.view(np.int64)) | (np.isnan(expected) & np.isnan(actual))
+    assert same.all(), f"{column}: first mismatch at row {np.argmax(~same)}"
+
+
+def test_streaming_rows_match_batch():
+    df = make_cmg_series()
+    engineer = make_engineer()
+    batch = engineer.create_features(df)
+
+    state = IncrementalFeatureState(engineer)
+    rows = [state.update(ts, v) for ts, v in zip(df.index, df['CMG [$/MWh]'])]
+    streamed = pd.concat(rows)
+
+    assert state.feature_names == engineer.get_feature_names()
+
+    # Batch bfill() fills a missing 168h lag from later rows; streaming only knows the past
+    has_lag_168 = df['CMG [$/MWh]'].shift(168).notna()
+
+    for column in state.feature_names:
+        rows = has_lag_168 if column == 'cmg_7d_median_same_hour' else slice(None)
+        assert_bitwise_equal(batch[column][rows], streamed[column][rows], column)
+
+
+def test_saved_state_matches_batch_last_row(tmp_path):
+    df = make_cmg_series()
+    engineer = make_engineer()
+
+    state = IncrementalFeatureState.from_history(df.iloc[:-1], engineer=engineer)
+    state.save(tmp_path / 'state.pkl')
+
+    restored = IncrementalFeatureState.load(tmp_path / 'state.pkl')
+    row = restored.update(df.index[-1], df['CMG [$/MWh]'].iloc[-1])
+
+    expected = engineer.create_features(df)[restored.feature_names].iloc[[-1]]
+    assert row.index.equals(expected.index)
+    for column in restored.feature_names:
+        assert_bitwise_equal(expected[column], row[column], column)
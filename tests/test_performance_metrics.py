@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Range performance aggregation: RPC-shaped rows and the formatted payload"""
+import sys
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import pytz
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from lib.utils.performance_metrics import aggregate_range_errors, build_range_metrics
+from lib.utils.supabase_client import SupabaseClient
+from postgrest_stub import PostgRESTStub
+
+SANTIAGO = pytz.timezone('America/Santiago')
+START = SANTIAGO.localize(datetime(2025, 3, 1))
+
+
+def view_times(prefix, dt):
+    local = dt.astimezone(SANTIAGO)
+    return {f'{prefix}_datetime': dt.astimezone(pytz.utc).isoformat(),
+            f'{prefix}_date': local.strftime('%Y-%m-%d'), f'{prefix}_hour': local.hour}
+
+
+def make_rows():
+    """Actual = hour of day, ML is always +2, Programado +1 on forecasts 1-30h ahead"""
+    online = []
+    for i in range(48):
+        ts = START + timedelta(hours=i)
+        for node_offset in (-1, 1):  # two nodes averaging to the hour
+            online.append({'date': ts.strftime('%Y-%m-%d'), 'hour': ts.hour, 'cmg_usd': ts.hour + node_offset})
+
+    ml, prog = [], []
+    for f in range(-24, 48):
+        made = START + timedelta(hours=f)
+        for h in range(1, 25):
+            target = made + timedelta(hours=h)
+            ml.append({**view_times('forecast', made), **view_times('target', target),
+                       'horizon': h, 'cmg_predicted': target.astimezone(SANTIAGO).hour + 2})
+        for h in range(-2, 31, 3):
+            target = made + timedelta(hours=h)
+            prog.append({**view_times('forecast', made), **view_times('target', target),
+                         'cmg_usd': target.astimezone(SANTIAGO).hour + 1})
+    return ml, prog, online
+
+
+def test_range_metrics_from_raw_rows():
+    ml, prog, online = make_rows()
+    start, end = date(2025, 3, 1), date(2025, 3, 2)
+
+    metrics = build_range_metrics(aggregate_range_errors(ml, prog, online, start, end), start, end)
+
+    for day in metrics['metrics_by_day']:
+        assert day['ml_avg_distance'] == 2.0 and day['ml_count'] == 24 * 24
+        assert day['prog_avg_distance'] == 1.0
+    # Programado horizons 1, 4, ..., 22 only (first 24 hours, future targets)
+    assert [h['horizon'] for h in metrics['metrics_by_horizon']['prog']] == list(range(1, 25, 3))
+    assert len(metrics['metrics_by_horizon']['ml']) == 24
+    assert metrics['summary']['structural']['ml']['degradation_rate'] == 0.0
+    assert metrics['data_coverage']['actuals_hours'] == 48
+    assert metrics['data_coverage']['prog_raw'] == 72 * 11
+
+
+def test_rpc_missing_or_failing_function_returns_none(monkeypatch):
+    monkeypatch.setenv('SUPABASE_URL', 'http://stub')
+    monkeypatch.setenv('SUPABASE_SERVICE_KEY', 'key')
+    client = SupabaseClient()
+    rows = [{'dimension': 'coverage', 'source': 'ml', 'bucket_date': None,
+             'horizon': None, 'distance_sum': None, 'error_count': 5}]
+
+    client.session = PostgRESTStub({})
+    assert client.get_range_performance('2025-03-01', '2025-03-02') is None
+
+    client.session = PostgRESTStub({}, functions={
+        'range_performance_metrics': lambda p_start_date, p_end_date: rows})
+    assert client.get_range_performance('2025-03-01', '2025-03-02') == rows
+
+    def statement_timeout(p_start_date, p_end_date):
+        raise RuntimeError('canceling statement due to statement timeout')
+
+    client.session = PostgRESTStub({}, functions={'range_performance_metrics': statement_timeout})
+    assert client.get_range_performance('2025-03-01', '2025-03-02') is None
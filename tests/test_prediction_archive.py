@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""PredictionArchive: part-file appends, compaction, range queries and latest-snapshot dedupe"""
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'scripts' / 'production'))
+
+from ml_prediction_archive import PredictionArchive
+
+
+def make_forecast(base, generated_at, offset=0.0):
+    base = pd.Timestamp(base)
+    return {
+        'generated_at': generated_at,
+        'base_datetime': base.strftime('%Y-%m-%d %H:00:00'),
+        'model_version': 'test_v1',
+        'forecasts': [{
+            'horizon': h,
+            'target_datetime': (base + pd.Timedelta(hours=h)).strftime('%Y-%m-%d %H:00:00'),
+            'predicted_cmg': 50.0 + h + offset,
+            'zero_probability': 0.1,
+            'decision_threshold': 0.4,
+            'confidence_interval': {'lower_10th': 10.0, 'median': 50.0 + h, 'upper_90th': 90.0}
+        } for h in range(1, 25)]
+    }
+
+
+def test_append_and_query(tmp_path):
+    archive = PredictionArchive(tmp_path)
+    archive.append_forecast(make_forecast('2026-04-30 23:00', '2026-05-01 03:00:00 UTC'))
+    archive.append_forecast(make_forecast('2026-05-01 00:00', '2026-05-01 04:00:00'))
+    archive.append_forecast(make_forecast('2026-05-01 00:00', '2026-05-01 05:00:00', offset=1.0))
+
+    # One new part per append; nothing is rewritten
+    index = archive.load_index()
+    assert len(index) == 3 and all(file.startswith(('2026-04/part-', '2026-05/part-')) for file in index)
+    assert sum(e['rows'] for file, e in index.items() if file.startswith('2026-05/')) == 48
+
+    may = archive.query(start='2026-05-01', end='2026-05-31')
+    assert len(may) == 48
+    assert (may['forecast_datetime'] == pd.Timestamp('2026-05-01 00:00')).all()
+
+    latest = archive.query(start='2026-05-01', horizons=[1], latest_only=True)
+    assert len(latest) == 1
+    assert latest['predicted'].iloc[0] == 52.0
+
+    assert archive.query(end='2026-04-30 23:00')['generated_at'].iloc[0] == pd.Timestamp('2026-05-01 03:00')
+    assert archive.query(start='2027-01-01').empty
+
+
+def test_compact_merges_closed_months(tmp_path):
+    archive = PredictionArchive(tmp_path)
+    archive.append_forecast(make_forecast('2026-04-30 22:00', '2026-04-30 23:00:00'))
+    archive.append_forecast(make_forecast('2026-04-30 23:00', '2026-05-01 00:00:00'))
+    archive.append_forecast(make_forecast('2026-05-01 00:00', '2026-05-01 01:00:00'))
+    before = archive.query()
+
+    # May is still being appended to: only April is compacted
+    assert archive.compact() == ['2026-04']
+    assert sorted(p.relative_to(tmp_path).as_posix() for p in tmp_path.rglob('*.parquet'))[0] == '2026-04.parquet'
+    assert not (tmp_path / '2026-04').exists()
+    assert archive.load_index()['2026-04.parquet']['forecasts'] == 2
+    pd.testing.assert_frame_equal(archive.query(), before)
+    assert archive.compact() == []
+
+    # A late part for April merges into the compacted file
+    archive.append_forecast(make_forecast('2026-04-30 23:00', '2026-05-01 02:00:00', offset=1.0))
+    assert archive.compact() == ['2026-04']
+    assert archive.load_index()['2026-04.parquet']['rows'] == 72
+    latest = archive.query(end='2026-04-30 23:00', horizons=[1], latest_only=True)
+    assert latest['predicted'].tolist() == [51.0, 52.0]
+    assert archive.rebuild_index() == archive.load_index()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""CMG Programado features are point-in-time: only forecasts published strictly before the base hour"""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'scripts' / 'production'))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from test_incremental_features import make_cmg_series, make_engineer
+
+TARGETS = pd.date_range('2025-03-10 00:00', '2025-03-11 12:00', freq='h')
+
+
+def forecast(published, value, node='PMontt220'):
+    return pd.DataFrame({'forecast_datetime': published, 'target_datetime': TARGETS,
+                         'node': node, 'cmg_usd': value})
+
+
+def make_programado():
+    return pd.concat([
+        # Two nodes publish the same run: averaged to 110
+        forecast(pd.Timestamp('2025-03-09 17:00'), 100.0, 'PMontt220'),
+        forecast(pd.Timestamp('2025-03-09 17:00'), 120.0, 'Chiloe220'),
+        forecast(pd.Timestamp('2025-03-10 05:00'), 200.0),
+        # Published exactly at base hour 06:00: not yet usable at 06:00
+        forecast(pd.Timestamp('2025-03-10 06:00'), 300.0),
+        # Published after every base hour below: would be a look-ahead leak
+        forecast(pd.Timestamp('2025-03-12 00:00'), 9999.0),
+    ], ignore_index=True)
+
+
+def test_uses_newest_forecast_published_before_base_hour():
+    index = pd.date_range('2025-03-09 16:00', '2025-03-11 00:00', freq='h')
+    matrix = make_engineer()._asof_programado_matrix(index, make_programado())
+    prog = pd.DataFrame(matrix, index=index, columns=range(1, 25))
+
+    # Nothing published yet at 16:00 and 17:00
+    assert prog.loc['2025-03-09 16:00'].isna().all()
+    assert prog.loc['2025-03-09 17:00'].isna().all()
+    # 18:00 .. 05:00: the 17:00 run (node average); its targets start at 00:00 on the 10th
+    assert prog.loc['2025-03-09 18:00', 6:].eq(110.0).all() and prog.loc['2025-03-09 18:00', :5].isna().all()
+    assert prog.loc['2025-03-10 05:00'].eq(110.0).all()
+    assert prog.loc['2025-03-10 06:00'].eq(200.0).all()
+    assert prog.loc['2025-03-10 07:00'].eq(300.0).all()
+    # No forecast covers targets after 2025-03-11 12:00
+    assert prog.loc['2025-03-11 00:00', :12].eq(300.0).all() and prog.loc['2025-03-11 00:00', 13:].isna().all()
+    assert not (matrix == 9999.0).any()
+
+
+def test_create_features_has_no_look_ahead():
+    df = make_cmg_series(hours=600)  # 2025-03-01 .. 2025-03-25
+    features = make_engineer().create_features(df, cmg_programado_df=make_programado())
+
+    assert features.loc['2025-03-10 06:00', 'cmg_prog_t+1'] == 200.0
+    assert features.loc['2025-03-10 07:00', 'cmg_prog_t+1'] == 300.0
+    assert np.isnan(features.loc['2025-03-01 00:00', 'cmg_prog_t+1'])
+    assert not features.filter(like='cmg_prog_t+').eq(9999.0).any().any()
+
+
+def test_without_forecast_datetime_uses_last_value_per_target():
+    prog = make_programado().drop(columns='forecast_datetime').iloc[:len(TARGETS) * 3]
+    index = pd.date_range('2025-03-10 00:00', periods=2, freq='h')
+    matrix = make_engineer()._asof_programado_matrix(index, prog)
+
+    assert matrix.shape == (2, 24) and (matrix == 200.0).all()
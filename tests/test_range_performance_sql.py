@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""range_performance_metrics (migrations 006 and 007) agrees with the Python fallback on a real Postgres
+
+Runs the migrations' own SQL (Santiago views from 002, forecast_errors and
+the function from 006/007) in a throwaway server from pgserver, loads the
+same synthetic data, and compares the function's rows with
+aggregate_range_errors() over the view rows /api/performance_range fetches.
+Skipped when pgserver or psycopg2 is not installed.
+"""
+import random
+import re
+import sys
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import pytest
+import pytz
+
+pgserver = pytest.importorskip('pgserver')
+psycopg2 = pytest.importorskip('psycopg2')
+from psycopg2.extras import RealDictCursor
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent.parent / 'scripts' / 'production'))
+
+from forecast_error_rollup import compute_forecast_errors
+from lib.utils.performance_metrics import aggregate_range_errors
+
+MIGRATIONS = Path(__file__).parent.parent / 'supabase' / 'migrations'
+START, END = date(2025, 3, 10), date(2025, 3, 13)
+NODES = ['NVA_P.MONTT___220', 'PIDPID________110']
+
+BASE_TABLES = """
+CREATE TABLE nodes (id SERIAL PRIMARY KEY, code TEXT, name TEXT, region TEXT);
+CREATE TABLE cmg_online (
+    id SERIAL PRIMARY KEY, datetime TIMESTAMPTZ, node_id INTEGER REFERENCES nodes(id),
+    cmg_usd NUMERIC(10, 2), source TEXT, created_at TIMESTAMPTZ, updated_at TIMESTAMPTZ);
+CREATE TABLE ml_predictions (
+    id SERIAL PRIMARY KEY, forecast_datetime TIMESTAMPTZ, target_datetime TIMESTAMPTZ,
+    horizon INTEGER, cmg_predicted NUMERIC(10, 2), prob_zero NUMERIC, threshold NUMERIC,
+    model_version TEXT, created_at TIMESTAMPTZ, updated_at TIMESTAMPTZ);
+CREATE TABLE cmg_programado (
+    id SERIAL PRIMARY KEY, forecast_datetime TIMESTAMPTZ, target_datetime TIMESTAMPTZ,
+    node_id INTEGER REFERENCES nodes(id), cmg_usd NUMERIC(10, 2), source TEXT,
+    created_at TIMESTAMPTZ, updated_at TIMESTAMPTZ);
+"""
+
+
+def migration_sql(name, pattern):
+    text = next(MIGRATIONS.glob(f'{name}_*.sql')).read_text().replace('\r\n', '\n')
+    statements = re.findall(pattern, text, re.DOTALL)
+    assert statements, f"{pattern!r} not found in migration {name}"
+    return '\n'.join(statements)
+
+
+def range_function(name):
+    return migration_sql(name, r'DROP FUNCTION IF EXISTS range_performance_metrics\(DATE, DATE\);.*?\$\$;')
+
+
+@pytest.fixture(scope='module')
+def db(tmp_path_factory):
+    server = pgserver.get_server(tmp_path_factory.mktemp('pg'), cleanup_mode='stop')
+    conn = psycopg2.connect(server.get_uri())
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute("SET TIME ZONE 'UTC'")
+        cur.execute(BASE_TABLES)
+        cur.execute(migration_sql('002', r'CREATE OR REPLACE VIEW \w+_santiago AS.*?;'))
+        cur.execute(migration_sql('007', r'CREATE TABLE IF NOT EXISTS forecast_errors \(.*?\n\);'))
+        load_data(cur)
+    yield conn
+    conn.close()
+    server.cleanup()
+
+
+def load_data(cur):
+    """Four days of hourly actuals (a few missing), hourly ML runs, 6-hourly Programado runs"""
+    rng = random.Random(7)
+    utc = lambda day, hour: datetime(2025, 3, day, tzinfo=pytz.utc) + timedelta(hours=hour)
+    cur.executemany("INSERT INTO nodes (code, name, region) VALUES (%s, %s, 'Los Lagos')",
+                    [(node, node) for node in NODES])
+
+    for i in range(24 * 9):
+        ts = utc(7, i)
+        if rng.random() < 0.05:
+            continue
+        for node_id in (1, 2):
+            cur.execute("INSERT INTO cmg_online (datetime, node_id, cmg_usd) VALUES (%s, %s, %s)",
+                        (ts, node_id, round(rng.uniform(0, 150), 2)))
+
+    for f in range(24 * 8):
+        made = utc(7, f)
+        cur.executemany(
+            "INSERT INTO ml_predictions (forecast_datetime, target_datetime, horizon, cmg_predicted) "
+            "VALUES (%s, %s, %s, %s)",
+            [(made, made + timedelta(hours=h), h, round(rng.uniform(0, 150), 2)) for h in range(1, 25)])
+        if f % 6 == 0:
+            # Past targets and targets beyond 24h are in the raw rows but not scored
+            cur.executemany(
+                "INSERT INTO cmg_programado (forecast_datetime, target_datetime, node_id, cmg_usd) "
+                "VALUES (%s, %s, %s, %s)",
+                [(made, made + timedelta(hours=h), node_id, round(rng.uniform(0, 150), 2))
+                 for h in range(-3, 40) for node_id in (1, 2)])
+
+
+def query(db, sql, params=()):
+    with db.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(sql, params)
+        return [dict(row) for row in cur.fetchall()]
+
+
+def python_fallback(db):
+    """aggregate_range_errors over the view rows performance_range fetches without the RPC"""
+    iso = lambda rows, *cols: [{**r, **{c: r[c].isoformat() for c in cols}} for r in rows]
+    as_float = lambda rows, col: [{**r, col: float(r[col])} for r in rows]
+    window = (START - timedelta(days=1), END)
+    ml = query(db, "SELECT forecast_date, target_date, target_hour, horizon, cmg_predicted "
+                   "FROM ml_predictions_santiago WHERE forecast_date BETWEEN %s AND %s", window)
+    prog = query(db, "SELECT forecast_datetime, target_datetime, forecast_date, target_date, target_hour, cmg_usd "
+                     "FROM cmg_programado_santiago WHERE forecast_date BETWEEN %s AND %s", window)
+    online = query(db, "SELECT date, hour, cmg_usd FROM cmg_online_santiago "
+                       "WHERE date BETWEEN %s AND %s", (START, END))
+    return aggregate_range_errors(as_float(ml, 'cmg_predicted'),
+                                  as_float(iso(prog, 'forecast_datetime', 'target_datetime'), 'cmg_usd'),
+                                  as_float(online, 'cmg_usd'), START, END)
+
+
+def sql_function(db, name):
+    with db.cursor() as cur:
+        cur.execute(range_function(name))
+    return query(db, "SELECT * FROM range_performance_metrics(%s, %s)", (START, END))
+
+
+def keyed(rows):
+    return {(r['dimension'], r['source'], str(r['bucket_date']) if r['bucket_date'] else None, r['horizon']):
+            (round(r['distance_sum'], 6) if r['distance_sum'] is not None else None, r['error_count'])
+            for r in rows}
+
+
+def test_migration_006_matches_python_fallback(db):
+    expected = keyed(python_fallback(db))
+
+    assert keyed(sql_function(db, '006')) == expected
+    assert {k[0] for k in expected} == {'day', 'horizon', 'coverage'}
+
+
+def test_migration_007_over_rollup_matches_python_fallback(db):
+    as_iso = lambda rows: [{**r, **{c: r[c].isoformat() for c in r if isinstance(r[c], datetime)},
+                            **{c: float(r[c]) for c in ('cmg_predicted', 'cmg_usd') if c in r}} for r in rows]
+    records = compute_forecast_errors(
+        as_iso(query(db, "SELECT forecast_datetime, target_datetime, horizon, cmg_predicted FROM ml_predictions")),
+        as_iso(query(db, "SELECT forecast_datetime, target_datetime, node, cmg_usd FROM cmg_programado_santiago")),
+        as_iso(query(db, "SELECT datetime, cmg_usd FROM cmg_online")))
+    columns = ['source', 'node', 'forecast_datetime', 'target_datetime', 'horizon', 'forecast_date',
+               'forecast_hour', 'target_date', 'target_hour', 'predicted', 'actual', 'error']
+    with db.cursor() as cur:
+        cur.execute("TRUNCATE forecast_errors")
+        cur.executemany(f"INSERT INTO forecast_errors ({', '.join(columns)}) "
+                        f"VALUES ({', '.join(['%s'] * len(columns))})",
+                        [tuple(r[c] for c in columns) for r in records])
+
+    assert keyed(sql_function(db, '007')) == keyed(python_fallback(db))
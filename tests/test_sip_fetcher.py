@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""SIPPageFetcher: bounded concurrency, early stop on full coverage, backoff on 429, node prefilter,
+end of data after 3 consecutive empty pages"""
+import json
+import sys
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from lib.utils.sip_fetcher import SIPPageFetcher, TokenBucket, all_nodes_complete, filter_records
+
+NODES = ['NVA_P.MONTT___220', 'PIDPID________110']
+PAGE_SIZE = 10
+
+
+class FakeResponse:
+    def __init__(self, status_code, records=None, headers=None):
+        self.status_code = status_code
+        self._records = records
+        self.headers = headers or {}
+
+    def json(self):
+        return {'data': self._records}
+
+    @property
+    def content(self):
+        return json.dumps({'data': self._records}).encode()
+
+
+class FakeSIP:
+    """24 hours × 2 nodes in 10-record pages (5 pages), plus filler nodes"""
+
+    def __init__(self, rate_limited_pages=(), blank_pages=(), forbidden_pages=()):
+        rows = [{'barra_transf': node, 'hra': h} for h in range(24) for node in NODES]
+        rows += [{'barra_transf': 'OTHER', 'hra': h} for h in range(24)]
+        self.pages = [rows[i:i + PAGE_SIZE] for i in range(0, len(rows), PAGE_SIZE)]
+        self.rate_limited = set(rate_limited_pages)
+        # Answered once with an empty page / a 403 (transient glitches)
+        self.blank = set(blank_pages)
+        self.forbidden = set(forbidden_pages)
+        self.requested = []
+        self.in_flight = self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def get(self, url, params=None, timeout=None):
+        page = params['page']
+        with self.lock:
+            self.requested.append(page)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(0.01)
+            if page in self.rate_limited:
+                self.rate_limited.discard(page)
+                return FakeResponse(429, headers={'Retry-After': '0'})
+            if page in self.blank:
+                self.blank.discard(page)
+                return FakeResponse(200, [])
+            if page in self.forbidden:
+                self.forbidden.discard(page)
+                return FakeResponse(403)
+            return FakeResponse(200, self.pages[page - 1] if page <= len(self.pages) else [])
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+def make_fetcher(sip, max_in_flight=3):
+    bucket = TokenBucket(rate=1000, capacity=1000, max_rate=1000)
+    return SIPPageFetcher('key', session=sip, bucket=bucket, max_in_flight=max_in_flight,
+                          page_size=PAGE_SIZE, sleep=lambda s: None)
+
+
+def collect(fetcher, **kwargs):
+    location_hours = defaultdict(set)
+
+    def on_page(page, records):
+        for r in records:
+            if r['barra_transf'] in NODES:
+                location_hours[r['barra_transf']].add(r['hra'])
+
+    stats = fetcher.fetch_pages('http://sip', {}, on_page,
+                                done=lambda: all_nodes_complete(location_hours, NODES), **kwargs)
+    return stats, location_hours
+
+
+def test_stops_once_every_node_is_complete():
+    sip = FakeSIP()
+    stats, location_hours = collect(make_fetcher(sip, max_in_flight=1), max_pages=50)
+
+    assert all(len(location_hours[node]) == 24 for node in NODES)
+    assert stats['stopped_early'] and sorted(sip.requested) == [1, 2, 3, 4, 5]
+
+
+def test_concurrent_fetch_retries_429_with_lower_rate():
+    sip = FakeSIP(rate_limited_pages={2})
+    fetcher = make_fetcher(sip)
+    stats, location_hours = collect(fetcher, pages=[2, 1, 3, 4, 5, 6, 7, 8, 9])
+
+    assert all(len(location_hours[node]) == 24 for node in NODES)
+    assert sip.requested.count(2) == 2 and fetcher.bucket.rate < 1000
+    assert 1 < sip.max_in_flight <= 3
+    assert not stats['failed_pages']
+
+
+def test_filter_records_decodes_only_requested_nodes():
+    records = [{'barra_transf': node, 'hra': h, 'nmb': 'x'} for h in range(3) for node in NODES + ['OTHER']]
+    body = json.dumps({'data': records, 'page': 1}).encode()
+
+    matched, count = filter_records(body, [NODES[1]])
+    assert count == 9 and matched == [r for r in records if r['barra_transf'] == NODES[1]]
+
+    # Braces inside values can't be isolated: fall back to decoding everything
+    records[0]['nmb'] = '{odd}'
+    matched, count = filter_records(json.dumps({'data': records}).encode(), NODES)
+    assert count == 9 and matched == [r for r in records if r['barra_transf'] in NODES]
+
+
+def test_filter_records_matches_escaped_node_names():
+    names = ['BA S/E CHONCHI 110KV BP1', 'CAÑETE_220']
+    records = [{'barra_transf': name, 'hra': h} for h in range(2) for name in names + ['OTHER']]
+    expected = [r for r in records if r['barra_transf'] in names]
+    raw = json.dumps({'data': records}, ensure_ascii=False)
+
+    for body in (raw.replace('/', '\\/'),         # '/' escaped as '\/'
+                 json.dumps({'data': records}),    # non-ASCII as \u00d1
+                 raw.replace('Ñ', '\\u00D1')):     # upper-case hex
+        assert filter_records(body.encode(), names) == (expected, 6)
+
+
+def test_prefiltered_pages_still_detect_the_last_page():
+    sip = FakeSIP()
+    fetcher = make_fetcher(sip, max_in_flight=1)
+    seen = []
+    stats = fetcher.fetch_pages('http://sip', {}, lambda page, records: seen.extend(records),
+                                max_pages=50, nodes=['OTHER'])
+
+    assert len(seen) == 24 and all(r['barra_transf'] == 'OTHER' for r in seen)
+    assert stats['last_page'] == 8 and stats['total_records'] == 72
+
+
+def test_one_empty_or_failed_page_does_not_end_the_scan():
+    sip = FakeSIP(blank_pages={2}, forbidden_pages={4})
+    stats = make_fetcher(sip, max_in_flight=1).fetch_pages('http://sip', {}, lambda page, records: None,
+                                                          max_pages=50)
+
+    assert sip.requested == [1, 2, 3, 4, 5, 6, 7, 8]
+    assert stats['last_page'] == 8 and stats['failed_pages'] == [4]
+
+
+def test_three_consecutive_empty_pages_end_the_scan():
+    sip = FakeSIP()
+    sip.pages = sip.pages[:7]  # every page full: no short page marks the end
+    stats = make_fetcher(sip, max_in_flight=1).fetch_pages('http://sip', {}, lambda page, records: None,
+                                                          max_pages=50)
+
+    assert sip.requested == list(range(1, 11))
+    assert stats['last_page'] == 7 and stats['total_records'] == 70
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""SIPPageIndex: learned pages are planned first and persist per page size"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from lib.utils.sip_page_index import SIPPageIndex
+
+NODES = ['NVA_P.MONTT___220', 'PIDPID________110']
+
+
+def test_plan_puts_learned_pages_first():
+    index = SIPPageIndex()
+    for hour in range(24):
+        index.record(NODES[0], hour, 17 if hour < 12 else 18)
+        index.record(NODES[1], hour, 31)
+
+    assert index.plan(NODES, range(1, 6)) == [31, 17, 18, 1, 2, 3, 4, 5]
+    assert index.plan(NODES, range(1, 4), hours=[20]) == [18, 31, 1, 2, 3]
+    assert index.plan(['UNKNOWN'], [2, 6, 10]) == [2, 6, 10]
+
+    # A node that moved is planned on its new page after a couple of fetches
+    index.record(NODES[1], 5, 32)
+    index.record(NODES[1], 5, 32)
+    assert index.likely_pages([NODES[1]], hours=[5]) == [32]
+
+
+def test_sections_per_page_size_survive_each_other(tmp_path):
+    path = tmp_path / 'sip_page_index.json'
+    large, small = SIPPageIndex(path, page_size=4000), SIPPageIndex(path, page_size=1000)
+    large.record(NODES[0], 3, 12)
+    small.record(NODES[0], 3, 47)
+    large.save()
+    small.save()
+
+    assert SIPPageIndex(path, page_size=4000).likely_pages(NODES) == [12]
+    assert SIPPageIndex(path, page_size=1000).likely_pages(NODES) == [47]
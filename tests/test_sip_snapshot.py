@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""SIP snapshot: built from SIP records, served stale while revalidating in the background"""
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytz
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from lib.utils import sip_snapshot
+from lib.utils.sip_snapshot import build_snapshot, get_snapshot, write_snapshot
+
+SANTIAGO_TZ = pytz.timezone('America/Santiago')
+NOW = SANTIAGO_TZ.localize(datetime(2025, 11, 20, 10, 30))
+
+
+def fake_fetch(date_str, api_key, page_index=None):
+    records = [{
+        'barra_transf': 'CHILOE________220',
+        'fecha_hora': f"{date_str} {h:02d}:00:00",
+        'cmg_usd_mwh_': 50.0 + h + (10 if minute else 0)
+    } for h in reversed(range(24)) for minute in (0, 1)]
+    return records, {'pages_fetched': 1, 'records_found': len(records), 'date_fetched': date_str}
+
+
+def isolate(monkeypatch, tmp_path):
+    monkeypatch.setattr(sip_snapshot, 'TMP_SNAPSHOT', tmp_path / 'tmp' / 'sip_snapshot.json')
+    monkeypatch.setattr(sip_snapshot, '_memory', None)
+
+
+def test_build_snapshot_learns_hourly_medians():
+    snapshot = build_snapshot(NOW, 'key', fetch=fake_fetch)
+
+    assert snapshot['date'] == '2025-11-19'
+    assert [p['datetime'] for p in snapshot['series']] == sorted(p['datetime'] for p in snapshot['series'])
+    assert snapshot['hourly_patterns']['7'] == 62.0
+    assert build_snapshot(NOW, 'key', fetch=lambda d, k, page_index: ([], {})) is None
+
+
+def test_stale_snapshot_is_served_while_revalidating(monkeypatch, tmp_path):
+    isolate(monkeypatch, tmp_path)
+    stale = build_snapshot(NOW - timedelta(hours=5), 'key', fetch=fake_fetch)
+    write_snapshot(stale, tmp_path / 'sip_snapshot.json')
+
+    builds = []
+    def build(now, api_key):
+        builds.append(now)
+        return build_snapshot(now, api_key, fetch=fake_fetch)
+
+    snapshot, state = get_snapshot(NOW, 'key', tmp_path, build=build)
+    assert (state, snapshot['generated_at']) == ('stale', stale['generated_at'])
+
+    for _ in range(100):
+        if not sip_snapshot._refreshing:
+            break
+        time.sleep(0.01)
+
+    snapshot, state = get_snapshot(NOW, 'key', tmp_path, build=build)
+    assert (state, snapshot['generated_at'], len(builds)) == ('fresh', NOW.isoformat(), 1)
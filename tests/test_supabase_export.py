@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""SupabaseClient bulk reads: sliced exports and concurrent fan-out return complete results"""
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+import requests
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from lib.utils.supabase_client import SupabaseClient
+from postgrest_stub import PostgRESTStub, StubResponse
+
+NODES = ['NVA_P.MONTT___220', 'PIDPID________110', 'DALCAHUE______110']
+
+
+def make_cmg_online(days):
+    rows, start = [], datetime(2025, 1, 1)
+    for i in range(days * 24):
+        ts = start + timedelta(hours=i)
+        for node in NODES:
+            rows.append({
+                'id': len(rows) + 1,
+                'datetime': ts.isoformat(),
+                'date': ts.strftime('%Y-%m-%d'),
+                'hour': ts.hour,
+                'node': node,
+                'cmg_usd': float(i % 97)
+            })
+    return rows
+
+
+def make_client(monkeypatch, tables):
+    monkeypatch.setenv('SUPABASE_URL', 'http://stub')
+    monkeypatch.setenv('SUPABASE_SERVICE_KEY', 'key')
+    client = SupabaseClient()
+    client.session = PostgRESTStub(tables)
+    return client
+
+
+def test_export_returns_every_row(monkeypatch):
+    rows = make_cmg_online(days=60)
+    client = make_client(monkeypatch, {'cmg_online': rows})
+
+    df = client.export_cmg_online('2025-01-01', '2025-03-01')
+
+    assert len(df) == len(rows)
+    assert df['id'].is_unique
+    assert df['id'].tolist() == sorted(df['id'])
+
+
+def test_export_applies_range_and_filters(monkeypatch):
+    client = make_client(monkeypatch, {'cmg_online': make_cmg_online(days=30)})
+
+    df = client.export_cmg_online('2025-01-10', '2025-01-19', node=NODES[1], select='datetime,cmg_usd')
+
+    assert len(df) == 10 * 24
+    assert df['datetime'].min().startswith('2025-01-10')
+    assert df['datetime'].max().startswith('2025-01-19T23')
+    assert set(df.columns) == {'id', 'datetime', 'cmg_usd'}
+
+
+def test_fetch_tables_pages_in_parallel(monkeypatch):
+    rows = make_cmg_online(days=40)
+    client = make_client(monkeypatch, {'cmg_online': rows, 'cmg_programado': rows[:10]})
+
+    results = client.fetch_tables({
+        'online': ('cmg_online', [('order', 'id.asc')]),
+        'prog': ('cmg_programado', [('order', 'id.asc')]),
+        'capped': ('cmg_online', [('node', f'eq.{NODES[0]}'), ('order', 'id.asc')]),
+    }, max_rows=2500)
+
+    assert [r['id'] for r in results['online']] == list(range(1, 2501))
+    assert len(results['prog']) == 10
+    assert len(results['capped']) == 960
+    # One counted first page per query, then only the pages that exist
+    assert len(client.session.requests) == 3 + 2
+
+
+def test_iter_pages_is_stable_under_inserts(monkeypatch):
+    base = datetime(2025, 1, 1)
+    rows = [{
+        'forecast_datetime': (base + timedelta(hours=f)).isoformat() + '+00:00',
+        'target_datetime': (base + timedelta(hours=f + h)).isoformat() + '+00:00',
+        'horizon': h
+    } for f in range(50) for h in range(1, 25)]
+    client = make_client(monkeypatch, {'ml_predictions': list(rows)})
+
+    seen = []
+    pages = client.iter_pages('ml_predictions', [('select', 'horizon')],
+                              ('forecast_datetime', 'target_datetime'), page_size=100)
+    for i, page in enumerate(pages):
+        seen.extend((r['forecast_datetime'], r['target_datetime']) for r in page)
+        if i == 2:
+            # A late row that sorts before the cursor would shift OFFSET pages
+            client.session.tables['ml_predictions'].append({
+                'forecast_datetime': base.isoformat() + '+00:00',
+                'target_datetime': (base + timedelta(hours=30)).isoformat() + '+00:00',
+                'horizon': 30
+            })
+
+    assert len(seen) == len(set(seen)) == len(rows)
+    assert seen == sorted(seen)
+
+
+def test_reads_project_requested_columns(monkeypatch):
+    client = make_client(monkeypatch, {'cmg_online': make_cmg_online(days=2)})
+
+    rows = client.get_cmg_online(start_date='2025-01-02', select='hour,cmg_usd')
+    pages = list(client.iter_pages('cmg_online', [('select', 'cmg_usd')], ('id',)))
+
+    assert rows and all(set(r) == {'hour', 'cmg_usd'} for r in rows)
+    assert all(set(r) == {'cmg_usd', 'id'} for page in pages for r in page)
+
+
+def test_export_is_complete_under_a_lower_row_cap(monkeypatch):
+    rows = make_cmg_online(days=30)
+    client = make_client(monkeypatch, {'cmg_online': rows})
+    # Server max-rows below the client's page size: every page comes back short
+    client.session.max_rows = 250
+
+    df = client.export_cmg_online('2025-01-01', '2025-01-30')
+
+    assert len(df) == len(rows) and df['id'].is_unique
+
+
+def test_fetch_all_raises_when_a_later_page_fails(monkeypatch):
+    client = make_client(monkeypatch, {'cmg_online': make_cmg_online(days=60)})
+    stub_get = client.session.get
+
+    def failing_get(url, params=None, headers=None, timeout=None):
+        if len(client.session.requests) == 2:
+            client.session.requests.append(('failed', params))
+            return StubResponse(503, {'message': 'unavailable'})
+        return stub_get(url, params=params, headers=headers, timeout=timeout)
+
+    client.session.get = failing_get
+    for keys in (None, ('id',)):
+        client.session.requests.clear()
+        with pytest.raises(requests.HTTPError):
+            client.fetch_all('cmg_online', [('order', 'id.asc')], keys=keys)
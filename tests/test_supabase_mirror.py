@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""SupabaseMirror: incremental syncs pull only rows past each node's watermark"""
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent.parent / 'scripts' / 'production'))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from lib.utils.supabase_client import SupabaseClient
+from postgrest_stub import PostgRESTStub
+from supabase_mirror import SupabaseMirror
+
+
+def add_rows(table, node_id, start, hours, updated_at):
+    for i in range(hours):
+        ts = start + timedelta(hours=i)
+        table.append({
+            'id': len(table) + 1,
+            'datetime': ts.isoformat(),
+            'date': ts.strftime('%Y-%m-%d'),
+            'node_id': node_id,
+            'cmg_usd': float(i % 50),
+            'updated_at': updated_at
+        })
+
+
+def make_client(monkeypatch, tables):
+    monkeypatch.setenv('SUPABASE_URL', 'http://stub')
+    monkeypatch.setenv('SUPABASE_SERVICE_KEY', 'key')
+    client = SupabaseClient()
+    client.session = PostgRESTStub(tables)
+    return client
+
+
+def test_incremental_sync(monkeypatch, tmp_path):
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    rows = []
+    add_rows(rows, 1, today - timedelta(days=20), 20 * 24, '2026-01-01T00:00:00+00:00')
+    add_rows(rows, 2, today - timedelta(days=20), 20 * 24, '2026-01-01T00:00:00+00:00')
+    client = make_client(monkeypatch, {'cmg_online': rows})
+    mirror = SupabaseMirror(tmp_path)
+
+    assert mirror.sync(client, tables=['cmg_online'], days=30) == {'cmg_online': 960}
+    assert mirror.load_state()['cmg_online']['watermarks'] == {
+        '1': '2026-01-01T00:00:00+00:00', '2': '2026-01-01T00:00:00+00:00'
+    }
+
+    # Nothing new: only watermark-boundary rows come back, and are deduped
+    mirror.sync(client, tables=['cmg_online'])
+    assert len(mirror.read('cmg_online')) == 960
+
+    # New hours for node 1, a revised row for node 2 and a brand-new node 3
+    add_rows(rows, 1, today, 5, '2026-01-02T00:00:00+00:00')
+    rows[500].update(cmg_usd=999.0, updated_at='2026-01-02T00:00:00+00:00')
+    add_rows(rows, 3, today, 3, '2026-01-02T00:00:00+00:00')
+    client.session.requests.clear()
+    mirror.sync(client, tables=['cmg_online'])
+
+    df = mirror.read('cmg_online')
+    assert len(df) == 968
+    assert df['id'].is_unique
+    assert df.loc[df['id'] == 501, 'cmg_usd'].item() == 999.0
+    assert set(mirror.load_state()['cmg_online']['watermarks']) == {'1', '2', '3'}
+    # Incremental requests filter on updated_at, never on the date range
+    assert all(any(k == 'updated_at' for k, _ in params) for _, params in client.session.requests)
+
+
+def test_read_filters_date_range(monkeypatch, tmp_path):
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    rows = []
+    add_rows(rows, 1, today - timedelta(days=10), 10 * 24, '2026-01-01T00:00:00+00:00')
+    mirror = SupabaseMirror(tmp_path)
+    mirror.sync(make_client(monkeypatch, {'cmg_online': rows}), tables=['cmg_online'])
+
+    start = (today - timedelta(days=3)).strftime('%Y-%m-%d')
+    df = mirror.read('cmg_online', start_date=start)
+    assert len(df) == 3 * 24
+    assert df['date'].min() == start
+
+
+def test_coverage_gap_and_extend_history(monkeypatch, tmp_path):
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    rows = []
+    add_rows(rows, 1, today - timedelta(days=40), 40 * 24, '2026-01-01T00:00:00+00:00')
+    client = make_client(monkeypatch, {'cmg_online': rows})
+    mirror = SupabaseMirror(tmp_path)
+    mirror.sync(client, tables=['cmg_online'], days=10)
+
+    day = lambda n: (today - timedelta(days=n)).strftime('%Y-%m-%d')
+    assert mirror.coverage_gap('cmg_online', day(10), day(1)) is None
+    assert 'history starts' in mirror.coverage_gap('cmg_online', day(30), day(1))
+    assert 'newest row' in mirror.coverage_gap('cmg_online', day(10), day(-1))
+
+    assert mirror.extend_history(client, 'cmg_online', day(30)) > 0
+    assert mirror.coverage_gap('cmg_online', day(30), day(1)) is None
+    df = mirror.read('cmg_online', start_date=day(30))
+    assert df['date'].min() == day(30) and df['id'].is_unique
+    # Watermarks untouched, and nothing older than the new start is exported twice
+    assert mirror.load_state()['cmg_online']['watermarks'] == {'1': '2026-01-01T00:00:00+00:00'}
+    assert mirror.extend_history(client, 'cmg_online', day(30)) == 0
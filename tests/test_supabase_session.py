@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""SupabaseClient HTTP session: one pooled session per process, retries on 5xx"""
+import sys
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from lib.utils import supabase_client
+from lib.utils.supabase_client import SupabaseClient, get_supabase_client
+
+
+class FlakyPostgREST(BaseHTTPRequestHandler):
+    """Answers 503 on the first request, then a JSON page"""
+    protocol_version = 'HTTP/1.1'
+    seen = []
+
+    def do_GET(self):
+        FlakyPostgREST.seen.append((self.client_address[1], self.headers.get('Accept-Encoding')))
+        status, body = (503, b'{}') if len(FlakyPostgREST.seen) == 1 else (200, json.dumps([{'id': 1}]).encode())
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_session_is_shared_and_retries(monkeypatch):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FlakyPostgREST)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv('SUPABASE_URL', f'http://127.0.0.1:{server.server_port}')
+    monkeypatch.setenv('SUPABASE_SERVICE_KEY', 'key')
+    monkeypatch.setattr(supabase_client, '_client', None)
+
+    try:
+        client = get_supabase_client()
+        assert get_supabase_client() is client
+        assert SupabaseClient().session is client.session
+
+        # 503 is retried transparently
+        assert client.get_nodes() == [{'id': 1}]
+        assert client.get_nodes() == [{'id': 1}]
+    finally:
+        server.shutdown()
+
+    ports = {port for port, _ in FlakyPostgREST.seen}
+    assert len(FlakyPostgREST.seen) == 3
+    assert len(ports) == 1  # keep-alive: every request on one connection
+    assert all(encoding == 'gzip' for _, encoding in FlakyPostgREST.seen)